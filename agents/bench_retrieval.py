@@ -0,0 +1,408 @@
+"""Retrieval benchmark on a synthetic corpus with deterministic stub embedders.
+
+Example:
+    python bench_retrieval.py --docs 200 --chunk-size 1000 --chunk-overlap 200 --output results.json
+
+Queries are built from the indexed text the way users ask: "excerpt"
+queries quote a short span of a chunk, "paraphrase" queries reword such a
+span (synonyms, dropped and reordered words, numbers kept). The ground
+truth is the chunk the span came from, plus its overlap neighbour when the
+span falls in the overlap. Vectors come from a bag-of-words stub embedder
+that knows the synonyms, so dense search can match a paraphrase that BM25
+misses, while BM25 is better at exact figures and tickers.
+
+Rows:
+
+- ``numpy`` / ``chroma``: vector search alone. They also report ingestion
+  throughput (embedding + upsert with the hash stub embedder), index build
+  time, load time and on-disk size.
+- ``bm25``: lexical search alone.
+- ``hybrid``: NumPy + BM25 fused with RRF, like rag-agent's HybridRetriever.
+- ``sharded-N``: the same corpus in a ShardedCorpus, searched across shards.
+- ``cached-hybrid``: hybrid behind a RetrievalCache, with every query asked
+  ``--repeat`` times (every other repeat reworded with synonyms).
+- ``hybrid-top-k-context`` / ``packed-hybrid``: the context an LLM would
+  get, either the hybrid top k as is or the top ``--pack-k`` packed with
+  pack_context into ``--token-budget`` (rag-agent's defaults). A hit means
+  the query's source span is in the context; ``context_tokens_vs_top_k`` is
+  the packed context's size relative to the top-k context.
+
+Quality is hit@k (any relevant chunk in the top k) and MRR@k; latency
+percentiles include embedding the query. The vector rows also report
+recall@k against exact search: the share of the brute-force cosine top k
+over the same vectors that the backend returns, which is where Chroma's
+HNSW approximation shows up. Results are written as JSON so
+runs can be compared across backends and settings.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from context_packing import estimate_tokens, pack_context
+from corpus import ShardedCorpus
+from embedding_pipeline import embed_and_upsert
+from numpy_index import NumpyVectorIndex
+from rag_ingest import IngestionManifest
+from retrieval_cache import RetrievalCache
+from stub_embeddings import BagOfWordsEmbeddings, StubEmbeddings
+
+WORDS = (
+    "market index equity bond yield rate inflation earnings revenue growth sector quarter fiscal guidance "
+    "margin valuation forecast outlook capital liquidity investor rally selloff volatility dividend"
+).split()
+TOPICS = [
+    "technology chip semiconductor cloud software datacenter ai demand".split(),
+    "energy oil crude barrel opec refinery pipeline gas".split(),
+    "healthcare pharma drug trial biotech insurer hospital approval".split(),
+    "financials bank lender deposit loan credit mortgage treasury".split(),
+    "consumer retail spending shopper apparel grocery holiday store".split(),
+    "industrials airline freight railroad manufacturing defense aerospace factory".split(),
+    "realestate housing reit office rent construction homebuilder property".split(),
+    "commodities gold copper wheat futures currency dollar metal".split(),
+]
+TICKERS = ["NVDA", "AAPL", "MSFT", "AMZN", "META", "GOOGL", "TSLA", "JPM", "XOM", "S&P"]
+# Paraphrases swap in these words; the vector embedder treats each group as one word, BM25 does not
+SYNONYMS = [
+    ("rally", "surge", "jump"), ("selloff", "slump", "decline"), ("earnings", "profits"), ("revenue", "sales"),
+    ("growth", "expansion"), ("investor", "shareholder"), ("forecast", "projection"), ("outlook", "prospects"),
+    ("volatility", "turbulence"), ("guidance", "targets"), ("valuation", "pricing"), ("demand", "appetite"),
+    ("bank", "lender"), ("oil", "crude"), ("drug", "medicine"), ("housing", "homes"), ("chip", "processor"),
+]
+SYNONYM_OF = {group[0]: group[1:] for group in SYNONYMS}
+
+
+def tail_vocabulary(size, seed=0):
+    """Made-up words (names, places, jargon) for the long tail of the vocabulary."""
+    rng = random.Random(seed)
+    syllables = "ka lo mi ren tor va shi ne qua dor li pe zan ru bo fel mar tes gi ul".split()
+    return sorted({"".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(size)})
+
+
+def synthetic_corpus(n_docs, words_per_doc, seed=0):
+    """Documents that each lean on one topic's vocabulary, with tickers and percentages mixed in.
+
+    Like real text, a share of words comes from a large vocabulary with a
+    Zipfian frequency, so a short span is usually, but not always, specific
+    to one passage.
+    """
+    rng = random.Random(seed)
+    tail = tail_vocabulary(20000, seed)
+    tail_weights = np.cumsum(1.0 / np.arange(1, len(tail) + 1) ** 1.1)
+    docs = []
+    for doc_id in range(n_docs):
+        topic = TOPICS[doc_id % len(TOPICS)]
+        words = []
+        for _ in range(words_per_doc):
+            roll = rng.random()
+            if roll < 0.04:
+                words.append(rng.choice(TICKERS))
+            elif roll < 0.08:
+                words.append(f"{rng.uniform(-50, 50):.1f}%")
+            elif roll < 0.35:
+                words.append(rng.choice(topic))
+            elif roll < 0.70:
+                words.append(rng.choice(WORDS))
+            else:
+                words.append(tail[int(np.searchsorted(tail_weights, rng.random() * tail_weights[-1]))])
+            if rng.random() < 0.08:
+                words[-1] += "."
+        docs.append(Document(page_content=" ".join(words), metadata={"source": f"doc-{doc_id}.pdf", "page": 0}))
+    return docs
+
+
+def paraphrase(span, rng, rate):
+    """Reword ``span``: swap in synonyms, drop about ``rate`` of the other words, swap a few neighbours."""
+    words = []
+    for word in span.split():
+        bare = word.strip(".").lower()
+        if bare in SYNONYM_OF:
+            words.append(rng.choice(SYNONYM_OF[bare]))
+        elif rng.random() >= rate or any(c.isdigit() for c in word):
+            words.append(bare)
+    for i in range(0, len(words) - 1, 3):
+        if rng.random() < rate:
+            words[i], words[i + 1] = words[i + 1], words[i]
+    return " ".join(words)
+
+
+def build_queries(chunks, chunk_ids, n_queries, query_words, paraphrase_rate, seed=1):
+    """``[(kind, query, source span, relevant ids)]``, half excerpts and half paraphrases."""
+    rng = random.Random(seed)
+    by_source = {}
+    for chunk_id, chunk in zip(chunk_ids, chunks):
+        by_source.setdefault(chunk.metadata["source"], []).append((chunk_id, chunk.page_content))
+    queries = []
+    for i in range(n_queries):
+        chunk = rng.randrange(len(chunks))
+        words = chunks[chunk].page_content.split()
+        start = rng.randrange(max(1, len(words) - query_words))
+        span = " ".join(words[start:start + query_words])
+        relevant = {chunk_id for chunk_id, text in by_source[chunks[chunk].metadata["source"]] if span in text}
+        if i % 2 == 0:
+            queries.append(("excerpt", span, span, relevant))
+        else:
+            queries.append(("paraphrase", paraphrase(span, rng, paraphrase_rate), span, relevant))
+    return queries
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def percentiles_ms(samples):
+    return {f"p{q}_ms": float(np.percentile(samples, q) * 1000) for q in (50, 95, 99)}
+
+
+def exact_top_k(vectors, query_vectors, k):
+    """Ids (row numbers) of the brute-force cosine top ``k`` for each query vector."""
+    rows = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    queries = query_vectors / np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+    scores = queries @ rows.T
+    top = np.argpartition(-scores, min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+
+def evaluate(search, queries, k, is_hit=None, exact=None):
+    """Latency percentiles, hit@k and MRR@k (overall and per query kind) of ``search(query, k) -> ids``.
+
+    With ``exact`` (the exact top-k ids of each query) recall@k against it is reported too.
+    """
+    latencies = []
+    ranks = {"excerpt": [], "paraphrase": []}
+    recalls = []
+    for i, (kind, query, span, relevant) in enumerate(queries):
+        start = time.perf_counter()
+        found = search(query, k)
+        latencies.append(time.perf_counter() - start)
+        if exact is not None:
+            recalls.append(len(exact[i] & set(found[:k])) / len(exact[i]))
+        if is_hit is not None:
+            rank = 1 if is_hit(found, span) else None
+        else:
+            rank = next((position + 1 for position, doc_id in enumerate(found[:k]) if doc_id in relevant), None)
+        ranks[kind].append(rank)
+
+    result = percentiles_ms(latencies)
+    every = ranks["excerpt"] + ranks["paraphrase"]
+    for name, values in (("", every), ("excerpt_", ranks["excerpt"]), ("paraphrase_", ranks["paraphrase"])):
+        if values:
+            result[f"{name}hit_at_{k}"] = sum(rank is not None for rank in values) / len(values)
+            if is_hit is None:
+                result[f"{name}mrr_at_{k}"] = sum(1 / rank for rank in values if rank) / len(values)
+    if recalls:
+        result[f"recall_at_{k}_vs_exact"] = float(np.mean(recalls))
+    return result
+
+
+# --------------------
+# Vector backends: each returns (collection with upsert(), search(query_vector, k) -> ids)
+# --------------------
+def open_numpy(directory):
+    index = NumpyVectorIndex(directory)
+    return index, lambda vector, k: [row_id for row_id, _, _ in index.search(vector, k)]
+
+
+def open_chroma(directory):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=directory)
+    collection = client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+
+    def search(vector, k):
+        return collection.query(query_embeddings=[vector], n_results=k)["ids"][0]
+
+    return collection, search
+
+
+BACKENDS = {"numpy": open_numpy, "chroma": open_chroma}
+
+
+def upsert_all(collection, chunk_ids, chunks, vectors):
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [chunk.metadata for chunk in chunks]
+    for i in range(0, len(chunks), 1000):
+        collection.upsert(
+            ids=chunk_ids[i:i + 1000], embeddings=vectors[i:i + 1000],
+            documents=texts[i:i + 1000], metadatas=metadatas[i:i + 1000],
+        )
+
+
+def run_backend(name, chunk_ids, chunks, vectors, embedder, queries, exact, args):
+    result = {"backend": name}
+
+    # Ingestion: embedding + upsert, like ingest_pdf does it
+    directory = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        collection, _ = BACKENDS[name](directory)
+        ingest_embedder = StubEmbeddings(size=args.dim, latency=args.embed_latency)
+        start = time.perf_counter()
+        embed_and_upsert(chunk_ids, chunks, ingest_embedder, collection, batch_size=args.batch_size, max_workers=args.workers, progress=None)
+        result["ingest_chunks_per_s"] = len(chunks) / (time.perf_counter() - start)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    # Build from precomputed vectors, then reopen and query
+    directory = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        collection, _ = BACKENDS[name](directory)
+        start = time.perf_counter()
+        upsert_all(collection, chunk_ids, chunks, vectors)
+        result["build_s"] = time.perf_counter() - start
+        del collection
+
+        start = time.perf_counter()
+        _, search = BACKENDS[name](directory)
+        search(vectors[0], args.k)
+        result["load_s"] = time.perf_counter() - start
+        result["disk_bytes"] = directory_size(directory)
+        result.update(evaluate(lambda query, k: search(embedder.embed_query(query), k), queries, args.k, exact=exact))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return result
+
+
+# --------------------
+# Lexical, hybrid, sharded, cached and packed rows
+# --------------------
+def run_retrieval_rows(chunk_ids, chunks, vectors, embedder, queries, args):
+    directory = tempfile.mkdtemp(prefix="bench_hybrid_")
+    try:
+        vector_index = NumpyVectorIndex(os.path.join(directory, "vectors"))
+        upsert_all(vector_index, chunk_ids, chunks, vectors)
+        lexical_index = BM25Index(os.path.join(directory, "bm25.json"))
+        lexical_index.upsert(chunk_ids, [chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks])
+
+        def hybrid_docs(query, fetch_k=args.fetch_k, k=args.k):
+            vector_docs = [doc for _, _, doc in vector_index.search(embedder.embed_query(query), fetch_k)]
+            lexical_docs = [doc for _, _, doc in lexical_index.search(query, fetch_k)]
+            return reciprocal_rank_fusion([vector_docs, lexical_docs], k=k)
+
+        rows = [
+            {"backend": "bm25", **evaluate(lambda query, k: [doc_id for doc_id, _, _ in lexical_index.search(query, k)], queries, args.k)},
+            {"backend": "hybrid", **evaluate(lambda query, k: [doc.id for doc in hybrid_docs(query, k=k)], queries, args.k)},
+        ]
+
+        # Same chunks spread over shards by source file, searched with ShardedCorpus
+        corpus = ShardedCorpus(os.path.join(directory, "corpus"), embedder, n_shards=args.shards)
+        by_shard = {}
+        for i, chunk in enumerate(chunks):
+            by_shard.setdefault(corpus.shard_for(chunk.metadata["source"]), []).append(i)
+        for shard_id, rows_in_shard in by_shard.items():
+            shard = corpus.shard(shard_id)
+            upsert_all(shard.vector_index, [chunk_ids[i] for i in rows_in_shard], [chunks[i] for i in rows_in_shard], vectors[rows_in_shard])
+            shard.lexical_index.upsert(
+                [chunk_ids[i] for i in rows_in_shard],
+                [chunks[i].page_content for i in rows_in_shard],
+                [chunks[i].metadata for i in rows_in_shard],
+            )
+            IngestionManifest(shard.manifest_path).save()
+        rows.append({
+            "backend": f"sharded-{args.shards}",
+            **evaluate(lambda query, k: [doc.id for doc in corpus.search(query, k=k, fetch_k=args.fetch_k)], queries, args.k),
+        })
+
+        # Every question asked --repeat times in a shuffled stream, with each repeat after the first reworded
+        rng = random.Random(2)
+        stream = []
+        for kind, query, span, relevant in queries:
+            stream.append((kind, query, span, relevant))
+            stream.extend((kind, paraphrase(query, rng, 0.0) if n % 2 else query, span, relevant) for n in range(1, args.repeat))
+        rng.shuffle(stream)
+        cache = RetrievalCache(embedder, max_entries=len(queries))
+        cached = evaluate(lambda query, k: [doc.id for doc in cache.get_or_search(query, lambda q: hybrid_docs(q, k=k))], stream, args.k)
+        stats = cache.stats()
+        cached["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / len(stream)
+        rows.append({"backend": "cached-hybrid", "lookups": len(stream), **stats, **cached})
+
+        # Packed context: more candidates, de-duplicated into a token budget
+        tokens = []
+
+        def packed(query, k):
+            passages = pack_context(hybrid_docs(query, k=args.pack_k), token_budget=args.token_budget)
+            tokens.append(sum(estimate_tokens(passage.page_content) for passage in passages))
+            return passages
+
+        unpacked_tokens = []
+
+        def unpacked(query, k):
+            docs = hybrid_docs(query, k=k)
+            unpacked_tokens.append(sum(estimate_tokens(doc.page_content) for doc in docs))
+            return docs
+
+        in_context = lambda passages, span: any(span in passage.page_content for passage in passages)
+        rows.append({"backend": "hybrid-top-k-context", **evaluate(unpacked, queries, args.k, is_hit=in_context),
+                     "avg_context_tokens": float(np.mean(unpacked_tokens))})
+        rows.append({"backend": "packed-hybrid", **evaluate(packed, queries, args.k, is_hit=in_context),
+                     "avg_context_tokens": float(np.mean(tokens)),
+                     "context_tokens_vs_top_k": float(np.mean(tokens) / np.mean(unpacked_tokens))})
+        return rows
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--words-per-doc", type=int, default=1500)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-words", type=int, default=12, help="words per query span")
+    parser.add_argument("--paraphrase-rate", type=float, default=0.3, help="share of words dropped/reordered in paraphrases")
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3, help="times each query is asked in the cached row")
+    parser.add_argument("--pack-k", type=int, default=5, help="candidates given to pack_context")
+    parser.add_argument("--token-budget", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="simulated seconds per embedding call")
+    parser.add_argument("--backends", default="numpy,chroma")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    chunks = splitter.split_documents(synthetic_corpus(args.docs, args.words_per_doc))
+    chunk_ids = [f"chunk-{i}" for i in range(len(chunks))]
+
+    embedder = BagOfWordsEmbeddings(size=args.dim, synonyms=SYNONYMS)
+    vectors = np.asarray(embedder.embed_documents([chunk.page_content for chunk in chunks]), dtype=np.float32)
+    queries = build_queries(chunks, chunk_ids, args.queries, args.query_words, args.paraphrase_rate)
+    query_vectors = np.asarray(embedder.embed_documents([query for _, query, _, _ in queries]), dtype=np.float32)
+    exact = [{chunk_ids[row] for row in rows} for rows in exact_top_k(vectors, query_vectors, args.k)]
+
+    results = []
+    for name in args.backends.split(","):
+        try:
+            results.append(run_backend(name, chunk_ids, chunks, vectors, embedder, queries, exact, args))
+        except ImportError as e:
+            results.append({"backend": name, "skipped": str(e)})
+    results.extend(run_retrieval_rows(chunk_ids, chunks, vectors, embedder, queries, args))
+
+    report = {
+        "settings": {**vars(args), "chunks": len(chunks)},
+        "python": platform.python_version(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
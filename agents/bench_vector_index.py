@@ -0,0 +1,93 @@
+"""Compare NumpyVectorIndex against Chroma on load time and query latency.
+
+Usage: python bench_vector_index.py [n_vectors] [dim]
+
+Uses random vectors, so no embedding server is needed. Chroma is skipped
+if chromadb is not installed. Load time is opening the index plus the
+first query, for both backends, since either may defer work to it.
+"""
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from numpy_index import NumpyVectorIndex
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def time_queries(search, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        samples.append(time.perf_counter() - start)
+    return {"p50_ms": percentile_ms(samples, 50), "p95_ms": percentile_ms(samples, 95)}
+
+
+def bench_numpy(directory, ids, vectors, texts, queries, k):
+    index = NumpyVectorIndex(directory)
+    for start in range(0, len(ids), 1000):
+        index.upsert(ids[start:start + 1000], vectors[start:start + 1000], texts[start:start + 1000])
+    del index
+
+    # Like Chroma's below, load time runs up to the first answered query
+    start = time.perf_counter()
+    index = NumpyVectorIndex(directory)
+    index.search(queries[0], k)
+    load_s = time.perf_counter() - start
+    return {"load_ms": load_s * 1000, **time_queries(lambda q: index.search(q, k), queries)}
+
+
+def bench_chroma(directory, ids, vectors, texts, queries, k):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=directory)
+    collection = client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+    batch = client.get_max_batch_size()
+    for start in range(0, len(ids), batch):
+        collection.add(
+            ids=ids[start:start + batch],
+            embeddings=vectors[start:start + batch],
+            documents=texts[start:start + batch],
+        )
+    del collection, client
+
+    start = time.perf_counter()
+    client = chromadb.PersistentClient(path=directory)
+    collection = client.get_collection("bench")
+    collection.query(query_embeddings=[queries[0]], n_results=k)
+    load_s = time.perf_counter() - start
+    return {"load_ms": load_s * 1000, **time_queries(lambda q: collection.query(query_embeddings=[q], n_results=k), queries)}
+
+
+if __name__ == "__main__":
+    n_vectors = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 768
+    k = 5
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n_vectors, dim)).astype(np.float32)
+    queries = rng.standard_normal((200, dim)).astype(np.float32)
+    ids = [f"chunk-{i}" for i in range(n_vectors)]
+    texts = [f"synthetic chunk {i}" for i in range(n_vectors)]
+
+    backends = [("numpy", bench_numpy)]
+    try:
+        import chromadb  # noqa: F401
+        backends.append(("chroma", bench_chroma))
+    except ImportError:
+        print("chromadb not installed, skipping Chroma")
+
+    print(f"{n_vectors} vectors, dim={dim}, k={k}")
+    for name, bench in backends:
+        directory = tempfile.mkdtemp(prefix=f"bench_{name}_")
+        try:
+            result = bench(directory, ids, vectors, texts, queries, k)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        print(f"{name:<7} load={result['load_ms']:8.1f} ms  p50={result['p50_ms']:7.2f} ms  p95={result['p95_ms']:7.2f} ms")
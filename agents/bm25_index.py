@@ -0,0 +1,168 @@
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# Keeps numbers with their decimals, currency and percent signs ("$4.2", "3.5%")
+# and tickers/words with inner "&" or "'" ("s&p") as single tokens.
+TOKEN_PATTERN = re.compile(r"\$?\d+(?:[.,]\d+)*%?|[a-z0-9]+(?:[&'][a-z0-9]+)*")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Persisted BM25 inverted index over chunk texts.
+
+    It has the same ``get``/``upsert``/``delete``/``count`` methods as a
+    Chroma collection, so it is filled at ingestion time next to the vectors.
+    ``upsert`` ignores the embeddings. Call :meth:`save` after a batch of
+    changes to write the index to ``path`` as JSON, so startup only has to
+    read it back.
+    """
+
+    def __init__(self, path, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.docs = {}
+        self.postings = {}
+        self.total_length = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.docs = data["docs"]
+            self.postings = data["postings"]
+            self.total_length = sum(doc["length"] for doc in self.docs.values())
+
+    # --------------------
+    # Collection-style interface
+    # --------------------
+    def count(self):
+        return len(self.docs)
+
+    def get(self, ids=None, where=None):
+        """Ids among ``ids``, or, like Chroma, those whose metadata matches ``where`` (see NumpyVectorIndex.get)."""
+        if where is None:
+            return {"ids": [doc_id for doc_id in ids if doc_id in self.docs]}
+        (key, condition), = where.items()
+        allowed = condition["$in"] if isinstance(condition, dict) else [condition]
+        return {"ids": [doc_id for doc_id, doc in self.docs.items() if doc["metadata"].get(key) in allowed]}
+
+    def upsert(self, ids, documents, metadatas=None, embeddings=None):
+        metadatas = metadatas or [{}] * len(ids)
+        self.delete([doc_id for doc_id in ids if doc_id in self.docs])
+        for doc_id, text, metadata in zip(ids, documents, metadatas):
+            term_counts = Counter(tokenize(text))
+            length = sum(term_counts.values())
+            self.docs[doc_id] = {"text": text, "metadata": metadata, "length": length}
+            self.total_length += length
+            for term, tf in term_counts.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+
+    def delete(self, ids):
+        for doc_id in ids:
+            doc = self.docs.pop(doc_id, None)
+            if doc is None:
+                continue
+            self.total_length -= doc["length"]
+            for term in set(tokenize(doc["text"])):
+                posting = self.postings.get(term)
+                if posting is not None:
+                    posting.pop(doc_id, None)
+                    if not posting:
+                        del self.postings[term]
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"docs": self.docs, "postings": self.postings}, f)
+        os.replace(tmp_path, self.path)
+
+    # --------------------
+    # Search
+    # --------------------
+    def term_stats(self, query):
+        """``(n_docs, total_length, {term: document frequency})`` for the terms of ``query``.
+
+        Summed over several indexes and passed to :meth:`search` as
+        ``stats``, they give every index the same IDF and average length, so
+        scores from different indexes can be compared.
+        """
+        return len(self.docs), self.total_length, {term: len(self.postings.get(term, ())) for term in set(tokenize(query))}
+
+    def search(self, query, k=5, stats=None):
+        """Return ``[(id, score, Document)]`` for the ``k`` best BM25 matches.
+
+        ``stats`` replaces this index's own collection statistics (see :meth:`term_stats`).
+        """
+        n_docs, total_length, doc_freqs = stats or self.term_stats(query)
+        if not self.docs or n_docs == 0:
+            return []
+        avg_length = total_length / n_docs
+
+        scores = Counter()
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = doc_freqs.get(term, len(posting))
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in posting.items():
+                length_norm = 1 - self.b + self.b * self.docs[doc_id]["length"] / avg_length
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(doc_id, score, self._document(doc_id)) for doc_id, score in top]
+
+    def _document(self, doc_id):
+        doc = self.docs[doc_id]
+        return Document(id=doc_id, page_content=doc["text"], metadata=doc["metadata"])
+
+
+def merge_term_stats(stats):
+    """Combine :meth:`BM25Index.term_stats` results from several indexes."""
+    n_docs, total_length, doc_freqs = 0, 0, Counter()
+    for shard_docs, shard_length, shard_freqs in stats:
+        n_docs += shard_docs
+        total_length += shard_length
+        doc_freqs.update(shard_freqs)
+    return n_docs, total_length, doc_freqs
+
+
+def reciprocal_rank_fusion(result_lists, k=5, rrf_k=60):
+    """Fuse ranked document lists with RRF, identifying documents by ``id`` (or text)."""
+    scores = Counter()
+    docs = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = doc.id or doc.page_content
+            scores[key] += 1.0 / (rrf_k + rank + 1)
+            docs.setdefault(key, doc)
+    return [docs[key] for key, _ in scores.most_common(k)]
+
+
+class HybridRetriever(BaseRetriever):
+    """Vector + BM25 retriever with reciprocal-rank fusion of both result lists.
+
+    ``vector_retriever`` should be configured to return ``fetch_k`` documents.
+    """
+
+    vector_retriever: BaseRetriever
+    lexical_index: BM25Index
+    k: int = 5
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        vector_docs = self.vector_retriever.invoke(query)
+        lexical_docs = [doc for _, _, doc in self.lexical_index.search(query, self.fetch_k)]
+        return reciprocal_rank_fusion([vector_docs, lexical_docs], k=self.k, rrf_k=self.rrf_k)
@@ -0,0 +1,113 @@
+import math
+
+from langchain_core.documents import Document
+
+from bm25_index import tokenize
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return math.ceil(len(text) / 4)
+
+
+def overlap_length(a, b, min_overlap=30):
+    """Length of the longest suffix of ``a`` that is also a prefix of ``b`` (0 if shorter than ``min_overlap``)."""
+    if len(b) < min_overlap:
+        return 0
+    probe = b[:min_overlap]
+    start = a.find(probe, max(0, len(a) - len(b)))
+    while start != -1:
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(probe, start + 1)
+    return 0
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def mmr_order(docs, lambda_mult=0.7):
+    """Reorder ``docs`` (best first) by maximal marginal relevance.
+
+    Relevance comes from the retriever's rank and redundancy from token-set
+    Jaccard similarity, so no extra embedding calls are needed.
+    """
+    n = len(docs)
+    token_sets = [set(tokenize(doc.page_content)) for doc in docs]
+    relevance = [1.0 - rank / n for rank in range(n)]
+    remaining = list(range(n))
+    order = []
+    while remaining:
+        def score(i):
+            redundancy = max((_jaccard(token_sets[i], token_sets[j]) for j in order), default=0.0)
+            return lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+
+        best = max(remaining, key=score)
+        order.append(best)
+        remaining.remove(best)
+    return [docs[i] for i in order]
+
+
+def _merge_adjacent(passages, min_overlap):
+    """Join passages from the same page whose texts overlap end-to-start."""
+    merged = []
+    for doc in passages:
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        for i, kept in enumerate(merged):
+            if (kept.metadata.get("source"), kept.metadata.get("page")) != key:
+                continue
+            n = overlap_length(kept.page_content, doc.page_content, min_overlap)
+            if n:
+                merged[i] = Document(page_content=kept.page_content + doc.page_content[n:], metadata=kept.metadata)
+                break
+            n = overlap_length(doc.page_content, kept.page_content, min_overlap)
+            if n:
+                merged[i] = Document(page_content=doc.page_content + kept.page_content[n:], metadata=doc.metadata)
+                break
+        else:
+            merged.append(doc)
+    return merged
+
+
+def _packed_tokens(passages, min_overlap=30):
+    """Tokens ``passages`` cost once text shared with an earlier passage is counted only once."""
+    total = 0
+    for i, doc in enumerate(passages):
+        text = doc.page_content
+        shared = max(
+            [overlap_length(kept.page_content, text, min_overlap) for kept in passages[:i]]
+            + [overlap_length(text, kept.page_content, min_overlap) for kept in passages[:i]]
+            + [0]
+        )
+        total += estimate_tokens(text[:len(text) - shared])
+    return total
+
+
+def pack_context(docs, token_budget=1000, lambda_mult=0.7, min_overlap=30):
+    """Turn retrieved chunks into a de-duplicated set of passages within ``token_budget``.
+
+    Chunks are taken in MMR order. Text a chunk shares with an already
+    selected chunk (the splitter's ``chunk_overlap``) is counted only once.
+    A chunk fully contained in a selected one is dropped, and a chunk that
+    contains selected ones replaces them. Overlapping chunks from the same
+    page are merged into one passage. If the best chunk alone is over the
+    budget it is cut to fit. Passages are returned in document order.
+    """
+    selected = []
+    for doc in mmr_order(docs, lambda_mult):
+        text = doc.page_content
+        if any(text in kept.page_content for kept in selected):
+            continue
+        candidate = [kept for kept in selected if kept.page_content not in text] + [doc]
+        if _packed_tokens(candidate, min_overlap) <= token_budget:
+            selected = candidate
+        elif not selected:
+            # estimate_tokens counts 4 characters per token
+            selected = [Document(page_content=text[:token_budget * 4], metadata=doc.metadata)]
+
+    passages = _merge_adjacent(selected, min_overlap)
+    passages.sort(key=lambda doc: (str(doc.metadata.get("source", "")), doc.metadata.get("page", 0), doc.metadata.get("start_index", 0)))
+    return passages
@@ -0,0 +1,208 @@
+import hashlib
+import heapq
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+
+from bm25_index import BM25Index, merge_term_stats, reciprocal_rank_fusion
+from numpy_index import NumpyVectorIndex
+from rag_ingest import IngestionManifest, ingest_pdf, manifest_version, settings_key, stat_unchanged
+
+
+class Shard:
+    """One shard on disk: a NumPy vector index, a BM25 index and a manifest."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.vector_index = NumpyVectorIndex(os.path.join(directory, "vectors"))
+        self.lexical_index = BM25Index(os.path.join(directory, "bm25.json"))
+
+
+class ShardedCorpus:
+    """Corpus of many PDFs spread over ``n_shards`` independent on-disk shards.
+
+    A document is assigned to a shard by a stable hash of its file name.
+    Shards are opened lazily the first time they are queried or written, so
+    opening the corpus is just a directory listing. Queries run on every
+    shard in parallel. BM25 scores use collection statistics summed over all
+    shards, so like the vector scores they are comparable across shards. The
+    per-shard top-k lists are merged with a heap and then fused with RRF.
+    """
+
+    def __init__(self, root_dir, embeddings, n_shards=16, max_workers=8, chunk_size=1000, chunk_overlap=200):
+        self.root_dir = root_dir
+        self.embeddings = embeddings
+        self.n_shards = n_shards
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        os.makedirs(root_dir, exist_ok=True)
+
+        self._shards = {}
+        self._shard_locks = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard")
+
+    def shard_for(self, pdf_path):
+        digest = hashlib.md5(os.path.basename(pdf_path).encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "little") % self.n_shards
+
+    def _shard_dir(self, shard_id):
+        return os.path.join(self.root_dir, f"shard-{shard_id:03d}")
+
+    def existing_shards(self):
+        return [
+            shard_id for shard_id in range(self.n_shards)
+            if os.path.exists(os.path.join(self._shard_dir(shard_id), "manifest.json"))
+        ]
+
+    def shard(self, shard_id):
+        shard = self._shards.get(shard_id)
+        if shard is not None:
+            return shard
+        # Loading a shard maps its vectors and reads its BM25 index; only callers of that shard wait
+        with self._lock:
+            shard_lock = self._shard_locks.setdefault(shard_id, threading.Lock())
+        with shard_lock:
+            if shard_id not in self._shards:
+                self._shards[shard_id] = Shard(self._shard_dir(shard_id))
+            return self._shards[shard_id]
+
+    def version(self):
+        """Changes whenever any shard's manifest is saved."""
+        return tuple(manifest_version(os.path.join(self._shard_dir(s), "manifest.json")) for s in range(self.n_shards))
+
+    # --------------------
+    # Ingestion
+    # --------------------
+    def remove_deleted(self, touched=None):
+        """Drop the chunks of every recorded PDF whose file no longer exists. Returns how many PDFs were removed.
+
+        Shard ids whose BM25 index changed are added to ``touched`` when it is
+        given (the caller saves them); otherwise they are saved here.
+        """
+        removed = 0
+        changed = set()
+        for shard_id in self.existing_shards():
+            manifest = IngestionManifest(os.path.join(self._shard_dir(shard_id), "manifest.json"))
+            gone = [doc_path for doc_path in manifest.documents if not os.path.exists(doc_path)]
+            if not gone:
+                continue
+            shard = self.shard(shard_id)
+            chunk_ids = [chunk_id for doc_path in gone for chunk_id in manifest.remove(doc_path)["chunk_ids"]]
+            shard.vector_index.delete(chunk_ids)
+            shard.lexical_index.delete(chunk_ids)
+            manifest.save()
+            changed.add(shard_id)
+            removed += len(gone)
+        if touched is None:
+            for shard_id in changed:
+                self.shard(shard_id).lexical_index.save()
+        else:
+            touched.update(changed)
+        return removed
+
+    def ingest(self, pdf_paths, **ingest_kwargs):
+        """Ingest PDFs into their shards. Shards with only unchanged files are never opened.
+
+        PDFs recorded earlier whose files have since been deleted are removed
+        from their shards first. Each touched shard's BM25 index is written
+        once, after the batch, instead of after every PDF.
+        """
+        settings = settings_key(
+            self.chunk_size, self.chunk_overlap,
+            getattr(self.embeddings, "model", type(self.embeddings).__name__),
+        )
+        embedded = 0
+        touched = set()
+        try:
+            self.remove_deleted(touched)
+            for pdf_path in pdf_paths:
+                shard_id = self.shard_for(pdf_path)
+                manifest_path = os.path.join(self._shard_dir(shard_id), "manifest.json")
+                if stat_unchanged(IngestionManifest(manifest_path).get(pdf_path), pdf_path, settings):
+                    continue
+                shard = self.shard(shard_id)
+                touched.add(shard_id)
+                embedded += ingest_pdf(
+                    pdf_path,
+                    shard.vector_index,
+                    self.embeddings,
+                    shard.manifest_path,
+                    chunk_size=self.chunk_size,
+                    chunk_overlap=self.chunk_overlap,
+                    lexical_index=shard.lexical_index,
+                    save_lexical_index=False,
+                    **ingest_kwargs,
+                )
+        finally:
+            for shard_id in touched:
+                self.shard(shard_id).lexical_index.save()
+        return embedded
+
+    # --------------------
+    # Search
+    # --------------------
+    def _search_shard(self, shard_id, query, query_vector, fetch_k, lexical_stats):
+        shard = self.shard(shard_id)
+        return shard.vector_index.search(query_vector, fetch_k), shard.lexical_index.search(query, fetch_k, stats=lexical_stats)
+
+    def search(self, query, k=5, fetch_k=20):
+        shard_ids = self.existing_shards()
+        if not shard_ids:
+            return []
+        query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+
+        # Corpus-wide document frequencies and lengths, so BM25 scores mean the same in every shard
+        lexical_stats = merge_term_stats(
+            self._executor.map(lambda shard_id: self.shard(shard_id).lexical_index.term_stats(query), shard_ids)
+        )
+        futures = [
+            self._executor.submit(self._search_shard, shard_id, query, query_vector, fetch_k, lexical_stats)
+            for shard_id in shard_ids
+        ]
+        vector_lists, lexical_lists = zip(*(future.result() for future in futures))
+
+        # Each per-shard list is already sorted by score, so a heap merge gives the global order
+        by_score = lambda hit: -hit[1]
+        vector_top = [doc for _, _, doc in heapq.merge(*vector_lists, key=by_score)][:fetch_k]
+        lexical_top = [doc for _, _, doc in heapq.merge(*lexical_lists, key=by_score)][:fetch_k]
+        return reciprocal_rank_fusion([vector_top, lexical_top], k=k)
+
+
+class ShardedRetriever(BaseRetriever):
+    """LangChain retriever over a :class:`ShardedCorpus`."""
+
+    corpus: ShardedCorpus
+    k: int = 5
+    fetch_k: int = 20
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.corpus.search(query, k=self.k, fetch_k=self.fetch_k)
+
+
+# --------------------
+# Ingest a directory of PDFs: python corpus.py <pdf_dir> <corpus_dir>
+# --------------------
+if __name__ == "__main__":
+    from langchain_community.embeddings import OllamaEmbeddings
+    from embedding_cache import CachedEmbeddings
+
+    pdf_dir, corpus_dir = sys.argv[1], sys.argv[2]
+    os.makedirs(corpus_dir, exist_ok=True)
+    embeddings = CachedEmbeddings(
+        OllamaEmbeddings(model="nomic-embed-text"),
+        cache_path=os.path.join(corpus_dir, "embedding_cache.sqlite")
+    )
+    corpus = ShardedCorpus(corpus_dir, embeddings)
+    pdf_paths = sorted(
+        os.path.join(pdf_dir, name) for name in os.listdir(pdf_dir) if name.lower().endswith(".pdf")
+    )
+    print(f"Ingesting {len(pdf_paths)} PDFs into {corpus.n_shards} shards")
+    print(f"Embedded {corpus.ingest(pdf_paths)} chunks")
@@ -0,0 +1,204 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def _text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def _from_blob(blob):
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper backed by an on-disk memo store.
+
+    Vectors are keyed by (model name, sha256 of the text) and stored as raw
+    float32 blobs in a SQLite file, so one cache file can be shared by every
+    collection and re-ingest that uses the same model. A small in-memory LRU
+    sits in front of the file, holding float32 arrays (3 KB per 768-dim
+    vector). When the file holds more than ``max_disk_bytes`` of vectors,
+    the least recently used rows are evicted.
+
+    Hits don't write to the file: their last use is buffered and written
+    with the next store, or once ``touch_flush_every`` hits have piled up.
+    """
+
+    def __init__(self, embeddings, cache_path, model_name=None, max_memory_entries=2_000, max_disk_bytes=512 * 1024 * 1024, touch_flush_every=1_000):
+        self.embeddings = embeddings
+        self.model = model_name or getattr(embeddings, "model", type(embeddings).__name__)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.touch_flush_every = touch_flush_every
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._memory = OrderedDict()
+        self._touched = {}  # key -> last use not yet written to the file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_hash BLOB NOT NULL, vector BLOB NOT NULL,"
+            " size INTEGER NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    # --------------------
+    # Stats
+    # --------------------
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
+
+    # --------------------
+    # Cache layers
+    # --------------------
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys):
+        """Return {key: float32 vector} for every key found in memory or on disk."""
+        found = {}
+        disk_keys = []
+        now = time.time()
+        for key in keys:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+                self._touched[key] = now
+                self.memory_hits += 1
+            else:
+                disk_keys.append(key)
+
+        for start in range(0, len(disk_keys), 500):
+            part = disk_keys[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [self.model, *part],
+            ).fetchall()
+            for key, blob in rows:
+                vector = _from_blob(blob)
+                found[key] = vector
+                self._remember(key, vector)
+                self._touched[key] = now
+                self.disk_hits += 1
+        if len(self._touched) >= self.touch_flush_every:
+            self._flush_touched()
+            self._conn.commit()
+        return found
+
+    def _flush_touched(self):
+        """Write the buffered last-use times (rows evicted meanwhile are simply not updated)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(last_used, self.model, key) for key, last_used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _store(self, items):
+        now = time.time()
+        rows = {}
+        for key, vector in items:
+            vector = np.asarray(vector, dtype=np.float32)
+            blob = vector.tobytes()
+            rows[key] = (self.model, key, blob, len(blob), now)
+            self._remember(key, vector)
+            self._touched.pop(key, None)
+        # INSERT OR REPLACE overwrites rows that are already there; only count the difference
+        replaced = 0
+        keys = list(rows)
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            replaced += self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [self.model, *part],
+            ).fetchone()[0]
+        self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", list(rows.values()))
+        self._disk_bytes += sum(row[3] for row in rows.values()) - replaced
+        self._flush_touched()
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict()
+        self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used rows until the file is back under 90% of the limit."""
+        target = int(self.max_disk_bytes * 0.9)
+        while self._disk_bytes > target:
+            rows = self._conn.execute(
+                "SELECT model, text_hash, size FROM embeddings ORDER BY last_used LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+            self._conn.executemany(
+                "DELETE FROM embeddings WHERE model = ? AND text_hash = ?",
+                [(model, key) for model, key, _ in rows],
+            )
+            for model, key, size in rows:
+                self._disk_bytes -= size
+                self._memory.pop(key, None)
+            self.evictions += len(rows)
+
+    # --------------------
+    # Embeddings interface
+    # --------------------
+    def embed_documents(self, texts):
+        keys = [_text_hash(text) for text in texts]
+        with self._lock:
+            found = self._lookup(set(keys))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_items = list(zip(missing.keys(), vectors))
+            with self._lock:
+                self.misses += len(new_items)
+                self._store(new_items)
+            found.update((key, np.asarray(vector, dtype=np.float32)) for key, vector in new_items)
+
+        # Always the stored float32 values, whichever layer answered
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text):
+        key = _text_hash("query\0" + text)
+        with self._lock:
+            found = self._lookup([key])
+        if key in found:
+            return found[key].tolist()
+
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        with self._lock:
+            self.misses += 1
+            self._store([(key, vector)])
+        return vector.tolist()
@@ -0,0 +1,131 @@
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def print_progress(done, total):
+    """Default progress reporter: a single updating line on stdout."""
+    end = "\n" if done >= total else ""
+    print(f"\rEmbedded {done}/{total} chunks", end=end, flush=True)
+
+
+def embed_with_retry(embedder, texts, max_retries=3, retry_backoff=0.5):
+    """Embed one batch, retrying with exponential backoff on failure."""
+    for attempt in range(max_retries + 1):
+        try:
+            return embedder.embed_documents(texts)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = retry_backoff * (2 ** attempt)
+            print(f"\nEmbedding batch of {len(texts)} failed ({e}), retrying in {delay:.1f}s", file=sys.stderr)
+            time.sleep(delay)
+
+
+def embed_and_upsert(
+    ids,
+    documents,
+    embedder,
+    collection,
+    batch_size=32,
+    max_workers=4,
+    upsert_size=256,
+    max_retries=3,
+    retry_backoff=0.5,
+    progress=print_progress,
+):
+    """Embed ``documents`` in batches on a thread pool and upsert them in bulk.
+
+    ``collection`` only needs an ``upsert(ids=, embeddings=, documents=, metadatas=)``
+    method, which is what a Chroma collection exposes. At most ``max_workers``
+    batches are in flight at a time, so memory stays bounded for large inputs.
+    Vectors are written as soon as ``upsert_size`` of them are ready.
+    Returns the number of documents embedded.
+    """
+    total = len(documents)
+    if total == 0:
+        return 0
+
+    batches = [
+        (ids[start:start + batch_size], documents[start:start + batch_size])
+        for start in range(0, total, batch_size)
+    ]
+
+    done = 0
+    pending_upsert = ([], [], [], [])
+
+    def flush():
+        batch_ids, vectors, texts, metadatas = pending_upsert
+        if batch_ids:
+            collection.upsert(ids=batch_ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+            for part in pending_upsert:
+                part.clear()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        batch_iter = iter(batches)
+        in_flight = {}
+
+        def submit_next():
+            batch = next(batch_iter, None)
+            if batch is None:
+                return False
+            batch_ids, batch_docs = batch
+            texts = [doc.page_content for doc in batch_docs]
+            future = executor.submit(embed_with_retry, embedder, texts, max_retries, retry_backoff)
+            in_flight[future] = batch
+            return True
+
+        for _ in range(max_workers):
+            if not submit_next():
+                break
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch_ids, batch_docs = in_flight.pop(future)
+                vectors = future.result()
+                pending_upsert[0].extend(batch_ids)
+                pending_upsert[1].extend(vectors)
+                pending_upsert[2].extend(doc.page_content for doc in batch_docs)
+                pending_upsert[3].extend(doc.metadata for doc in batch_docs)
+                done += len(batch_ids)
+                if progress:
+                    progress(done, total)
+                submit_next()
+            if len(pending_upsert[0]) >= upsert_size:
+                flush()
+
+    flush()
+    return done
+
+
+# --------------------
+# Benchmark (stub embedder, no Ollama needed)
+# --------------------
+if __name__ == "__main__":
+    from langchain_core.documents import Document
+    from stub_embeddings import StubEmbeddings
+
+    class _CountingCollection:
+        def __init__(self):
+            self.rows = 0
+            self.calls = 0
+
+        def upsert(self, ids, embeddings, documents, metadatas):
+            self.rows += len(ids)
+            self.calls += 1
+
+    n_chunks = 2000
+    docs = [Document(page_content=f"synthetic chunk {i} " * 20, metadata={"page": i // 10}) for i in range(n_chunks)]
+    doc_ids = [str(i) for i in range(n_chunks)]
+
+    for batch_size, workers in [(1, 1), (32, 1), (32, 4), (64, 8)]:
+        embedder = StubEmbeddings(latency=0.02, per_text_latency=0.0005)
+        sink = _CountingCollection()
+        start = time.perf_counter()
+        embed_and_upsert(doc_ids, docs, embedder, sink, batch_size=batch_size, max_workers=workers, progress=None)
+        elapsed = time.perf_counter() - start
+        print(
+            f"batch_size={batch_size:<3} workers={workers:<2} "
+            f"{n_chunks / elapsed:8.0f} chunks/s  embed calls={embedder.calls:<5} upserts={sink.calls}"
+        )
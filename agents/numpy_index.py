@@ -0,0 +1,294 @@
+import json
+import os
+import re
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+FILES = {"vectors": "vectors{}.f32", "ids": "ids{}.txt", "docs": "docs{}.jsonl", "tombstones": "tombstones{}.txt"}
+GENERATION_FILE = re.compile(r"(vectors|ids|docs|tombstones)(\.\d+)?\.(f32|txt|jsonl)")
+
+
+class NumpyVectorIndex:
+    """Append-only, memory-mapped float32 vector index for single-node use.
+
+    Files in ``directory``:
+
+    - ``index.json``: the manifest, with the vector dimension, the file
+      generation and the committed size in bytes of each file below
+    - ``vectors.f32``: L2-normalised rows, appended in insertion order
+    - ``ids.txt`` / ``docs.jsonl``: one line per row with its id and its
+      ``{"text", "metadata"}``
+    - ``tombstones.txt``: row numbers that were deleted or replaced
+
+    Upserting an existing id tombstones the old row and appends a new one.
+    Search is a vectorised dot product over the memory-mapped matrix plus
+    ``argpartition``. It has the same ``get``/``upsert``/``delete``/``count``
+    methods as a Chroma collection, so ``ingest_pdf`` can write to it directly.
+
+    A write is appended to the files and then committed by atomically
+    replacing the manifest, so a crash in between leaves the index as it was:
+    bytes past the committed sizes are ignored and cut off on the next open.
+    :meth:`compact` writes the next generation of files (``vectors.1.f32``,
+    ...) and commits the switch the same way.
+    """
+
+    def __init__(self, directory, dim=None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._header_path = os.path.join(directory, "index.json")
+
+        self.dim = dim
+        self._generation = 0
+        self._sizes = None
+        if os.path.exists(self._header_path):
+            with open(self._header_path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+            self.dim = header["dim"]
+            self._generation = header.get("generation", 0)
+            self._sizes = header.get("sizes")
+
+        self._row_ids = []
+        self._doc_lines = []
+        self._dead = np.zeros(0, dtype=bool)
+        self.id_to_row = {}
+        self._matrix = None
+        self._load()
+
+    def _path(self, name, generation=None):
+        generation = self._generation if generation is None else generation
+        return os.path.join(self.directory, FILES[name].format(f".{generation}" if generation else ""))
+
+    # --------------------
+    # Loading
+    # --------------------
+    def _load(self):
+        if self._sizes is None:
+            # Written before the manifest kept sizes: whatever is in the files counts
+            self._sizes = {name: _file_size(self._path(name)) for name in FILES}
+        for name, size in self._sizes.items():
+            if _file_size(self._path(name)) > size:
+                # Appended but never committed
+                with open(self._path(name), "r+b") as f:
+                    f.truncate(size)
+        self._remove_other_generations()
+
+        self._row_ids = self._read("ids").decode("utf-8").splitlines()
+        self._doc_lines = self._read("docs").splitlines()
+        self._dead = np.zeros(len(self._row_ids), dtype=bool)
+        rows = [int(line) for line in self._read("tombstones").split() if line.strip()]
+        self._dead[rows] = True
+
+        self.id_to_row = {row_id: row for row, row_id in enumerate(self._row_ids) if not self._dead[row]}
+        self._remap()
+
+    def _read(self, name):
+        if not self._sizes[name]:
+            return b""
+        with open(self._path(name), "rb") as f:
+            return f.read(self._sizes[name])
+
+    def _remove_other_generations(self):
+        """Delete files of earlier generations left behind by :meth:`compact` (e.g. still mapped on Windows)."""
+        current = {os.path.basename(self._path(name)) for name in FILES}
+        for filename in os.listdir(self.directory):
+            if filename not in current and GENERATION_FILE.fullmatch(filename):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+    def _remap(self):
+        n_rows = len(self._row_ids)
+        if n_rows == 0 or self.dim is None:
+            self._matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+        else:
+            self._matrix = np.memmap(self._path("vectors"), dtype=np.float32, mode="r", shape=(n_rows, self.dim))
+
+    # --------------------
+    # Writing
+    # --------------------
+    def _append(self, name, payload):
+        """Append to a file at its committed end (dropping anything a failed write left there)."""
+        if not payload:
+            return
+        with open(self._path(name), "ab") as f:
+            if f.tell() != self._sizes[name]:
+                f.truncate(self._sizes[name])
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _commit(self, sizes, generation=None):
+        """Make ``sizes`` (and ``generation``) the index's committed state with one atomic rename."""
+        generation = self._generation if generation is None else generation
+        with open(self._header_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "generation": generation, "sizes": sizes}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self._header_path + ".tmp", self._header_path)
+        self._sizes = sizes
+        self._generation = generation
+
+    # --------------------
+    # Collection-style interface
+    # --------------------
+    def count(self):
+        return len(self.id_to_row)
+
+    def get(self, ids=None, where=None):
+        """Live ids among ``ids``, or, like Chroma, those whose metadata matches ``where`` (all live ids if neither is given).
+
+        ``where`` is ``{key: value}`` or ``{key: {"$in": [values]}}``.
+        """
+        if where is None:
+            if ids is None:
+                return {"ids": list(self.id_to_row)}
+            return {"ids": [row_id for row_id in ids if row_id in self.id_to_row]}
+        (key, condition), = where.items()
+        allowed = condition["$in"] if isinstance(condition, dict) else [condition]
+        return {"ids": [
+            row_id for row_id, row in self.id_to_row.items()
+            if (ids is None or row_id in ids) and json.loads(self._doc_lines[row])["metadata"].get(key) in allowed
+        ]}
+
+    def upsert(self, ids, embeddings, documents, metadatas=None):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("embeddings must be a 2-D array with one row per id")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        metadatas = metadatas or [{}] * len(ids)
+
+        # An id repeated within the batch keeps only its last row; otherwise the
+        # earlier rows would stay live without an id_to_row entry to tombstone them
+        last = {row_id: position for position, row_id in enumerate(ids)}
+        if len(last) < len(ids):
+            keep = sorted(last.values())
+            ids = [ids[position] for position in keep]
+            vectors = vectors[keep]
+            documents = [documents[position] for position in keep]
+            metadatas = [metadatas[position] for position in keep]
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+            replaced = [self.id_to_row[row_id] for row_id in ids if row_id in self.id_to_row]
+            first_row = len(self._row_ids)
+            doc_lines = [
+                json.dumps({"text": text, "metadata": metadata}, ensure_ascii=False).encode("utf-8")
+                for text, metadata in zip(documents, metadatas)
+            ]
+            payloads = {
+                "vectors": vectors.tobytes(),
+                "ids": "".join(f"{row_id}\n" for row_id in ids).encode("utf-8"),
+                "docs": b"".join(line + b"\n" for line in doc_lines),
+                "tombstones": "".join(f"{row}\n" for row in replaced).encode("utf-8"),
+            }
+            for name, payload in payloads.items():
+                self._append(name, payload)
+            self._commit({name: self._sizes[name] + len(payload) for name, payload in payloads.items()})
+
+            self._row_ids.extend(ids)
+            self._doc_lines.extend(doc_lines)
+            self._dead = np.concatenate([self._dead, np.zeros(len(ids), dtype=bool)])
+            self._dead[replaced] = True
+            for offset, row_id in enumerate(ids):
+                self.id_to_row[row_id] = first_row + offset
+            self._remap()
+
+    def delete(self, ids):
+        with self._lock:
+            rows = [self.id_to_row[row_id] for row_id in ids if row_id in self.id_to_row]
+            if not rows:
+                return
+            payload = "".join(f"{row}\n" for row in rows).encode("utf-8")
+            self._append("tombstones", payload)
+            self._commit({**self._sizes, "tombstones": self._sizes["tombstones"] + len(payload)})
+            for row_id in ids:
+                self.id_to_row.pop(row_id, None)
+            self._dead[rows] = True
+
+    # --------------------
+    # Search
+    # --------------------
+    def search(self, query_vector, k=5):
+        """Return ``[(id, score, Document)]`` for the ``k`` best live rows by cosine similarity."""
+        with self._lock:
+            matrix, dead = self._matrix, self._dead
+        if len(matrix) == 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = matrix @ query
+        scores[dead[: len(scores)]] = -np.inf
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (self._row_ids[row], float(scores[row]), self._document(row))
+            for row in top
+            if np.isfinite(scores[row])
+        ]
+
+    def _document(self, row):
+        doc = json.loads(self._doc_lines[row])
+        return Document(id=self._row_ids[row], page_content=doc["text"], metadata=doc["metadata"])
+
+    def similarity_search_by_vector(self, embedding, k=5):
+        return [doc for _, _, doc in self.search(embedding, k)]
+
+    # --------------------
+    # Maintenance
+    # --------------------
+    def compact(self):
+        """Rewrite the files without tombstoned rows, as the next generation."""
+        with self._lock:
+            live = np.flatnonzero(~self._dead)
+            vectors = np.array(self._matrix[live]) if len(live) else np.zeros((0, self.dim or 0), dtype=np.float32)
+            generation = self._generation + 1
+            payloads = {
+                "vectors": vectors.tobytes(),
+                "ids": "".join(f"{self._row_ids[row]}\n" for row in live).encode("utf-8"),
+                "docs": b"".join(self._doc_lines[row] + b"\n" for row in live),
+                "tombstones": b"",
+            }
+            for name, payload in payloads.items():
+                with open(self._path(name, generation), "wb") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._commit({name: len(payload) for name, payload in payloads.items()}, generation)
+
+            # Unmap the old vectors file before it is deleted (Windows can't delete a mapped file)
+            self._matrix = None
+            self._load()
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class NumpyRetriever(BaseRetriever):
+    """LangChain retriever over a :class:`NumpyVectorIndex`."""
+
+    index: NumpyVectorIndex
+    embeddings: object
+    k: int = 5
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.index.similarity_search_by_vector(self.embeddings.embed_query(query), k=self.k)
@@ -1,11 +1,15 @@
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict
-from langchain_community.chat_models import ChatOllama
-from langgraph.checkpoint.memory import InMemorySaver
 from typer import prompt
 
-# Initialize the Ollama model
-generator_model = ChatOllama(model="llama3.1", temperature=0)
+# Shared chat runtime from chatbot-ui/; run with PYTHONPATH=chatbot-ui (see README)
+from bounded_memory_saver import BoundedInMemorySaver
+from compact_serde import serializer_from_env
+from model_registry import get_chat_model
+from response_cache import cache_from_env
+
+# Initialize the Ollama model (cached when LLM_RESPONSE_CACHE is set)
+generator_model = cache_from_env(get_chat_model("llama3.1", temperature=0))
 
 class JokeState(TypedDict):
     topic: str
@@ -30,7 +34,7 @@ graph.add_edge(START, 'generate_joke')
 graph.add_edge('generate_joke', 'generate_explanation')
 graph.add_edge('generate_explanation', END)
 
-checkpointer = InMemorySaver()
+checkpointer = BoundedInMemorySaver(max_threads=50, max_bytes=64 * 1024 * 1024, serde=serializer_from_env())
 
 workflow = graph.compile(checkpointer=checkpointer)
 
@@ -38,4 +42,5 @@ workflow = graph.compile(checkpointer=checkpointer)
 config1 = {"configurable": {"thread_id": "1"}}
 print(workflow.invoke({'topic':'pizza'}, config=config1))
 print("\n\n")
-print(list(workflow.get_state_history(config=config1)))
\ No newline at end of file
+print(list(workflow.get_state_history(config=config1)))
+print(checkpointer.stats())
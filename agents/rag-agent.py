@@ -4,97 +4,181 @@ from langgraph.graph import StateGraph, END
 from typing import TypedDict, Annotated, Sequence
 from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, ToolMessage
 from operator import add as add_messages
-from langchain_community.chat_models import ChatOllama
 from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
 from langchain_core.tools import tool
+from langchain_core.runnables import RunnableLambda
+from rag_ingest import ingest_pdf, manifest_version
+from embedding_cache import CachedEmbeddings
+from numpy_index import NumpyVectorIndex, NumpyRetriever
+from bm25_index import BM25Index, HybridRetriever
+from retrieval_cache import RetrievalCache
+from corpus import ShardedCorpus, ShardedRetriever
+from context_packing import pack_context, estimate_tokens
+from tool_executor import arun_tool_calls, run_tool_calls
+from speculative import SpeculativeRetrieval
+# Shared chat runtime from chatbot-ui/; run with PYTHONPATH=chatbot-ui (see README)
+from model_registry import get_chat_model
 import json
 
 
 load_dotenv()
 
 # --------------------
-# LLM (Ollama)
+# LLM (Ollama), shared through the model registry
 # --------------------
-llm = ChatOllama(
-    model="llama3.1",
-    temperature=0
-)
+llm = get_chat_model("llama3.1", temperature=0)
 
 # --------------------
 # Embeddings (Ollama)
 # --------------------
+persist_directory = r"d:\Piyush\Coding\AI\Agent\ai-agent\agents"
+collection_name = "stock_market"
+
+if not os.path.exists(persist_directory):
+    os.makedirs(persist_directory)
+
 # Note: Make sure to pull the model first with: ollama pull mxbai-embed-large
 # Or use: ollama pull nomic-embed-text
-embeddings = OllamaEmbeddings(model="nomic-embed-text")
+# Shared on-disk memo of (model, text) -> vector, reused by every collection and re-ingest
+embeddings = CachedEmbeddings(
+    OllamaEmbeddings(model="nomic-embed-text"),
+    cache_path=os.path.join(persist_directory, "embedding_cache.sqlite")
+)
 
 pdf_path = r"d:\Piyush\Coding\AI\Agent\ai-agent\agents\Stock_Market_Performance_2024.pdf"
+manifest_path = os.path.join(persist_directory, f"{collection_name}_manifest.json")
 
-# Safety check
-if not os.path.exists(pdf_path):
-    raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+# RAG_VECTOR_BACKEND=numpy swaps Chroma for an in-process memory-mapped index
+vector_backend = os.getenv("RAG_VECTOR_BACKEND", "chroma").lower()
 
-pdf_loader = PyPDFLoader(pdf_path)
+# RAG_CORPUS_DIR points at a sharded corpus built with `python corpus.py <pdf_dir> <corpus_dir>`
+corpus_directory = os.getenv("RAG_CORPUS_DIR")
 
-# Load PDF
-try:
-    pages = pdf_loader.load()
-    print(f"PDF has been loaded and has {len(pages)} pages")
-except Exception as e:
-    print(f"Error loading PDF: {e}")
-    raise
+# pack_context de-duplicates the top chunks and fits them into a budget below the
+# plain top-5 context (about 1200 tokens); see the packed-hybrid row of bench_retrieval.py
+retrieval_k = 5
+context_token_budget = int(os.getenv("RAG_CONTEXT_TOKENS", "1000"))
 
-# --------------------
-# Chunking
-# --------------------
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=200
-)
 
-pages_split = text_splitter.split_documents(pages)
+def build_document_retriever():
+    """Open the single-PDF collection, bring it up to date and return its hybrid retriever."""
+    # Safety check
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
 
-persist_directory = r"d:\Piyush\Coding\AI\Agent\ai-agent\agents"
-collection_name = "stock_market"
-
-if not os.path.exists(persist_directory):
-    os.makedirs(persist_directory)
-
-try:
-    vectorstore = Chroma.from_documents(
-        documents=pages_split,
-        embedding=embeddings,
-        persist_directory=persist_directory,
-        collection_name=collection_name
+    try:
+        if vector_backend == "numpy":
+            vector_index = NumpyVectorIndex(os.path.join(persist_directory, f"{collection_name}_numpy"))
+            collection = vector_index
+            print("Opened NumPy vector index!")
+        else:
+            # Imported here so the numpy backend does not pay for loading chromadb
+            import chromadb
+            from langchain_chroma import Chroma
+
+            # One client for the vector store and for ingestion, which writes to the collection directly
+            client = chromadb.PersistentClient(path=persist_directory)
+            vectorstore = Chroma(
+                client=client,
+                embedding_function=embeddings,
+                collection_name=collection_name
+            )
+            collection = client.get_collection(collection_name)
+            print("Opened ChromaDB vector store!")
+    except Exception as e:
+        print(f"Error setting up vector store: {str(e)}")
+        raise
+
+    # BM25 inverted index built alongside the vectors, for numeric and ticker-heavy queries
+    lexical_index = BM25Index(os.path.join(persist_directory, f"{collection_name}_bm25.json"))
+
+    # Ingestion (skips unchanged files, re-embeds only changed chunks)
+    try:
+        ingest_pdf(
+            pdf_path,
+            collection,
+            embeddings,
+            manifest_path=manifest_path,
+            chunk_size=1000,
+            chunk_overlap=200,
+            batch_size=32,
+            max_workers=4,
+            lexical_index=lexical_index
+        )
+    except Exception as e:
+        print(f"Error ingesting PDF: {e}")
+        raise
+
+    print(f"Embedding cache: {embeddings.stats()}")
+
+    # Each side fetches 20 candidates; reciprocal-rank fusion keeps the best retrieval_k
+    if vector_backend == "numpy":
+        vector_retriever = NumpyRetriever(index=vector_index, embeddings=embeddings, k=20)
+    else:
+        vector_retriever = vectorstore.as_retriever(
+            search_type="similarity",
+            search_kwargs={"k": 20}
+        )
+
+    return HybridRetriever(
+        vector_retriever=vector_retriever,
+        lexical_index=lexical_index,
+        k=retrieval_k,
+        fetch_k=20
     )
-    print("Created ChromaDB vector store!")
-except Exception as e:
-    print(f"Error setting up ChromaDB: {str(e)}")
-    raise
+
 
 # --------------------
 # Retriever
 # --------------------
-retriever = vectorstore.as_retriever(
-    search_type="similarity",
-    search_kwargs={"k": 5}
+if corpus_directory:
+    # Shards are opened lazily on the first query, so startup does not grow with the corpus
+    corpus = ShardedCorpus(corpus_directory, embeddings)
+    retriever = ShardedRetriever(corpus=corpus, k=retrieval_k, fetch_k=20)
+    ingestion_version = corpus.version
+    print(f"Opened sharded corpus with {len(corpus.existing_shards())} shards")
+else:
+    retriever = build_document_retriever()
+    ingestion_version = lambda: manifest_version(manifest_path)
+
+# Exact + near-duplicate query cache, cleared whenever the manifest changes
+retrieval_cache = RetrievalCache(
+    embeddings,
+    max_entries=256,
+    ttl_seconds=600,
+    similarity_threshold=0.95,
+    version_fn=ingestion_version
 )
 
 
+def retrieve_documents(query):
+    return retrieval_cache.get_or_search(query, retriever.invoke)
+
+
+# RAG_SPECULATIVE=1 starts retrieving the raw question while the first LLM call is running
+speculative = SpeculativeRetrieval(retrieve_documents, similarity_threshold=0.6, embeddings=embeddings) if os.getenv("RAG_SPECULATIVE") == "1" else None
+
+
 @tool
 def retriever_tool(query: str) -> str:
     """
     This tool searches and returns the information from the Stock Market Performance 2024 document.
     """
-    docs = retriever.invoke(query)
+    docs = speculative.take(query) if speculative else None
+    if docs is None:
+        docs = retrieve_documents(query)
 
     if not docs:
         return "I found no relevant information in the Stock Market Performance 2024 document."
-    
+
+    passages = pack_context(docs, token_budget=context_token_budget)
+    print(
+        f"Packed {len(docs)} chunks (~{sum(estimate_tokens(d.page_content) for d in docs)} tokens) "
+        f"into {len(passages)} passages (~{sum(estimate_tokens(p.page_content) for p in passages)} tokens)"
+    )
+
     results = []
-    for i, doc in enumerate(docs):
+    for i, doc in enumerate(passages):
         results.append(f"Document {i+1}:\n{doc.page_content}")
     
     return "\n\n".join(results)
@@ -126,6 +210,9 @@ Please always cite the specific parts of the documents you use in your answers.
 
 tools_dict = {our_tool.name: our_tool for our_tool in tools}
 
+tool_concurrency = int(os.getenv("RAG_TOOL_CONCURRENCY", "4"))
+tool_timeout = float(os.getenv("RAG_TOOL_TIMEOUT", "30"))
+
 
 # --------------------
 # LLM Agent
@@ -139,6 +226,12 @@ tools_dict = {our_tool.name: our_tool for our_tool in tools}
 
 def call_llm(state: AgentState) -> AgentState:
     messages = [SystemMessage(content=system_prompt)] + list(state["messages"])
+
+    # First pass of a question: the model will almost always retrieve for it, so start now
+    first_pass = isinstance(state["messages"][-1], HumanMessage)
+    if speculative and first_pass:
+        speculative.start(state["messages"][-1].content)
+
     response = llm.invoke(messages)
 
     print("\n🤖 RAW MODEL OUTPUT:\n", response.content)
@@ -157,6 +250,9 @@ def call_llm(state: AgentState) -> AgentState:
     except json.JSONDecodeError:
         pass
 
+    if speculative and first_pass and not tool_messages and not getattr(response, "tool_calls", None):
+        speculative.discard()
+
     return {"messages": [response] + tool_messages}
 
 # --------------------
@@ -164,19 +260,27 @@ def call_llm(state: AgentState) -> AgentState:
 # --------------------
 def take_action(state: AgentState) -> AgentState:
     tool_calls = state['messages'][-1].tool_calls
-    results = []
 
-    for t in tool_calls:
-        print(f"Calling Tool: {t['name']} with query: {t['args'].get('query', 'No query provided')}")
-        
-        if t['name'] not in tools_dict:
-            print(f"\nTool: {t['name']} does not exist.")
-            result = "Incorrect Tool Name, Please Retry and Select tool from List of Available tools."
-        else:
-            result = tools_dict[t['name']].invoke(t['args'].get('query', ''))
-            print(f"Result length: {len(str(result))}")
+    # All tool calls of a turn run concurrently; results come back in call order
+    results = run_tool_calls(
+        tool_calls,
+        tools_dict,
+        max_concurrency=tool_concurrency,
+        timeout=tool_timeout
+    )
 
-        results.append(ToolMessage(tool_call_id=t['id'], name=t['name'], content=str(result)))
+    print("Tools Execution Complete. Back to the model!")
+    return {'messages': results}
+
+
+async def atake_action(state: AgentState) -> AgentState:
+    # Used under ainvoke / astream, where the event loop is already running
+    results = await arun_tool_calls(
+        state['messages'][-1].tool_calls,
+        tools_dict,
+        max_concurrency=tool_concurrency,
+        timeout=tool_timeout
+    )
 
     print("Tools Execution Complete. Back to the model!")
     return {'messages': results}
@@ -188,7 +292,7 @@ def take_action(state: AgentState) -> AgentState:
 graph = StateGraph(AgentState)
 
 graph.add_node("llm", call_llm)
-graph.add_node("retriever_agent", take_action)
+graph.add_node("retriever_agent", RunnableLambda(take_action, afunc=atake_action))
 
 graph.add_conditional_edges(
     "llm",
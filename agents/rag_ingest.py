@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from embedding_pipeline import embed_and_upsert
+
+
+# --------------------
+# Hashing helpers
+# --------------------
+def file_sha256(path, block_size=1 << 20):
+    """Return the sha256 hex digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def settings_key(chunk_size, chunk_overlap, embedding_model):
+    """Fingerprint of everything that changes the vectors of a chunk."""
+    raw = json.dumps(
+        {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "embedding_model": embedding_model},
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def assign_chunk_ids(chunks, settings, doc_key):
+    """Give every chunk a content-derived id.
+
+    The id depends on the ingestion settings, the document, the page and the
+    chunk text, so an unchanged chunk keeps its id across re-ingests and a
+    settings change produces all-new ids. Repeated identical chunks on a page
+    get a counter.
+    """
+    ids = []
+    seen = {}
+    for chunk in chunks:
+        page = chunk.metadata.get("page", "")
+        raw = f"{settings}\0{doc_key}\0{page}\0{chunk.page_content}"
+        base = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        seen[base] = seen.get(base, 0) + 1
+        ids.append(base if seen[base] == 1 else f"{base}-{seen[base]}")
+    return ids
+
+
+# --------------------
+# Manifest
+# --------------------
+class IngestionManifest:
+    """JSON manifest of ingested documents, keyed by absolute file path.
+
+    Each entry stores the file hash, size and mtime, the settings key and the
+    chunk ids that are currently in the vector store for that file. ``version`` is bumped
+    every time the store contents change.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.version = 0
+        self.documents = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.version = data.get("version", 0)
+            self.documents = data.get("documents", {})
+
+    def get(self, doc_path):
+        return self.documents.get(os.path.abspath(doc_path))
+
+    def record(self, doc_path, file_hash, settings, chunk_ids):
+        stat = os.stat(doc_path)
+        self.documents[os.path.abspath(doc_path)] = {
+            "file_hash": file_hash,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "settings": settings,
+            "chunk_ids": chunk_ids,
+        }
+        self.version += 1
+
+    def remove(self, doc_path):
+        """Forget ``doc_path``; returns its entry (None if it wasn't recorded)."""
+        entry = self.documents.pop(os.path.abspath(doc_path), None)
+        if entry is not None:
+            self.version += 1
+        return entry
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "documents": self.documents}, f)
+        os.replace(tmp_path, self.path)
+
+
+def manifest_version(manifest_path):
+    """Cheap marker that changes every time the manifest is saved (0 if there is none)."""
+    try:
+        return os.stat(manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def stat_unchanged(entry, doc_path, settings):
+    """True if ``doc_path`` has the recorded size/mtime and settings, so hashing can be skipped."""
+    if not entry or entry["settings"] != settings:
+        return False
+    stat = os.stat(doc_path)
+    return entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+
+
+def _store_has_ids(collection, ids):
+    """Cheap check that the store still holds what the manifest says it does."""
+    if not ids:
+        return True
+    return bool(collection.get(ids=ids[:1])["ids"])
+
+
+# --------------------
+# Ingestion
+# --------------------
+def iter_page_chunks(pdf_path, text_splitter):
+    """Yield ``(page, chunks)`` one page at a time, without loading the whole PDF."""
+    for page in PyPDFLoader(pdf_path).lazy_load():
+        yield page, text_splitter.split_documents([page])
+
+
+def ingest_pdf(
+    pdf_path,
+    collection,
+    embeddings,
+    manifest_path,
+    chunk_size=1000,
+    chunk_overlap=200,
+    batch_size=32,
+    max_workers=4,
+    window_size=256,
+    lexical_index=None,
+    save_lexical_index=True,
+):
+    """Bring ``collection`` up to date with ``pdf_path``.
+
+    Unchanged files are skipped without loading or embedding anything. For a
+    changed file only chunks with new ids are embedded, and chunks that no
+    longer exist are deleted. ``collection`` is a Chroma collection (or
+    anything with the same ``get``/``upsert``/``delete`` methods).
+
+    Pages are read lazily and new chunks are embedded and upserted every
+    ``window_size`` chunks, so memory stays flat for large files and the
+    collection becomes queryable while ingestion is still running.
+
+    ``lexical_index`` (e.g. a ``BM25Index``) is kept in sync with the same
+    chunk ids and saved at the end, unless ``save_lexical_index`` is false
+    because the caller saves it once after a batch of files. Returns the
+    number of chunks embedded.
+    """
+    manifest = IngestionManifest(manifest_path)
+    embedding_model = getattr(embeddings, "model", type(embeddings).__name__)
+    settings = settings_key(chunk_size, chunk_overlap, embedding_model)
+    entry = manifest.get(pdf_path)
+
+    stores = [collection] if lexical_index is None else [collection, lexical_index]
+    discarded_ids = []
+    if entry and not all(_store_has_ids(store, entry["chunk_ids"]) for store in stores):
+        print("Vector store is missing indexed chunks, re-ingesting from scratch")
+        discarded_ids = entry["chunk_ids"]
+        entry = None
+
+    if stat_unchanged(entry, pdf_path, settings):
+        print(f"{os.path.basename(pdf_path)} is unchanged, skipping ingestion")
+        return 0
+
+    file_hash = file_sha256(pdf_path)
+    if entry and entry["file_hash"] == file_hash and entry["settings"] == settings:
+        # Touched but identical: refresh size/mtime so the next run skips hashing
+        manifest.record(pdf_path, file_hash, settings, entry["chunk_ids"])
+        manifest.save()
+        print(f"{os.path.basename(pdf_path)} is unchanged, skipping ingestion")
+        return 0
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
+    )
+    old_ids = set(entry["chunk_ids"]) if entry else set()
+    chunk_ids = []
+    window_ids = []
+    window_chunks = []
+    embedded = 0
+    n_pages = 0
+
+    def flush_window():
+        nonlocal embedded
+        embedded += embed_and_upsert(
+            window_ids,
+            window_chunks,
+            embeddings,
+            collection,
+            batch_size=batch_size,
+            max_workers=max_workers,
+            progress=None,
+        )
+        if lexical_index is not None and window_ids:
+            lexical_index.upsert(
+                ids=window_ids,
+                documents=[chunk.page_content for chunk in window_chunks],
+                metadatas=[chunk.metadata for chunk in window_chunks],
+            )
+        window_ids.clear()
+        window_chunks.clear()
+        print(f"\rEmbedded {embedded} chunks from {n_pages} pages", end="", flush=True)
+
+    for page, chunks in iter_page_chunks(pdf_path, text_splitter):
+        n_pages += 1
+        page_ids = assign_chunk_ids(chunks, settings, os.path.abspath(pdf_path))
+        chunk_ids.extend(page_ids)
+        for chunk_id, chunk in zip(page_ids, chunks):
+            if chunk_id not in old_ids:
+                window_ids.append(chunk_id)
+                window_chunks.append(chunk)
+        if len(window_ids) >= window_size:
+            flush_window()
+    flush_window()
+    print()
+
+    new_ids = set(chunk_ids)
+    stale_ids = list((old_ids | set(discarded_ids)) - new_ids)
+    if stale_ids:
+        for store in stores:
+            store.delete(ids=stale_ids)
+    removed = set(stale_ids)
+    if entry is None:
+        # Without a manifest entry the store may still hold rows for this file from an
+        # ingest that never recorded their ids (e.g. Chroma.from_documents' random ids)
+        sources = list({pdf_path, os.path.abspath(pdf_path)})
+        for store in stores:
+            leftover_ids = [i for i in store.get(where={"source": {"$in": sources}})["ids"] if i not in new_ids]
+            if leftover_ids:
+                store.delete(ids=leftover_ids)
+                removed.update(leftover_ids)
+    if lexical_index is not None and save_lexical_index:
+        lexical_index.save()
+
+    manifest.record(pdf_path, file_hash, settings, chunk_ids)
+    manifest.save()
+    print(f"Embedded {embedded} new chunks from {n_pages} pages, removed {len(removed)} stale chunks")
+    return embedded
@@ -0,0 +1,115 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(query):
+    """Lowercase, collapse whitespace and drop surrounding punctuation."""
+    return re.sub(r"\s+", " ", query.lower()).strip(" \t?!.,;:")
+
+
+def unit_vector(embeddings, query):
+    """Query embedding as a float32 unit vector, so a dot product is the cosine similarity."""
+    vector = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+class RetrievalCache:
+    """Two-level cache in front of a retrieval function.
+
+    1. Exact match on the normalised query text.
+    2. Semantic reuse: if the query embedding is within ``similarity_threshold``
+       cosine similarity of a cached query, that query's results are returned.
+
+    Entries expire after ``ttl_seconds`` and the cache holds at most
+    ``max_entries`` (least recently used are dropped first). When
+    ``version_fn()`` returns something new, e.g. after a re-ingest, the whole
+    cache is cleared. Pass an embedder wrapped in ``CachedEmbeddings``, so the
+    query vector computed here is reused by the retriever itself.
+    """
+
+    def __init__(self, embeddings, max_entries=256, ttl_seconds=600, similarity_threshold=0.95, version_fn=None):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.version_fn = version_fn
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()  # normalised query -> (created, unit vector, docs)
+        self._version = version_fn() if version_fn else None
+        self._lock = threading.Lock()
+
+    def stats(self):
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def _expire(self, now):
+        expired = [key for key, (created, _, _) in self._entries.items() if now - created > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def _semantic_match(self, vector):
+        if not self._entries:
+            return None
+        keys = list(self._entries)
+        matrix = np.stack([self._entries[key][1] for key in keys])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            return keys[best]
+        return None
+
+    def get_or_search(self, query, search_fn):
+        """Return cached results for ``query`` or call ``search_fn(query)`` and cache them."""
+        key = normalize_query(query)
+        now = time.time()
+
+        with self._lock:
+            self._check_version()
+            self._expire(now)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return self._entries[key][2]
+
+        vector = unit_vector(self.embeddings, query)
+
+        with self._lock:
+            match = self._semantic_match(vector)
+            if match is not None:
+                self._entries.move_to_end(match)
+                self.semantic_hits += 1
+                return self._entries[match][2]
+            self.misses += 1
+
+        docs = search_fn(query)
+
+        with self._lock:
+            self._entries[key] = (now, vector, docs)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return docs
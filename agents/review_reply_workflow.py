@@ -1,13 +1,16 @@
 from langgraph.graph import StateGraph, START, END
-from langchain_ollama import ChatOllama
 from typing import TypedDict, Literal
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 
+# Shared chat runtime from chatbot-ui/; run with PYTHONPATH=chatbot-ui (see README)
+from model_registry import get_chat_model
+from response_cache import cache_from_env
+
 load_dotenv()
 
-# Use Llama 3.1 locally via Ollama
-model = ChatOllama(model="llama3.1", temperature=0)
+# Use Llama 3.1 locally via Ollama (cached when LLM_RESPONSE_CACHE is set)
+model = cache_from_env(get_chat_model("llama3.1", temperature=0))
 
 # ---------- Schemas ----------
 
@@ -0,0 +1,77 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from bm25_index import tokenize
+from retrieval_cache import unit_vector
+
+
+def query_similarity(a, b):
+    """Token-set Jaccard similarity between two queries."""
+    tokens_a, tokens_b = set(tokenize(a)), set(tokenize(b))
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+class SpeculativeRetrieval:
+    """Start a retrieval for the user's question while the LLM is still deciding what to do.
+
+    ``start(question)`` runs ``retrieve_fn(question)`` in the background.
+    ``take(query)`` returns that result if ``query`` is at least
+    ``similarity_threshold`` token-Jaccard similar to the prefetched question
+    or, with ``embeddings``, at least ``embedding_threshold`` cosine similar
+    (the model usually rewrites the question into a search query, which
+    rarely shares enough tokens), waiting for it if it is still running.
+    Otherwise it returns ``None`` and the caller retrieves normally. Each
+    prefetch is offered to one ``take`` only, hit or miss, and only the latest
+    question is kept, because a new user turn makes any older prefetch
+    irrelevant.
+    """
+
+    def __init__(self, retrieve_fn, similarity_threshold=0.6, embeddings=None, embedding_threshold=0.85):
+        self.retrieve_fn = retrieve_fn
+        self.similarity_threshold = similarity_threshold
+        self.embeddings = embeddings
+        self.embedding_threshold = embedding_threshold
+        self.hits = 0
+        self.misses = 0
+        self._pending = None  # (question, future)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+
+    def start(self, question):
+        with self._lock:
+            self._pending = (question, self._executor.submit(self.retrieve_fn, question))
+
+    def discard(self):
+        with self._lock:
+            if self._pending is not None:
+                self._pending[1].cancel()
+            self._pending = None
+
+    def _matches(self, question, query):
+        if query_similarity(question, query) >= self.similarity_threshold:
+            return True
+        if self.embeddings is None:
+            return False
+        # Both embeddings are usually cache hits: retrieval embeds the same strings
+        score = float(unit_vector(self.embeddings, question) @ unit_vector(self.embeddings, query))
+        return score >= self.embedding_threshold
+
+    def take(self, query):
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is None:
+            return None
+        question, future = pending
+        if not self._matches(question, query):
+            future.cancel()
+            self.misses += 1
+            return None
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Prefetched retrieval failed ({e}), retrieving again")
+            return None
+        self.hits += 1
+        return result
@@ -0,0 +1,85 @@
+import hashlib
+import math
+import random
+import struct
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class StubEmbeddings(Embeddings):
+    """Deterministic, dependency-free embedder for benchmarks.
+
+    Vectors are derived from a hash of the text, so the same text always maps
+    to the same unit vector. ``latency`` is slept once per call and
+    ``per_text_latency`` once per text, which roughly mimics a local embedding
+    server round trip. ``failure_rate`` makes calls raise at random so retry
+    paths can be exercised.
+    """
+
+    def __init__(self, size=384, latency=0.0, per_text_latency=0.0, failure_rate=0.0, seed=0):
+        self.size = size
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.failure_rate = failure_rate
+        self.model = f"stub-{size}"
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def _vector(self, text):
+        values = []
+        counter = 0
+        while len(values) < self.size:
+            block = hashlib.sha256(f"{counter}\0{text}".encode("utf-8")).digest()
+            values.extend(v / 2**31 for v in struct.unpack("<8i", block))
+            counter += 1
+        values = values[: self.size]
+        norm = math.sqrt(sum(v * v for v in values)) or 1.0
+        return [v / norm for v in values]
+
+    def _simulate_call(self, n_texts):
+        self.calls += 1
+        delay = self.latency + self.per_text_latency * n_texts
+        if delay:
+            time.sleep(delay)
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise ConnectionError("stub embedder: simulated failure")
+
+    def embed_documents(self, texts):
+        self._simulate_call(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self._simulate_call(1)
+        return self._vector(text)
+
+
+class BagOfWordsEmbeddings(StubEmbeddings):
+    """Stub embedder where texts that share words, or synonyms, get similar vectors.
+
+    Every word maps to a fixed pseudo-random unit vector (from its hash);
+    words in the same ``synonyms`` group share one. A text's vector is the
+    normalised sum over its words. Unlike :class:`StubEmbeddings`, a query
+    that paraphrases a chunk lands near it, so retrieval quality can be
+    measured offline.
+    """
+
+    def __init__(self, size=384, synonyms=(), **kwargs):
+        super().__init__(size=size, **kwargs)
+        self._canonical = {word: group[0] for group in synonyms for word in group}
+        self._word_vectors = {}
+
+    def _word_vector(self, word):
+        word = self._canonical.get(word, word)
+        if word not in self._word_vectors:
+            self._word_vectors[word] = np.asarray(super()._vector(word), dtype=np.float32)
+        return self._word_vectors[word]
+
+    def _vector(self, text):
+        words = [word.strip(".,;:") for word in text.lower().split()]
+        total = np.zeros(self.size, dtype=np.float32)
+        for word in words:
+            if word:
+                total += self._word_vector(word)
+        return (total / (np.linalg.norm(total) or 1.0)).tolist()
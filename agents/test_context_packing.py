@@ -0,0 +1,21 @@
+from langchain_core.documents import Document
+
+from context_packing import estimate_tokens, pack_context
+
+
+def words(start, stop):
+    return " ".join(f"word{i}" for i in range(start, stop))
+
+
+def test_oversized_first_chunk_is_cut_to_the_budget():
+    passages = pack_context([Document(page_content=words(0, 500), metadata={"page": 0})], token_budget=100)
+    assert len(passages) == 1
+    assert estimate_tokens(passages[0].page_content) <= 100
+    assert passages[0].page_content.startswith("word0 word1")
+
+
+def test_chunk_containing_a_selected_one_replaces_it():
+    short = Document(page_content=words(10, 20), metadata={"page": 0, "start_index": 60})
+    longer = Document(page_content=words(0, 40), metadata={"page": 0, "start_index": 0})
+    passages = pack_context([short, longer], token_budget=1000)
+    assert [passage.page_content for passage in passages] == [longer.page_content]
@@ -0,0 +1,95 @@
+import heapq
+import os
+import random
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import bm25_index
+import corpus as corpus_module
+from bm25_index import BM25Index, merge_term_stats
+from corpus import ShardedCorpus
+from stub_embeddings import StubEmbeddings
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Stock_Market_Performance_2024.pdf")
+
+
+def test_sharded_bm25_matches_one_index(tmp_path):
+    rng = random.Random(0)
+    vocabulary = [f"term{i}" for i in range(60)]
+    whole = BM25Index(str(tmp_path / "whole.json"))
+    shards = [BM25Index(str(tmp_path / f"shard{i}.json")) for i in range(4)]
+    for doc in range(400):
+        # Each shard leans on a different part of the vocabulary, so local IDFs disagree
+        shard = doc % 4
+        words = rng.choices(vocabulary[shard * 10: shard * 10 + 30], k=rng.randint(5, 40))
+        whole.upsert([f"d{doc}"], [" ".join(words)])
+        shards[shard].upsert([f"d{doc}"], [" ".join(words)])
+
+    for query in ("term5 term12", "term25 term31 term39", "term0 term59", "term20"):
+        stats = merge_term_stats(shard.term_stats(query) for shard in shards)
+        merged = list(heapq.merge(*(shard.search(query, 10, stats=stats) for shard in shards), key=lambda hit: -hit[1]))[:10]
+        expected = whole.search(query, 10)
+        assert [score for _, score, _ in merged] == pytest.approx([score for _, score, _ in expected])
+        assert {doc_id for doc_id, _, _ in merged} == {doc_id for doc_id, _, _ in expected}
+
+
+def test_ingest_saves_each_shard_once(tmp_path, monkeypatch):
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    pdf_paths = []
+    for i in range(6):
+        path = pdf_dir / f"report-{i}.pdf"
+        shutil.copy(SAMPLE_PDF, path)
+        pdf_paths.append(str(path))
+
+    saves = []
+    original_save = bm25_index.BM25Index.save
+    monkeypatch.setattr(bm25_index.BM25Index, "save", lambda self: (saves.append(self.path), original_save(self))[1])
+
+    corpus = ShardedCorpus(str(tmp_path / "corpus"), StubEmbeddings(size=32), n_shards=3)
+    assert corpus.ingest(pdf_paths) > 0
+    shards_used = {corpus.shard_for(path) for path in pdf_paths}
+    assert len(saves) == len(shards_used) == len(set(saves))
+
+    # A fresh corpus over the same directory reads the saved indexes back
+    reopened = ShardedCorpus(str(tmp_path / "corpus"), StubEmbeddings(size=32), n_shards=3)
+    assert reopened.search("stock market performance", k=3)
+    assert corpus.ingest(pdf_paths) == 0
+
+
+def test_deleted_pdf_is_removed_from_its_shard(tmp_path):
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    pdf_paths = []
+    for i in range(3):
+        path = pdf_dir / f"report-{i}.pdf"
+        shutil.copy(SAMPLE_PDF, path)
+        pdf_paths.append(str(path))
+
+    corpus = ShardedCorpus(str(tmp_path / "corpus"), StubEmbeddings(size=32), n_shards=2)
+    corpus.ingest(pdf_paths)
+    shard = corpus.shard(corpus.shard_for(pdf_paths[0]))
+    count_before = shard.vector_index.count()
+
+    os.remove(pdf_paths[0])
+    assert corpus.ingest(pdf_paths[1:]) == 0
+
+    for store in (shard.vector_index, shard.lexical_index):
+        assert not store.get(where={"source": pdf_paths[0]})["ids"]
+    assert shard.vector_index.count() < count_before
+    reopened = ShardedCorpus(str(tmp_path / "corpus"), StubEmbeddings(size=32), n_shards=2)
+    assert all(doc.metadata["source"] != pdf_paths[0] for doc in reopened.search("stock market performance", k=10, fetch_k=50))
+
+
+def test_shards_load_concurrently(tmp_path, monkeypatch):
+    # Each load waits for the other: this only completes if two shards can load at the same time
+    barrier = threading.Barrier(2, timeout=10)
+    monkeypatch.setattr(corpus_module, "Shard", lambda directory: (barrier.wait(), directory)[1])
+    corpus = ShardedCorpus(str(tmp_path / "corpus"), StubEmbeddings(size=32), n_shards=2)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        loaded = list(executor.map(corpus.shard, [0, 1]))
+    assert loaded == [corpus._shard_dir(0), corpus._shard_dir(1)]
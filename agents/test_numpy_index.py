@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+
+from numpy_index import NumpyVectorIndex
+
+
+def vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_get_without_filters_returns_all_live_ids(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    index.upsert(["a", "b", "c"], vectors(3), ["x", "y", "z"], [{"source": "1"}, {"source": "2"}, {"source": "1"}])
+    index.delete(["b"])
+
+    assert sorted(index.get()["ids"]) == ["a", "c"]
+    assert index.get(ids=["a", "b"])["ids"] == ["a"]
+    assert sorted(index.get(where={"source": "1"})["ids"]) == ["a", "c"]
+
+
+def test_uncommitted_append_is_dropped_on_open(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    index.upsert(["a", "b"], vectors(2), ["x", "y"])
+    # A write that crashed before its manifest commit: data files appended, manifest unchanged
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(vectors(1).tobytes())
+    with open(tmp_path / "ids.txt", "a", encoding="utf-8") as f:
+        f.write("c\n")
+
+    reopened = NumpyVectorIndex(str(tmp_path))
+    assert sorted(reopened.get()["ids"]) == ["a", "b"]
+    reopened.upsert(["d"], vectors(1, seed=1), ["w"])
+    assert [row_id for row_id, _, _ in reopened.search(vectors(1, seed=1)[0], k=1)] == ["d"]
+    assert sorted(NumpyVectorIndex(str(tmp_path)).get()["ids"]) == ["a", "b", "d"]
+
+
+def test_compact_switches_generation_and_keeps_rows(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    data = vectors(4)
+    index.upsert(["a", "b", "c", "d"], data, ["w", "x", "y", "z"])
+    index.upsert(["a"], data[3:], ["w2"])
+    index.delete(["b"])
+
+    index.compact()
+    index.upsert(["e"], vectors(1, seed=2), ["v"])
+
+    assert not os.path.exists(tmp_path / "vectors.f32")
+    for reader in (index, NumpyVectorIndex(str(tmp_path))):
+        assert sorted(reader.get()["ids"]) == ["a", "c", "d", "e"]
+        assert reader._dead.sum() == 0
+        row_id, score, doc = reader.search(data[2], k=1)[0]
+        assert (row_id, doc.page_content) == ("c", "y") and score > 0.99
+
+
+def test_repeated_id_in_one_batch_keeps_the_last_row(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    data = vectors(3)
+    index.upsert(["a", "b", "a"], data, ["old", "y", "new"])
+
+    # The first "a" row must not come back from a search for its vector
+    hits = index.search(data[0], k=3)
+    assert sorted((row_id, doc.page_content) for row_id, _, doc in hits) == [("a", "new"), ("b", "y")]
+    assert sorted(NumpyVectorIndex(str(tmp_path)).get()["ids"]) == ["a", "b"]
@@ -0,0 +1,65 @@
+import os
+import shutil
+import uuid
+
+import chromadb
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from bm25_index import BM25Index
+from numpy_index import NumpyVectorIndex
+from rag_ingest import IngestionManifest, ingest_pdf
+from stub_embeddings import StubEmbeddings
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Stock_Market_Performance_2024.pdf")
+
+
+def sample_pdf(tmp_path):
+    path = str(tmp_path / "report.pdf")
+    shutil.copy(SAMPLE_PDF, path)
+    return path
+
+
+def test_first_ingest_removes_rows_with_unrecorded_ids(tmp_path):
+    pdf_path = sample_pdf(tmp_path)
+    embeddings = StubEmbeddings(size=32)
+    collection = chromadb.EphemeralClient().get_or_create_collection(f"legacy-{uuid.uuid4().hex}")
+
+    # What the old Chroma.from_documents setup left behind: the same chunks under random ids
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(PyPDFLoader(pdf_path).load())
+    collection.add(
+        ids=[str(uuid.uuid4()) for _ in chunks],
+        documents=[chunk.page_content for chunk in chunks],
+        metadatas=[chunk.metadata for chunk in chunks],
+        embeddings=embeddings.embed_documents([chunk.page_content for chunk in chunks]),
+    )
+    collection.add(ids=["other"], documents=["another file"], metadatas=[{"source": "other.pdf"}], embeddings=[embeddings.embed_query("x")])
+
+    manifest_path = str(tmp_path / "manifest.json")
+    ingest_pdf(pdf_path, collection, embeddings, manifest_path)
+
+    chunk_ids = IngestionManifest(manifest_path).get(pdf_path)["chunk_ids"]
+    assert sorted(collection.get(where={"source": pdf_path})["ids"]) == sorted(chunk_ids)
+    assert collection.get(ids=["other"])["ids"] == ["other"]
+
+
+def test_reingest_from_scratch_leaves_no_orphans(tmp_path):
+    pdf_path = sample_pdf(tmp_path)
+    embeddings = StubEmbeddings(size=32)
+    vectors = NumpyVectorIndex(str(tmp_path / "vectors"))
+    lexical = BM25Index(str(tmp_path / "bm25.json"))
+    manifest_path = str(tmp_path / "manifest.json")
+    ingest_pdf(pdf_path, vectors, embeddings, manifest_path, lexical_index=lexical)
+    chunk_ids = IngestionManifest(manifest_path).get(pdf_path)["chunk_ids"]
+
+    # Rows under ids the manifest doesn't know, plus a lost chunk that forces a from-scratch re-ingest
+    stray = {"id": "stray", "text": "old text", "metadata": {"source": pdf_path}}
+    vectors.upsert([stray["id"]], embeddings.embed_documents([stray["text"]]), [stray["text"]], [stray["metadata"]])
+    lexical.upsert([stray["id"]], [stray["text"]], [stray["metadata"]])
+    vectors.delete([chunk_ids[0]])
+    lexical.delete([chunk_ids[0]])
+
+    ingest_pdf(pdf_path, vectors, embeddings, manifest_path, lexical_index=lexical)
+    for store in (vectors, lexical):
+        assert sorted(store.get(where={"source": pdf_path})["ids"]) == sorted(chunk_ids)
+        assert store.count() == len(chunk_ids)
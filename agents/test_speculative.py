@@ -0,0 +1,35 @@
+from speculative import SpeculativeRetrieval
+
+
+class TopicEmbeddings:
+    """Embeds every query about the same topic to nearly the same vector."""
+
+    topics = {"stock": [1.0, 0.1, 0.0], "weather": [0.0, 1.0, 0.1]}
+
+    def embed_query(self, text):
+        return next(vector for topic, vector in self.topics.items() if topic in text.lower())
+
+
+def test_take_discards_the_prefetch_on_a_miss():
+    speculative = SpeculativeRetrieval(lambda question: [question])
+    speculative.start("how did the stock market do in 2024")
+    assert speculative.take("weather forecast for tomorrow") is None
+    # The stale prefetch must not be handed to a later query in the same turn
+    assert speculative.take("how did the stock market do in 2024") is None
+    assert (speculative.hits, speculative.misses) == (0, 1)
+
+
+def test_rewritten_query_matches_by_embedding():
+    question = "How did the stock market perform in 2024?"
+    rewritten = "2024 annual stock index returns summary"
+
+    without = SpeculativeRetrieval(lambda question: [question])
+    without.start(question)
+    assert without.take(rewritten) is None
+
+    speculative = SpeculativeRetrieval(lambda question: [question], embeddings=TopicEmbeddings())
+    speculative.start(question)
+    assert speculative.take(rewritten) == [question]
+    speculative.start(question)
+    assert speculative.take("weather this weekend") is None
+    assert (speculative.hits, speculative.misses) == (1, 1)
@@ -0,0 +1,28 @@
+import asyncio
+
+from langchain_core.tools import tool
+
+from tool_executor import arun_tool_calls, run_tool_calls
+
+
+@tool
+def echo(query: str) -> str:
+    """Return the query."""
+    return query
+
+
+CALLS = [{"name": "echo", "args": {"query": f"q{i}"}, "id": str(i)} for i in range(3)]
+
+
+def test_runs_inside_a_running_event_loop():
+    async def node():
+        # A sync node called from an async graph, e.g. under ainvoke or Streamlit's loop
+        return run_tool_calls(CALLS, {"echo": echo})
+
+    assert [message.content for message in asyncio.run(node())] == ["q0", "q1", "q2"]
+
+
+def test_async_variant_keeps_call_order():
+    messages = asyncio.run(arun_tool_calls(CALLS + [{"name": "missing", "args": {}, "id": "3"}], {"echo": echo}))
+    assert [message.tool_call_id for message in messages] == ["0", "1", "2", "3"]
+    assert messages[-1].content.startswith("Incorrect Tool Name")
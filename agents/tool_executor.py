@@ -0,0 +1,73 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import ToolMessage
+
+# Shared pool for sync tools. Unlike the loop's default executor, asyncio.run does
+# not wait for it on exit, so a timed-out tool cannot hold up the turn.
+_tool_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="tool")
+# Runs the event loop for run_tool_calls when the calling thread already has one
+_loop_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tool-loop")
+
+
+async def _run_tool_call(tool_call, tools_dict, semaphore, timeout):
+    name = tool_call["name"]
+    query = tool_call["args"].get("query", "")
+    print(f"Calling Tool: {name} with query: {query or 'No query provided'}")
+
+    if name not in tools_dict:
+        print(f"\nTool: {name} does not exist.")
+        result = "Incorrect Tool Name, Please Retry and Select tool from List of Available tools."
+    else:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                our_tool = tools_dict[name]
+                if getattr(our_tool, "coroutine", None) is not None:
+                    call = our_tool.ainvoke(query)
+                else:
+                    call = asyncio.get_running_loop().run_in_executor(_tool_pool, our_tool.invoke, query)
+                result = await asyncio.wait_for(call, timeout)
+                print(f"Result length: {len(str(result))} ({time.perf_counter() - start:.2f}s)")
+            except asyncio.TimeoutError:
+                print(f"\nTool: {name} timed out after {timeout}s")
+                result = f"Tool {name} timed out after {timeout} seconds. Please retry with a narrower query."
+            except Exception as e:
+                print(f"\nTool: {name} failed: {e}")
+                result = f"Tool {name} failed with error: {e}"
+
+    return ToolMessage(tool_call_id=tool_call["id"], name=name, content=str(result))
+
+
+async def arun_tool_calls(tool_calls, tools_dict, max_concurrency=4, timeout=30.0, timeouts=None):
+    """Async version of :func:`run_tool_calls`, for graph nodes run with ainvoke / astream."""
+    timeouts = timeouts or {}
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return list(await asyncio.gather(*(
+        _run_tool_call(t, tools_dict, semaphore, timeouts.get(t["name"], timeout))
+        for t in tool_calls
+    )))
+
+
+def run_tool_calls(tool_calls, tools_dict, max_concurrency=4, timeout=30.0, timeouts=None):
+    """Run all tool calls of one model turn concurrently and return ToolMessages in call order.
+
+    At most ``max_concurrency`` tools run at once. Each call gets
+    ``timeouts[name]`` seconds (or ``timeout``), counted from when it actually
+    starts. A call that times out or raises becomes an error ToolMessage, so
+    the model can retry instead of the whole graph failing.
+
+    If the calling thread is already running an event loop (asyncio.run
+    would raise there), the calls run on a loop in a worker thread. Async
+    graphs should use :func:`arun_tool_calls` instead, so the loop isn't
+    blocked while the tools run.
+    """
+    def run_all():
+        return asyncio.run(arun_tool_calls(tool_calls, tools_dict, max_concurrency, timeout, timeouts))
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return run_all()
+    return _loop_pool.submit(run_all).result()
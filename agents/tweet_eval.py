@@ -1,5 +1,4 @@
 from typing import TypedDict, Literal,Annotated
-from langchain_community.chat_models import ChatOllama
 from langgraph.graph import StateGraph, START, END
 from langchain_core.messages import SystemMessage, HumanMessage
 import operator
@@ -7,10 +6,15 @@ from pydantic import BaseModel, Field
 import json
 import re
 
-# Initialize the Ollama model
-generator_model = ChatOllama(model="llama3.1", temperature=0)
-evaluator_model = ChatOllama(model="llama3.1", temperature=0)
-optimizer_model = ChatOllama(model="llama3.1", temperature=0)
+# Shared chat runtime from chatbot-ui/; run with PYTHONPATH=chatbot-ui (see README)
+from model_registry import get_chat_model
+from response_cache import cache_from_env
+
+# Initialize the Ollama model (cached when LLM_RESPONSE_CACHE is set); same model and
+# parameters, so all three roles share one client from the registry
+generator_model = cache_from_env(get_chat_model("llama3.1", temperature=0))
+evaluator_model = cache_from_env(get_chat_model("llama3.1", temperature=0))
+optimizer_model = cache_from_env(get_chat_model("llama3.1", temperature=0))
 
 class TweetEvaluation(BaseModel):
     evaluation: Literal["approved", "needs_improvement"] = Field(..., description="Final evaluation result.")
@@ -0,0 +1,139 @@
+"""Load test for chat_server.py with a stub LLM.
+
+Usage: python bench_chat_server.py [sessions ...] [--turns 3]
+
+Starts a ChatServer in-process over the same graph shape as
+chat_bot_backend.py (history manager, delta messages, bounded in-memory
+checkpointer), with StubChatModel in place of Ollama. Each simulated
+session sends ``turns`` messages one after another over SSE. Prints time
+to first token percentiles, turns/s and failures for each session count,
+then checks that disconnecting clients cancel their generation.
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, START, StateGraph
+
+from bounded_memory_saver import BoundedInMemorySaver
+from chat_server import ChatServer
+from delta_messages import messages_reducer
+from history_manager import HistoryManager
+from stub_chat_model import StubChatModel
+
+
+class ChatState(TypedDict):
+    messages: Annotated[list[BaseMessage], messages_reducer()]
+    summary: str
+    summarized_count: int
+
+
+def build_chatbot(model):
+    history = HistoryManager(model, keep_turns=4, token_budget=3000)
+
+    async def achat_node(state: ChatState):
+        return {"messages": [await model.ainvoke(history.prompt_messages(state))]}
+
+    def chat_node(state: ChatState):
+        return {"messages": [model.invoke(history.prompt_messages(state))]}
+
+    checkpointer = BoundedInMemorySaver()
+    graph = StateGraph(ChatState)
+    graph.add_node("chat_node", RunnableLambda(chat_node, afunc=achat_node))
+    graph.add_node("compact_history", RunnableLambda(history.compact, afunc=history.acompact))
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", "compact_history")
+    graph.add_edge("compact_history", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+async def send_message(port, thread_id, content, disconnect_after_first_token=False):
+    """Returns (seconds to first token, seconds total, tokens received, final event)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps({"content": content}).encode()
+    start = time.perf_counter()
+    writer.write(
+        f"POST /threads/{thread_id}/messages HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    first_token, tokens, event = None, 0, None
+    try:
+        status_line = await reader.readline()
+        if b" 200 " not in status_line:
+            return None, time.perf_counter() - start, 0, status_line.decode().strip()
+        await reader.readuntil(b"\r\n\r\n")
+        while True:
+            block = await reader.readuntil(b"\n\n")
+            event = block.split(b"\n", 1)[0].decode().removeprefix("event: ")
+            if event == "token":
+                tokens += 1
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                    if disconnect_after_first_token:
+                        return first_token, time.perf_counter() - start, tokens, "disconnected"
+            else:
+                break
+    except asyncio.IncompleteReadError:
+        event = "eof"
+    finally:
+        writer.close()
+    return first_token, time.perf_counter() - start, tokens, event
+
+
+async def session(port, session_id, turns, results):
+    for turn in range(turns):
+        results.append(await send_message(port, f"bench-{session_id}", f"Question {turn} from session {session_id}"))
+
+
+async def run_level(server, port, n_sessions, turns):
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*(session(port, f"{n_sessions}-{i}", turns, results) for i in range(n_sessions)))
+    elapsed = time.perf_counter() - start
+    ttfts = sorted(r[0] for r in results if r[3] == "done")
+    failures = sum(1 for r in results if r[3] != "done")
+    p = lambda q: ttfts[min(int(q * len(ttfts)), len(ttfts) - 1)] * 1000 if ttfts else float("nan")
+    print(
+        f"sessions={n_sessions:<5} turns/s={len(ttfts) / elapsed:7.1f}  ttft p50={p(0.5):7.1f}ms "
+        f"p95={p(0.95):7.1f}ms p99={p(0.99):7.1f}ms  failures={failures}"
+    )
+
+
+async def main(args):
+    model = StubChatModel(first_token_latency=args.first_token_latency, token_latency=args.token_latency, tokens=args.tokens)
+    server = ChatServer(build_chatbot(model), max_concurrency=args.max_concurrency, queue_timeout=120)
+    port = await server.start(port=0)
+
+    for n_sessions in args.sessions:
+        await run_level(server, port, n_sessions, args.turns)
+
+    # Disconnects: every generation started for a client that left should be cancelled
+    calls_before = model.calls
+    await asyncio.gather(*(send_message(port, f"leaver-{i}", "hello", disconnect_after_first_token=True) for i in range(50)))
+    await asyncio.sleep(0.5)
+    print(f"disconnects: 50 clients left after the first token, server cancelled {server.stats['cancelled']}, "
+          f"{model.calls - calls_before} generations started, active now {server.stats['active']}")
+
+    # Graceful shutdown: replies already streaming are allowed to finish
+    in_flight = [asyncio.create_task(send_message(port, f"closing-{i}", "last words")) for i in range(20)]
+    await asyncio.sleep(args.first_token_latency / 2)
+    await server.shutdown()
+    finished = [r[3] for r in await asyncio.gather(*in_flight)]
+    print(f"shutdown: {finished.count('done')}/20 in-flight replies completed")
+    print(f"server stats: {server.stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test chat_server.py with a stub LLM")
+    parser.add_argument("sessions", nargs="*", type=int, default=[10, 100, 300, 500])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--max-concurrency", type=int, default=512)
+    parser.add_argument("--first-token-latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--tokens", type=int, default=40)
+    asyncio.run(main(parser.parse_args()))
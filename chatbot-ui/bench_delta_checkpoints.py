@@ -0,0 +1,68 @@
+"""Per-turn checkpoint cost over a long conversation: full message lists vs deltas.
+
+Usage: python bench_delta_checkpoints.py [turns] [snapshot_every]
+
+Runs one thread for ``turns`` turns with a stub model and prints, for each
+tenth of the run, the average checkpoint bytes written per turn, the average
+turn time and the time to read the thread's head state.
+"""
+import os
+import sys
+import tempfile
+import time
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from chat_checkpointer import ChatSqliteSaver
+from delta_messages import MessageDeltaChannel, add_message_batches
+
+
+def build_chatbot(reducer, checkpointer):
+    class ChatState(TypedDict):
+        messages: Annotated[list[BaseMessage], reducer]
+
+    def chat_node(state: ChatState):
+        return {"messages": [AIMessage(content="stub reply " * 40)]}
+
+    graph = StateGraph(ChatState)
+    graph.add_node("chat_node", chat_node)
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def stored_bytes(saver):
+    with saver.cursor(transaction=False) as cur:
+        cur.execute("SELECT (SELECT COALESCE(SUM(LENGTH(checkpoint)), 0) FROM checkpoints) + (SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes)")
+        return cur.fetchone()[0]
+
+
+def run(name, reducer, turns):
+    saver = ChatSqliteSaver.from_database(os.path.join(tempfile.mkdtemp(prefix="delta_bench_"), "bench.db"))
+    chatbot = build_chatbot(reducer, saver)
+    config = {"configurable": {"thread_id": "long-chat"}}
+    window = max(turns // 10, 1)
+    print(f"\n{name}")
+    print(f"{'turns':>8} {'bytes/turn':>12} {'ms/turn':>9} {'read head ms':>13}")
+    bytes_before, start = stored_bytes(saver), time.perf_counter()
+    for turn in range(1, turns + 1):
+        chatbot.invoke({"messages": [HumanMessage(content=f"question {turn} " * 10)]}, config=config)
+        if turn % window == 0:
+            elapsed = time.perf_counter() - start
+            bytes_now = stored_bytes(saver)
+            read_start = time.perf_counter()
+            chatbot.get_state(config)
+            read_ms = (time.perf_counter() - read_start) * 1000
+            print(f"{turn:>8} {(bytes_now - bytes_before) / window:>12.0f} {elapsed / window * 1000:>9.2f} {read_ms:>13.2f}")
+            bytes_before, start = stored_bytes(saver), time.perf_counter()
+    print(f"total stored: {stored_bytes(saver) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    snapshot_every = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    run("add_messages (full list per checkpoint)", add_messages, turns)
+    run(f"delta channel (snapshot every >= {snapshot_every} updates)", MessageDeltaChannel(add_message_batches, snapshot_frequency=snapshot_every), turns)
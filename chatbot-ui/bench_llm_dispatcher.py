@@ -0,0 +1,148 @@
+"""Benchmark llm_dispatcher.py against a simulated batching model server.
+
+Usage: python bench_llm_dispatcher.py [--rate 4] [--requests 100]
+
+SimulatedServer behaves like a llama.cpp/Ollama runner with ``slots``
+parallel sequences: every decode step advances all running sequences by
+one token, and admitting new sequences costs a prefill step that stalls
+everyone else. Prefilling several sequences at once costs barely more
+than one, so requests that arrive together are much cheaper than the same
+requests trickling in a few ms apart. Requests beyond the free slots wait.
+
+Requests arrive as a Poisson stream from many concurrent sessions, sent
+either straight to the model or through an LLMDispatcher with different
+batch windows and in-flight limits. Prints tokens/s, time to first token
+and total latency percentiles for each setup.
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from llm_dispatcher import LLMDispatcher
+
+
+class SimulatedServer:
+    def __init__(self, slots=4, prefill_s=0.04, prefill_per_seq_s=0.005, step_s=0.012, step_per_seq_s=0.002):
+        self.slots = slots
+        self.prefill_s = prefill_s
+        self.prefill_per_seq_s = prefill_per_seq_s
+        self.step_s = step_s
+        self.step_per_seq_s = step_per_seq_s
+        self.prefills = 0
+        self._waiting = deque()
+        self._wakeup = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, tokens, emit):
+        """``emit(token)`` is called from the server thread for each token, then ``emit(None)``."""
+        with self._wakeup:
+            self._waiting.append([tokens, emit])
+            self._wakeup.notify()
+
+    def _run(self):
+        running = []
+        while True:
+            with self._wakeup:
+                while not running and not self._waiting:
+                    self._wakeup.wait()
+                admitted = []
+                while self._waiting and len(running) + len(admitted) < self.slots:
+                    admitted.append(self._waiting.popleft())
+            if admitted:
+                self.prefills += 1
+                time.sleep(self.prefill_s + self.prefill_per_seq_s * len(admitted))
+                running.extend(admitted)
+            time.sleep(self.step_s + self.step_per_seq_s * len(running))
+            for sequence in running:
+                sequence[1](f" tok{sequence[0]}")
+                sequence[0] -= 1
+                if sequence[0] == 0:
+                    sequence[1](None)
+            running = [sequence for sequence in running if sequence[0] > 0]
+
+
+class SimulatedServerModel(BaseChatModel):
+    server: SimulatedServer
+    tokens: int = 30
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @property
+    def _llm_type(self):
+        return "simulated-server"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError("the benchmark only streams")
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        content = "".join([chunk.message.content async for chunk in self._astream(messages)])
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        tokens = asyncio.Queue()
+        self.server.submit(self.tokens, lambda token: loop.call_soon_threadsafe(tokens.put_nowait, token))
+        while (token := await tokens.get()) is not None:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+async def one_request(model, i, results):
+    start = time.perf_counter()
+    first = None
+    async for _ in model.astream([HumanMessage(content=f"question {i}")]):
+        if first is None:
+            first = time.perf_counter() - start
+    results.append((first, time.perf_counter() - start))
+
+
+async def run(name, model, server, args):
+    rng = random.Random(0)
+    results = []
+    prefills_before = server.prefills
+    start = time.perf_counter()
+    tasks = []
+    for i in range(args.requests):
+        tasks.append(asyncio.create_task(one_request(model, i, results)))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    ttft = sorted(r[0] for r in results)
+    total = sorted(r[1] for r in results)
+    p = lambda values, q: values[min(int(q * len(values)), len(values) - 1)] * 1000
+    print(
+        f"{name:<28} tokens/s={len(results) * args.tokens / elapsed:6.0f}  prefills={server.prefills - prefills_before:4d}  "
+        f"ttft p50={p(ttft, 0.5):6.0f}ms p95={p(ttft, 0.95):6.0f}ms  total p50={p(total, 0.5):6.0f}ms p95={p(total, 0.95):6.0f}ms"
+    )
+
+
+async def main(args):
+    server = SimulatedServer(slots=args.slots, prefill_s=args.prefill_ms / 1000, step_s=args.step_ms / 1000)
+    model = SimulatedServerModel(server=server, tokens=args.tokens)
+    print(f"{args.requests} requests at {args.rate}/s, {args.tokens} tokens each, server slots={args.slots}")
+    await run("direct", model, server, args)
+    for max_in_flight in (args.slots, args.slots * 2):
+        for window_ms in (0, 5, 20, 50):
+            dispatcher = LLMDispatcher(model=model, batch_window=window_ms / 1000, max_in_flight=max_in_flight)
+            await run(f"window={window_ms}ms in_flight={max_in_flight}", dispatcher, server, args)
+            stats = dispatcher.stats()
+            print(f"{'':<28} batches={stats['batches']} avg batch={stats['avg_batch_size']:.2f} "
+                  f"avg queue wait={stats['avg_queue_wait_ms']:.0f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the LLM dispatcher against a simulated batching server")
+    parser.add_argument("--rate", type=float, default=4.0, help="requests per second")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--tokens", type=int, default=30)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--prefill-ms", type=float, default=150.0, help="server time to admit new sequences")
+    parser.add_argument("--step-ms", type=float, default=12.0, help="server time per decode step")
+    asyncio.run(main(parser.parse_args()))
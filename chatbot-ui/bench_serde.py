@@ -0,0 +1,111 @@
+"""Checkpoint serializer benchmark on synthetic conversations.
+
+Usage: python bench_serde.py [turns] [repeats]
+
+Serializes two kinds of payload for each serializer: full checkpoints of a
+conversation at several lengths (what add_messages threads store) and the
+one-message writes a delta-encoded thread stores per step. Prints bytes per
+payload and encode/decode time in microseconds.
+"""
+import random
+import sys
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from compact_serde import CompressedSerializer, zstandard
+
+WORDS = (
+    "the a to of and in is it you that for on with as are this be at or have from by not but what all "
+    "were when we there can an your which their said if do will each about how up out them then she many "
+    "some so these would other into has more her two like him see time could no make than first been its"
+).split()
+
+
+def sentence(rng, n_words):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+
+
+def ai_message(rng, turn):
+    n = rng.randint(40, 300)
+    return AIMessage(
+        content=sentence(rng, n),
+        id=f"run-{rng.getrandbits(64):016x}-0",
+        response_metadata={
+            "model": "llama3.1", "created_at": f"2025-06-01T12:{turn % 60:02d}:00.000Z", "done": True,
+            "done_reason": "stop", "total_duration": rng.randint(10**9, 10**10),
+            "load_duration": rng.randint(10**6, 10**8), "prompt_eval_count": rng.randint(10, 4000),
+            "prompt_eval_duration": rng.randint(10**6, 10**9), "eval_count": n,
+            "eval_duration": rng.randint(10**8, 10**10), "message": {"role": "assistant", "content": ""},
+        },
+        usage_metadata={"input_tokens": 100, "output_tokens": n, "total_tokens": 100 + n},
+    )
+
+
+def conversation(turns, seed=0):
+    rng = random.Random(seed)
+    messages = []
+    for turn in range(turns):
+        messages.append(HumanMessage(content=sentence(rng, rng.randint(5, 40)), id=f"{rng.getrandbits(128):032x}"))
+        messages.append(ai_message(rng, turn))
+    return messages
+
+
+def full_checkpoint(messages):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": messages, "branch:to:chat_node": None}
+    checkpoint["channel_versions"] = {"messages": f"{len(messages):032}.0.1", "__start__": "00000000000000000000000000000002.0.2"}
+    return checkpoint
+
+
+def measure(serde, payloads, repeats):
+    encoded = [serde.dumps_typed(payload) for payload in payloads]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for payload in payloads:
+            serde.dumps_typed(payload)
+    encode_us = (time.perf_counter() - start) / (repeats * len(payloads)) * 1e6
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for blob in encoded:
+            serde.loads_typed(blob)
+    decode_us = (time.perf_counter() - start) / (repeats * len(payloads)) * 1e6
+    return sum(len(blob) for _, blob in encoded) / len(encoded), encode_us, decode_us
+
+
+class _NoDictionary(CompressedSerializer):
+    """zlib without the shared dictionary, to show what the dictionary adds."""
+
+    def __init__(self):
+        super().__init__(codec="zlib")
+        self.codecs["zlib1"].dictionary = b""
+
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    serializers = {
+        "msgpack (current)": JsonPlusSerializer(),
+        "msgpack+zlib, no dict": _NoDictionary(),
+        "msgpack+zlib+dict": CompressedSerializer(codec="zlib"),
+    }
+    if zstandard is not None:
+        serializers["msgpack+zstd+dict"] = CompressedSerializer(codec="zstd")
+
+    messages = conversation(turns)
+    workloads = {
+        f"full checkpoint, {n} turns": [full_checkpoint(messages[:2 * n])] for n in (1, 10, turns // 2, turns)
+    }
+    workloads["delta write (1 message)"] = [[message] for message in messages]
+
+    for workload, payloads in workloads.items():
+        print(f"\n{workload}")
+        print(f"{'serializer':<24} {'bytes':>10} {'ratio':>7} {'encode us':>11} {'decode us':>11}")
+        baseline = None
+        for name, serde in serializers.items():
+            size, encode_us, decode_us = measure(serde, payloads, repeats)
+            baseline = baseline or size
+            print(f"{name:<24} {size:>10.0f} {baseline / size:>6.2f}x {encode_us:>11.1f} {decode_us:>11.1f}")
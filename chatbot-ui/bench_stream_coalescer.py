@@ -0,0 +1,61 @@
+"""Compare raw token streaming with stream_coalescer.coalesce_stream.
+
+Usage: python bench_stream_coalescer.py [--tokens 400] [--token-latency 0.005]
+
+Streams a reply from the chatbot graph (StubChatModel in place of Ollama)
+with stream_mode="messages" and feeds it to a stand-in for st.write_stream,
+which, like Streamlit, re-sends the whole reply text on every update.
+Prints UI updates, bytes sent to the browser and CPU time spent rendering
+for the raw stream and a few flush intervals, and checks the final text is
+identical.
+"""
+import argparse
+import json
+import time
+
+from langchain_core.messages import HumanMessage
+
+from bench_chat_server import build_chatbot
+from stream_coalescer import chunk_text, coalesce_stream
+from stub_chat_model import StubChatModel
+
+
+def write_stream(pieces):
+    """What st.write_stream does per piece: append, then serialize the full text for the browser."""
+    text, updates, sent_bytes, render_cpu = "", 0, 0, 0.0
+    for piece in pieces:
+        start = time.process_time()
+        text += piece
+        message = json.dumps({"delta": {"markdown": {"body": text}}}).encode()
+        render_cpu += time.process_time() - start
+        updates += 1
+        sent_bytes += len(message)
+    return text, updates, sent_bytes, render_cpu
+
+
+def main(args):
+    model = StubChatModel(first_token_latency=0.05, token_latency=args.token_latency, tokens=args.tokens)
+    chatbot = build_chatbot(model)
+
+    def stream(thread_id):
+        return chatbot.stream(
+            {"messages": [HumanMessage(content="Tell me a long story")]},
+            config={"configurable": {"thread_id": thread_id}},
+            stream_mode="messages",
+        )
+
+    raw_text, updates, sent, cpu = write_stream(chunk_text(chunk) for chunk, _ in stream("raw"))
+    print(f"{'raw tokens':<22} updates={updates:5d}  sent={sent / 1024:8.1f} KiB  render cpu={cpu * 1000:7.1f} ms")
+    for interval_ms in (20, 50, 100):
+        text, updates, sent, cpu = write_stream(coalesce_stream(stream(f"coalesced-{interval_ms}"), flush_interval=interval_ms / 1000))
+        print(
+            f"{f'coalesced {interval_ms} ms':<22} updates={updates:5d}  sent={sent / 1024:8.1f} KiB  render cpu={cpu * 1000:7.1f} ms"
+            f"  same text={text == raw_text}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark token chunk coalescing for Streamlit streaming")
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--token-latency", type=float, default=0.005, help="seconds between tokens")
+    main(parser.parse_args())
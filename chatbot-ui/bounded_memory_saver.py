@@ -0,0 +1,220 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+
+class BoundedInMemorySaver(InMemorySaver):
+    """InMemorySaver that keeps at most ``max_threads`` threads / ``max_bytes`` in memory.
+
+    Past either limit the least recently used threads are spilled to a
+    SQLite file and loaded back the next time a checkpoint of theirs is read
+    or written, so callers see the same behaviour as InMemorySaver. Sizes
+    are the serialized bytes the saver holds, so they shrink with a
+    compressing serde.
+
+    By default the spill file is a private temporary file, deleted by
+    :meth:`close` or when the process exits, so like InMemorySaver nothing
+    survives a restart. A ``spill_path`` is used as given and never deleted;
+    threads an earlier run spilled there are picked up again. Don't share one
+    between processes.
+    """
+
+    def __init__(self, spill_path=None, max_threads=200, max_bytes=256 * 1024 * 1024, *, serde=None):
+        super().__init__(serde=serde)
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.reloads = 0
+        self._lru = OrderedDict()  # thread_id -> bytes held in memory
+        self._keys = {}  # thread_id -> keys of its entries in self.writes / self.blobs
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+        if spill_path is None:
+            fd, spill_path = tempfile.mkstemp(prefix="checkpoint_spill_", suffix=".db")
+            os.close(fd)
+            owned = True
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(spill_path)), exist_ok=True)
+            owned = False
+        self.spill_path = spill_path
+        self._spill = sqlite3.connect(spill_path, check_same_thread=False)
+        self._spill.execute("PRAGMA journal_mode=WAL")
+        self._spill.execute("CREATE TABLE IF NOT EXISTS spilled_threads (thread_id TEXT PRIMARY KEY, nbytes INTEGER, data BLOB)")
+        self._spill.commit()
+        self._closer = weakref.finalize(self, _close_spill, self._spill, spill_path if owned else None)
+
+    def close(self):
+        """Close the spill file, deleting it if the saver created it."""
+        with self._lock:
+            self._closer()
+
+    # --------------------
+    # Accounting, eviction and reload
+    # --------------------
+    def _touch(self, thread_id, create=True):
+        """Make sure ``thread_id`` is in memory and mark it most recently used.
+
+        With ``create=False`` (reads) a thread that doesn't exist yet is not registered.
+        """
+        if thread_id in self._lru:
+            self._lru.move_to_end(thread_id)
+            return
+        row = self._spill.execute("SELECT nbytes, data FROM spilled_threads WHERE thread_id = ?", (thread_id,)).fetchone()
+        if row is None:
+            if create:
+                self._lru[thread_id] = 0
+            return
+        nbytes, data = row
+        spilled = pickle.loads(data)
+        self.storage[thread_id].update(spilled["storage"])
+        self.writes.update(spilled["writes"])
+        self.blobs.update(spilled["blobs"])
+        self._keys[thread_id] = {("writes", key) for key in spilled["writes"]} | {("blobs", key) for key in spilled["blobs"]}
+        self._lru[thread_id] = nbytes
+        self._bytes += nbytes
+        self._spill.execute("DELETE FROM spilled_threads WHERE thread_id = ?", (thread_id,))
+        self._spill.commit()
+        self.reloads += 1
+
+    def _grow(self, thread_id, nbytes):
+        self._lru[thread_id] = self._lru.get(thread_id, 0) + nbytes
+        self._bytes += nbytes
+
+    def _evict(self, thread_id):
+        keys = self._keys.pop(thread_id, set())
+        spilled = {
+            "storage": self.storage.pop(thread_id, {}),
+            "writes": {key: self.writes.pop(key) for kind, key in keys if kind == "writes" and key in self.writes},
+            "blobs": {key: self.blobs.pop(key) for kind, key in keys if kind == "blobs" and key in self.blobs},
+        }
+        nbytes = self._lru.pop(thread_id)
+        self._spill.execute(
+            "INSERT OR REPLACE INTO spilled_threads (thread_id, nbytes, data) VALUES (?, ?, ?)",
+            (thread_id, nbytes, pickle.dumps(spilled, protocol=pickle.HIGHEST_PROTOCOL)),
+        )
+        self._spill.commit()
+        self._bytes -= nbytes
+        self.evictions += 1
+
+    def _forget_unknown(self, thread_id):
+        """Drop the empty entry InMemorySaver's defaultdict storage leaves behind when reading an unknown thread."""
+        if thread_id not in self._lru:
+            self.storage.pop(thread_id, None)
+
+    def _enforce_limits(self, keep):
+        while len(self._lru) > 1 and (len(self._lru) > self.max_threads or self._bytes > self.max_bytes):
+            thread_id = next(iter(self._lru))
+            if thread_id == keep:
+                self._lru.move_to_end(keep)
+                thread_id = next(iter(self._lru))
+            self._evict(thread_id)
+
+    def stats(self):
+        with self._lock:
+            spilled_threads, spilled_bytes = self._spill.execute("SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM spilled_threads").fetchone()
+            return {
+                "threads_in_memory": len(self._lru),
+                "bytes_in_memory": self._bytes,
+                "threads_on_disk": spilled_threads,
+                "bytes_on_disk": spilled_bytes,
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+            }
+
+    # --------------------
+    # InMemorySaver API
+    # --------------------
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._touch(thread_id, create=False)
+            # A reload can take the saver over its limits; spill others to make room
+            self._enforce_limits(keep=thread_id)
+            result = super().get_tuple(config)
+            self._forget_unknown(thread_id)
+            return result
+
+    def get_delta_channel_history(self, *, config, channels):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._touch(thread_id, create=False)
+            self._enforce_limits(keep=thread_id)
+            result = super().get_delta_channel_history(config=config, channels=channels)
+            self._forget_unknown(thread_id)
+            return result
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        with self._lock:
+            if config:
+                thread_id = config["configurable"]["thread_id"]
+                self._touch(thread_id, create=False)
+                self._enforce_limits(keep=thread_id)
+                results = list(super().list(config, filter=filter, before=before, limit=limit))
+                self._forget_unknown(thread_id)
+            else:
+                # Every thread, including spilled ones, loaded one at a time
+                spilled = [row[0] for row in self._spill.execute("SELECT thread_id FROM spilled_threads")]
+                results = []
+                for thread_id in list(self._lru) + spilled:
+                    if limit is not None and len(results) >= limit:
+                        break
+                    self._touch(thread_id)
+                    thread_config = {"configurable": {"thread_id": thread_id}}
+                    remaining = None if limit is None else limit - len(results)
+                    results.extend(super().list(thread_config, filter=filter, before=before, limit=remaining))
+                    self._enforce_limits(keep=thread_id)
+        yield from results
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            self._touch(thread_id)
+            saved_config = super().put(config, checkpoint, metadata, new_versions)
+            stored_checkpoint, stored_metadata, _ = self.storage[thread_id][checkpoint_ns][checkpoint["id"]]
+            nbytes = len(stored_checkpoint[1]) + len(stored_metadata[1])
+            keys = self._keys.setdefault(thread_id, set())
+            for channel, version in new_versions.items():
+                key = (thread_id, checkpoint_ns, channel, version)
+                keys.add(("blobs", key))
+                nbytes += len(self.blobs[key][1])
+            self._grow(thread_id, nbytes)
+            self._enforce_limits(keep=thread_id)
+        return saved_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        key = (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+        with self._lock:
+            self._touch(thread_id)
+            before = sum(len(write[2][1]) for write in self.writes.get(key, {}).values())
+            super().put_writes(config, writes, task_id, task_path)
+            after = sum(len(write[2][1]) for write in self.writes.get(key, {}).values())
+            self._keys.setdefault(thread_id, set()).add(("writes", key))
+            self._grow(thread_id, after - before)
+            self._enforce_limits(keep=thread_id)
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            super().delete_thread(thread_id)
+            self._keys.pop(thread_id, None)
+            self._bytes -= self._lru.pop(thread_id, 0)
+            self._spill.execute("DELETE FROM spilled_threads WHERE thread_id = ?", (thread_id,))
+            self._spill.commit()
+
+
+def _close_spill(conn, owned_path):
+    conn.close()
+    if owned_path:
+        for path in (owned_path, owned_path + "-wal", owned_path + "-shm"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -1,27 +1,78 @@
 from langgraph.graph import StateGraph, START, END
 from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
 from typing import TypedDict,Annotated
-from langchain_community.chat_models import ChatOllama
-from langgraph.checkpoint.memory import InMemorySaver
-from langgraph.graph.message import add_messages
+from bounded_memory_saver import BoundedInMemorySaver
+import os
+from compact_serde import serializer_from_env
+from delta_messages import messages_reducer
+from history_manager import HistoryManager
+from llm_dispatcher import dispatcher_from_env
+from model_registry import get_chat_model
+from response_cache import cache_from_env
 
-# Initialize the Ollama model
-generator_model = ChatOllama(model="llama3.1", temperature=0)
+# Initialize the Ollama model behind one dispatcher shared by every session,
+# which batches concurrent calls and caps them at the server's slot count.
+# Repeated prompts are answered from the response cache when LLM_RESPONSE_CACHE is set.
+generator_model = cache_from_env(dispatcher_from_env(get_chat_model("llama3.1", temperature=0)))
+
+# Last K turns verbatim plus a rolling summary of older ones, within a token budget.
+# The summary is updated every N turns, in the background after the reply.
+history = HistoryManager(
+    generator_model,
+    keep_turns=int(os.getenv("CHAT_KEEP_TURNS", "4")),
+    token_budget=int(os.getenv("CHAT_TOKEN_BUDGET", "3000")),
+    summarize_every=int(os.getenv("CHAT_SUMMARIZE_EVERY", "2")),
+)
 
 class ChatState(TypedDict):
-    messages: Annotated[list[BaseMessage], add_messages]
+    messages: Annotated[list[BaseMessage], messages_reducer()]
+    summary: str
+    summarized_count: int
 
 def chat_node(state:ChatState):
-    message = state["messages"]
+    message = history.prompt_messages(state)
     response = generator_model.invoke(message)
     return {"messages": [response]}
 
+async def achat_node(state:ChatState):
+    message = history.prompt_messages(state)
+    response = await generator_model.ainvoke(message)
+    return {"messages": [response]}
+
 
-checkpointer = InMemorySaver()
+# Least recently used threads beyond these limits are spilled to disk and reloaded on access
+# (a private temp file unless CHECKPOINT_SPILL_PATH names one)
+checkpointer = BoundedInMemorySaver(
+    os.getenv("CHECKPOINT_SPILL_PATH"),
+    max_threads=int(os.getenv("CHECKPOINT_MAX_THREADS", "200")),
+    max_bytes=int(os.getenv("CHECKPOINT_MAX_MB", "256")) * 1024 * 1024,
+    serde=serializer_from_env(),
+)
 
 graph = StateGraph(ChatState)
-graph.add_node("chat_node", chat_node)
+# Sync nodes for the Streamlit scripts (stream), async ones for chat_server.py (astream)
+graph.add_node("chat_node", RunnableLambda(chat_node, afunc=achat_node))
+graph.add_node("compact_history", RunnableLambda(history.compact, afunc=history.acompact))
 graph.add_edge(START, "chat_node")
-graph.add_edge("chat_node", END)
+graph.add_edge("chat_node", "compact_history")
+graph.add_edge("compact_history", END)
+
+chatbot = graph.compile(checkpointer=checkpointer)
+
+
+def retrive_messages_page(thread_id, limit=20, before=None):
+    """Up to ``limit`` messages before index ``before`` (default: newest), oldest first.
 
-chatbot = graph.compile(checkpointer=checkpointer)
\ No newline at end of file
+    Not paged underneath: this backend has no message log, so every call
+    rebuilds the thread's whole state with get_state and slices it. Only
+    what the UI converts and renders is limited. A log kept next to the
+    checkpoints would hold message text outside BoundedInMemorySaver's
+    memory bound, so threads that are long enough for this to matter should
+    use the SQLite backend (db_connectivity_chatbot_backend.py), which pages
+    from an indexed table.
+    """
+    messages = chatbot.get_state(config={"configurable": {"thread_id": thread_id}}).values.get("messages", [])
+    end = len(messages) if before is None else before
+    start = max(end - limit, 0)
+    return [{"seq": i, "type": m.type, "content": str(m.content)} for i, m in enumerate(messages[start:end], start)]
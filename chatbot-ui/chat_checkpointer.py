@@ -0,0 +1,517 @@
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+import types
+from contextlib import contextmanager
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.base import WRITES_IDX_MAP
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from delta_messages import add_message_batches
+
+try:
+    import fcntl
+except ImportError:  # Windows: processes fall back to SQLite's busy handler
+    fcntl = None
+
+
+class SqliteConnectionPool:
+    """At most ``max_connections`` connections to ``database``, checked out per operation.
+
+    :meth:`acquire` lends a thread an idle connection (opening one while
+    fewer than ``max_connections`` exist, otherwise waiting for one to come
+    back) and takes it back when the block ends. Nested blocks on the same
+    thread reuse its connection, so a transaction and every read made inside
+    it stay on one connection. Threads don't keep connections: LangGraph
+    writes from short-lived executor threads and every Streamlit rerun runs
+    on a new thread, and each connection holds a file descriptor, its page
+    cache and an mmap.
+
+    Connections run in autocommit mode (transactions are opened explicitly by
+    the saver) with WAL and tuned pragmas, so readers never block the writer
+    and concurrent writers wait on ``busy_timeout`` instead of failing with
+    "database is locked". Needs a file path, since each ``:memory:``
+    connection would be a separate database.
+
+    Writers take :meth:`writing` before ``BEGIN IMMEDIATE``: a Python lock
+    for the threads of one process, then an ``flock`` on a lock file next to
+    the database for other processes. Both block until the holder releases
+    and then hand over at once. SQLite's busy handler polls with sleeps of
+    up to 100 ms, which made writers wait several times longer than their
+    transaction took; it is now only a fallback (no ``fcntl``, or writers
+    that don't use the pool).
+
+    ``stats`` counts connections and write transactions, with the time spent
+    waiting for the write lock (Python lock plus ``BEGIN IMMEDIATE``), inside
+    transactions and in ``COMMIT``.
+    """
+
+    def __init__(self, database, max_connections=8, synchronous="NORMAL", cache_size_kib=64 * 1024, mmap_size=256 * 1024 * 1024, busy_timeout_ms=10_000):
+        self.database = database
+        self.max_connections = max_connections
+        self.pragmas = [
+            "PRAGMA journal_mode=WAL",
+            f"PRAGMA synchronous={synchronous}",
+            f"PRAGMA cache_size=-{cache_size_kib}",
+            f"PRAGMA mmap_size={mmap_size}",
+            f"PRAGMA busy_timeout={busy_timeout_ms}",
+            "PRAGMA temp_store=MEMORY",
+        ]
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        # Most recently returned first, so busy periods reuse connections with warm caches
+        self._idle = queue.LifoQueue()
+        self.write_lock = threading.Lock()
+        self._lock_file = None
+        self.stats = {"connections": 0, "transactions": 0, "lock_wait_s": 0.0, "transaction_s": 0.0, "commit_s": 0.0}
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._connections) < self.max_connections:
+                conn = self._open()
+                self._connections.append(conn)
+                self.stats["connections"] += 1
+                return conn
+        return self._idle.get()
+
+    @contextmanager
+    def acquire(self):
+        """Lend this thread a connection for the block; nested blocks get the same one."""
+        # The holder is captured here, so the release is right even if a suspended
+        # generator (SqliteSaver.list) is finished on another thread
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            holder = self._local.holder = types.SimpleNamespace(conn=None, depth=0)
+        if holder.conn is None:
+            holder.conn = self._checkout()
+        holder.depth += 1
+        try:
+            yield holder.conn
+        finally:
+            holder.depth -= 1
+            if not holder.depth:
+                conn, holder.conn = holder.conn, None
+                self._idle.put(conn)
+
+    def connection(self):
+        """The connection this thread has checked out with :meth:`acquire`."""
+        holder = getattr(self._local, "holder", None)
+        if holder is None or holder.conn is None:
+            raise RuntimeError("No connection checked out on this thread; use SqliteConnectionPool.acquire()")
+        return holder.conn
+
+    @contextmanager
+    def writing(self):
+        """Hold the write lock of this process and, where ``fcntl`` exists, of every process."""
+        with self.write_lock:
+            if fcntl is None:
+                yield
+                return
+            if self._lock_file is None:
+                self._lock_file = open(os.fspath(self.database) + "-writelock", "a")
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+            self._idle = queue.LifoQueue()
+        with self.write_lock:
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+        self._local = threading.local()
+
+
+class ThreadRegistry:
+    """One row per chat thread, kept up to date on every message write.
+
+    The sidebar reads this table instead of scanning and deserializing every
+    checkpoint, so listing threads costs O(page size) whatever the size of
+    the checkpoint history.
+    """
+
+    def __init__(self, saver):
+        self.saver = saver
+
+    def setup(self, cur):
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS thread_registry (
+                thread_id TEXT PRIMARY KEY,
+                title TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                message_count INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS thread_registry_updated_at ON thread_registry (updated_at DESC)")
+
+    def record(self, cur, thread_id, message_count=None, title=None):
+        """Upsert a thread's row; the title is only set once and a None count keeps the stored one."""
+        now = time.time()
+        cur.execute(
+            """
+            INSERT INTO thread_registry (thread_id, title, created_at, updated_at, message_count)
+            VALUES (?, ?, ?, ?, COALESCE(?, 0))
+            ON CONFLICT(thread_id) DO UPDATE SET
+                title = COALESCE(thread_registry.title, excluded.title),
+                updated_at = excluded.updated_at,
+                message_count = COALESCE(?, thread_registry.message_count)
+            """,
+            (thread_id, title, now, now, message_count, message_count),
+        )
+
+    def list_threads(self, limit=20, offset=0):
+        """Most recently updated threads first, as dicts."""
+        with self.saver.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT thread_id, title, created_at, updated_at, message_count FROM thread_registry "
+                "ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+                (limit, offset),
+            )
+            columns = [column[0] for column in cur.description]
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+    def backfill(self):
+        """Register threads written before the registry existed (one-off scan)."""
+        with self.saver.cursor(transaction=False) as cur:
+            cur.execute("SELECT COUNT(*) FROM thread_registry")
+            if cur.fetchone()[0]:
+                return
+            cur.execute("SELECT DISTINCT thread_id FROM checkpoints WHERE checkpoint_ns = ''")
+            thread_ids = [row[0] for row in cur.fetchall()]
+
+        for thread_id in thread_ids:
+            _, messages = self.saver.saved_messages({"configurable": {"thread_id": thread_id}})
+            with self.saver.cursor() as cur:
+                self.record(cur, thread_id, len(messages), thread_title(messages))
+
+
+class MessageLog:
+    """Append-only copy of each thread's messages, indexed by (thread_id, seq).
+
+    Filled from the checkpointer's message writes, so the UI can page through
+    a thread (newest first) with one indexed query instead of rebuilding and
+    converting the whole message list from the checkpoint.
+
+    LangGraph saves writes from background threads, so a turn's input and
+    reply can arrive in either order. Each row keeps the position of its
+    write (checkpoint id, task, index) and ``seq`` follows that order.
+    """
+
+    def __init__(self, saver):
+        self.saver = saver
+
+    def setup(self, cur):
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS thread_messages (
+                thread_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                message_id TEXT,
+                type TEXT NOT NULL,
+                content TEXT NOT NULL,
+                position TEXT,
+                PRIMARY KEY (thread_id, seq)
+            )
+            """
+        )
+        cur.execute("PRAGMA table_info(thread_messages)")
+        if "position" not in {row[1] for row in cur.fetchall()}:
+            cur.execute("ALTER TABLE thread_messages ADD COLUMN position TEXT")
+        cur.execute("CREATE INDEX IF NOT EXISTS thread_messages_message_id ON thread_messages (thread_id, message_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS thread_messages_position ON thread_messages (thread_id, position)")
+
+    def has_thread(self, cur, thread_id):
+        cur.execute("SELECT 1 FROM thread_messages WHERE thread_id = ? LIMIT 1", (thread_id,))
+        return cur.fetchone() is not None
+
+    def append(self, cur, thread_id, messages, position="/"):
+        """Add ``messages`` at write position ``position`` (sorts like checkpoint ids; the default sorts first).
+
+        Returns the thread's message count.
+        """
+        cur.execute(
+            "SELECT (SELECT MAX(seq) FROM thread_messages WHERE thread_id = ?), "
+            "(SELECT MAX(position) FROM thread_messages WHERE thread_id = ?)",
+            (thread_id, thread_id),
+        )
+        last_seq, last_position = cur.fetchone()
+        end = 0 if last_seq is None else last_seq + 1
+        for i, message in enumerate(messages):
+            message_id, content = getattr(message, "id", None), str(getattr(message, "content", message))
+            # add_messages replaces a message that reuses an id; mirror that
+            if message_id is not None and end:
+                cur.execute(
+                    "UPDATE thread_messages SET content = ? WHERE thread_id = ? AND message_id = ?",
+                    (content, thread_id, message_id),
+                )
+                if cur.rowcount:
+                    continue
+            message_position = f"{position}{i:08d}"
+            seq = None
+            if last_position is not None and message_position < last_position:
+                cur.execute("SELECT MIN(seq) FROM thread_messages WHERE thread_id = ? AND position > ?", (thread_id, message_position))
+                seq = cur.fetchone()[0]
+            if seq is None:
+                seq = end
+                last_position = message_position
+            else:
+                # Saved after a later write: shift the rows after it up by one (via negative seqs to keep keys unique)
+                cur.execute("UPDATE thread_messages SET seq = -seq - 1 WHERE thread_id = ? AND seq >= ?", (thread_id, seq))
+                cur.execute("UPDATE thread_messages SET seq = -seq WHERE thread_id = ? AND seq < 0", (thread_id,))
+            cur.execute(
+                "INSERT INTO thread_messages (thread_id, seq, message_id, type, content, position) VALUES (?, ?, ?, ?, ?, ?)",
+                (thread_id, seq, message_id, getattr(message, "type", "human"), content, message_position),
+            )
+            end += 1
+        return end
+
+    def page(self, thread_id, limit=20, before=None):
+        """Up to ``limit`` messages older than seq ``before`` (default: the newest), oldest first."""
+        with self.saver.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT seq, type, content FROM thread_messages WHERE thread_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (thread_id, before if before is not None else 2**62, limit),
+            )
+            return [{"seq": seq, "type": type_, "content": content} for seq, type_, content in reversed(cur.fetchall())]
+
+    def backfill(self, thread_id, messages):
+        """Copy in a thread written before the log existed."""
+        with self.saver.cursor() as cur:
+            if not self.has_thread(cur, thread_id):
+                self.append(cur, thread_id, messages)
+
+
+def stored_messages(checkpoint):
+    """The messages list stored in a checkpoint, or None when it only holds a delta."""
+    messages = checkpoint["channel_values"].get("messages")
+    # Delta-encoded threads store a snapshot wrapper every few checkpoints and nothing in between
+    return getattr(messages, "value", messages)
+
+
+def thread_title(messages, max_length=60):
+    """First user message, shortened, used as the thread's title."""
+    for message in messages:
+        if isinstance(message, HumanMessage):
+            text = " ".join(str(message.content).split())
+            return text if len(text) <= max_length else text[: max_length - 1] + "…"
+    return None
+
+
+class ChatSqliteSaver(SqliteSaver):
+    """SqliteSaver for concurrent chat sessions.
+
+    - Each operation checks a connection out of a :class:`SqliteConnectionPool`
+      instead of all sessions sharing one connection behind one lock.
+    - Writes run in ``BEGIN IMMEDIATE`` transactions. :meth:`batch` groups
+      several writes into one transaction. ``put_writes`` uses it to store a
+      message write with its ``thread_messages`` rows and ``thread_registry``
+      row in a single commit; the registry's count is the log's length, so it
+      stays exact when writes are saved out of order.
+    """
+
+    def __init__(self, pool, **kwargs):
+        self.pool = pool
+        self._local = threading.local()
+        self._setup_lock = threading.Lock()
+        super().__init__(None, **kwargs)
+        self.registry = ThreadRegistry(self)
+        self.messages = MessageLog(self)
+
+    @classmethod
+    def from_database(cls, database, serde=None, **pool_kwargs):
+        return cls(SqliteConnectionPool(database, **pool_kwargs), serde=serde)
+
+    # SqliteSaver reads self.conn directly in a few places, always inside cursor() or setup();
+    # route those to the connection this thread has checked out
+    @property
+    def conn(self):
+        return self.pool.connection()
+
+    @conn.setter
+    def conn(self, value):
+        pass
+
+    def setup(self):
+        if self.is_setup:
+            return
+        with self._setup_lock:
+            if self.is_setup:
+                return
+            with self.pool.acquire() as conn:
+                super().setup()
+                cur = conn.cursor()
+                # One write transaction, so savers in other processes don't run the migrations below twice
+                with self.pool.writing():
+                    cur.execute("BEGIN IMMEDIATE")
+                    try:
+                        # Older SqliteSaver releases create ``writes`` without task_path, which put_writes stores
+                        cur.execute("PRAGMA table_info(writes)")
+                        if "task_path" not in {row[1] for row in cur.fetchall()}:
+                            cur.execute("ALTER TABLE writes ADD COLUMN task_path TEXT NOT NULL DEFAULT ''")
+                        self.registry.setup(cur)
+                        self.messages.setup(cur)
+                        cur.execute("COMMIT")
+                    except BaseException:
+                        cur.execute("ROLLBACK")
+                        raise
+                    finally:
+                        cur.close()
+
+    @contextmanager
+    def batch(self):
+        """Run every write made inside the block in one transaction (nesting is allowed)."""
+        self.setup()
+        depth = getattr(self._local, "depth", 0)
+        if depth:
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+
+        stats = self.pool.stats
+        waiting = time.perf_counter()
+        # The connection is checked out before the write lock is taken, so a
+        # writer never holds the lock while it waits for a free connection
+        with self.pool.acquire() as conn, self.pool.writing():
+            conn.execute("BEGIN IMMEDIATE")
+            started = time.perf_counter()
+            stats["lock_wait_s"] += started - waiting
+            self._local.depth = 1
+            try:
+                yield
+                committing = time.perf_counter()
+                conn.execute("COMMIT")
+                stats["commit_s"] += time.perf_counter() - committing
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._local.depth = 0
+                stats["transactions"] += 1
+                stats["transaction_s"] += time.perf_counter() - started
+
+    @contextmanager
+    def cursor(self, transaction=True):
+        self.setup()
+        with self.pool.acquire() as conn:
+            if transaction:
+                with self.batch():
+                    cur = conn.cursor()
+                    try:
+                        yield cur
+                    finally:
+                        cur.close()
+            else:
+                cur = conn.cursor()
+                try:
+                    yield cur
+                finally:
+                    cur.close()
+
+    # Same as SqliteSaver.put_writes, but values are serialized before the write
+    # lock is taken, so the transaction (and the lock) only covers the SQL
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = str(config["configurable"]["checkpoint_ns"])
+        checkpoint_id = str(config["configurable"]["checkpoint_id"])
+        verb = "REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "IGNORE"
+        rows = [
+            (thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, WRITES_IDX_MAP.get(channel, idx), channel, *self.serde.dumps_typed(value))
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        # Every change to the messages channel (turns and update_state) comes through
+        # here, so the message log and registry are kept current from the writes
+        appended = []
+        for channel, value in writes:
+            if channel == "messages":
+                appended.extend(value if isinstance(value, list) else [value])
+        with self.cursor() as cur:
+            cur.executemany(
+                f"INSERT OR {verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, type, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            if appended and not checkpoint_ns:
+                if not self.messages.has_thread(cur, thread_id):
+                    # A thread from before the message log: copy in what it already holds first
+                    saved_id, messages = self.saved_messages(config)
+                    self.messages.append(cur, thread_id, messages, f"{saved_id or ''}/0/")
+                message_count = self.messages.append(cur, thread_id, appended, f"{checkpoint_id}/1/{task_path}/{task_id}/")
+                self.registry.record(cur, thread_id, message_count, thread_title(appended))
+
+    def saved_messages(self, config):
+        """(checkpoint id, messages) of the checkpoint ``config`` points at, before its pending writes.
+
+        Writes can be saved before their checkpoint; then the thread's newest
+        saved checkpoint is used. (None, []) for a thread with no checkpoints.
+        """
+        saved = self.get_tuple(config)
+        if saved is None and config["configurable"].get("checkpoint_id"):
+            saved = self.get_tuple({"configurable": {
+                "thread_id": config["configurable"]["thread_id"],
+                "checkpoint_ns": config["configurable"].get("checkpoint_ns", ""),
+            }})
+        if saved is None:
+            return None, []
+        checkpoint_id = saved.config["configurable"]["checkpoint_id"]
+        messages = stored_messages(saved.checkpoint)
+        if messages is not None:
+            return checkpoint_id, messages
+        # Delta-encoded checkpoint: replay the writes since the nearest snapshot
+        history = self.get_delta_channel_history(config=saved.config, channels=["messages"])["messages"]
+        seed = getattr(history.get("seed"), "value", history.get("seed")) or []
+        return checkpoint_id, add_message_batches(seed, [value for _, _, value in history["writes"]])
+
+    # SqliteSaver has no async API; run the sync methods on worker threads, each
+    # of which gets its own pooled connection, so astream works with this saver
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aget_delta_channel_history(self, *, config, channels):
+        return await asyncio.to_thread(lambda: self.get_delta_channel_history(config=config, channels=channels))
@@ -0,0 +1,224 @@
+"""Async HTTP server streaming chatbot replies as server-sent events.
+
+Usage: python chat_server.py [--host 127.0.0.1] [--port 8000]
+
+    POST /threads/<thread_id>/messages   {"content": "Hi"}
+        -> text/event-stream of "token" events ({"content": "..."}),
+           then "done" (or "error")
+    GET /health
+        -> JSON counters, with per-model client stats under "models"
+
+Runs the compiled graph from CHAT_BACKEND (default chat_bot_backend) with
+``astream(stream_mode="messages")``, so hundreds of sessions share one
+event loop instead of each holding a Streamlit worker:
+
+- requests for the same thread run one at a time, in arrival order
+- at most ``max_concurrency`` generations run at once; a request that
+  can't get a slot within ``queue_timeout`` gets 503
+- a client that disconnects cancels its generation
+- SIGINT/SIGTERM stop accepting connections and let running replies
+  finish for up to ``shutdown_timeout`` seconds before cancelling them
+
+Standard library only (asyncio streams), HTTP/1.1 with one request per
+connection.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import signal
+import weakref
+
+from langchain_core.messages import AIMessageChunk, HumanMessage
+
+from model_registry import registry_stats
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class ChatServer:
+    def __init__(self, chatbot, max_concurrency=128, queue_timeout=30.0, shutdown_timeout=30.0):
+        self.chatbot = chatbot
+        self.queue_timeout = queue_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._thread_locks = weakref.WeakValueDictionary()
+        self._connections = set()
+        self._server = None
+        self.stats = {"requests": 0, "active": 0, "completed": 0, "cancelled": 0, "rejected": 0, "errors": 0}
+
+    # --------------------
+    # HTTP plumbing
+    # --------------------
+    async def _read_request(self, reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        if len(head) > MAX_HEADER_BYTES:
+            raise ValueError("headers too large")
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        method, path, _ = request_line.split(" ", 2)
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_BYTES:
+            raise ValueError("body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, body
+
+    async def _respond(self, writer, status, payload):
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+    async def _send_event(self, writer, event, payload):
+        writer.write(f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode())
+        try:
+            await writer.drain()
+        except (ConnectionError, RuntimeError) as e:
+            raise ClientDisconnected() from e
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            try:
+                method, path, body = await self._read_request(reader)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                await self._respond(writer, 400, {"error": "malformed request"})
+                return
+
+            parts = path.strip("/").split("/")
+            if method == "GET" and parts == ["health"]:
+                await self._respond(writer, 200, {**self.stats, "models": registry_stats()})
+            elif method == "POST" and len(parts) == 3 and parts[0] == "threads" and parts[2] == "messages":
+                try:
+                    content = json.loads(body or b"{}")["content"]
+                except (ValueError, KeyError, TypeError):
+                    await self._respond(writer, 400, {"error": 'expected JSON body {"content": "..."}'})
+                    return
+                await self._chat(reader, writer, parts[1], content)
+            else:
+                await self._respond(writer, 404, {"error": "not found"})
+        except (ConnectionError, ClientDisconnected):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    # --------------------
+    # Chat turns
+    # --------------------
+    def _thread_lock(self, thread_id):
+        lock = self._thread_locks.get(thread_id)
+        if lock is None:
+            lock = self._thread_locks[thread_id] = asyncio.Lock()
+        return lock
+
+    async def _chat(self, reader, writer, thread_id, content):
+        self.stats["requests"] += 1
+        # EOF on the request stream means the client went away; cancel the turn when it does
+        turn = asyncio.create_task(self._run_turn(writer, thread_id, content))
+        disconnect = asyncio.create_task(reader.read())
+        try:
+            done, _ = await asyncio.wait({turn, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+            if turn not in done:
+                turn.cancel()
+                self.stats["cancelled"] += 1
+            await asyncio.gather(turn, return_exceptions=True)
+        except asyncio.CancelledError:
+            # Server shutdown: stop the turn with the connection
+            turn.cancel()
+            await asyncio.gather(turn, return_exceptions=True)
+            raise
+        finally:
+            disconnect.cancel()
+
+    async def _run_turn(self, writer, thread_id, content):
+        lock = self._thread_lock(thread_id)
+        async with lock:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.stats["rejected"] += 1
+                await self._respond(writer, 503, {"error": "server busy, retry later"})
+                return
+            self.stats["active"] += 1
+            try:
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                    b"Connection: close\r\n\r\n"
+                )
+                config = {"configurable": {"thread_id": thread_id}}
+                try:
+                    async for chunk, metadata in self.chatbot.astream(
+                        {"messages": [HumanMessage(content=content)]}, config=config, stream_mode="messages"
+                    ):
+                        if isinstance(chunk, AIMessageChunk) and chunk.content:
+                            await self._send_event(writer, "token", {"content": chunk.content})
+                except (ClientDisconnected, asyncio.CancelledError):
+                    raise
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    await self._send_event(writer, "error", {"error": str(e)})
+                    return
+                await self._send_event(writer, "done", {})
+                self.stats["completed"] += 1
+            except ClientDisconnected:
+                self.stats["cancelled"] += 1
+            finally:
+                self.stats["active"] -= 1
+                self._slots.release()
+
+    # --------------------
+    # Lifecycle
+    # --------------------
+    async def start(self, host="127.0.0.1", port=8000):
+        self._server = await asyncio.start_server(self._handle_connection, host, port, limit=MAX_HEADER_BYTES, backlog=1024)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def shutdown(self):
+        """Stop accepting, give running replies ``shutdown_timeout`` seconds, then cancel the rest."""
+        if self._server is not None:
+            self._server.close()
+        pending = set(self._connections)
+        if pending:
+            _, still_running = await asyncio.wait(pending, timeout=self.shutdown_timeout)
+            for task in still_running:
+                task.cancel()
+            await asyncio.gather(*still_running, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+
+    async def serve_forever(self, host="127.0.0.1", port=8000):
+        port = await self.start(host, port)
+        print(f"Serving chatbot on http://{host}:{port}")
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await stop.wait()
+        print("Shutting down, waiting for running replies...")
+        await self.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the chatbot graph over HTTP/SSE")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-concurrency", type=int, default=int(os.getenv("CHAT_MAX_CONCURRENCY", "128")))
+    args = parser.parse_args()
+
+    backend = importlib.import_module(os.getenv("CHAT_BACKEND", "chat_bot_backend"))
+    asyncio.run(ChatServer(backend.chatbot, max_concurrency=args.max_concurrency).serve_forever(args.host, args.port))
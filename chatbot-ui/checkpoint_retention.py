@@ -0,0 +1,328 @@
+"""Retention and compaction for the chat checkpoint database.
+
+Every turn writes several checkpoints and none are ever removed, so
+``chatbot_conversations.db`` grows forever. ``CheckpointRetention`` prunes
+it with any combination of these policies:
+
+- ``keep_last``: keep only the newest N checkpoints of each thread
+- ``final_per_turn``: keep only the last checkpoint of each turn (what the
+  thread looked like after the reply), dropping the intermediate steps
+- ``max_idle_days``: delete threads not updated for that many days
+
+The latest checkpoint of a thread is never deleted by the first two
+policies, so conversations still resume where they left off. Threads with
+delta-encoded messages (see delta_messages.py) rebuild a checkpoint by
+replaying its ancestors' writes onto the nearest snapshot, so only the
+checkpoints the policies select are deleted: a kept delta checkpoint whose
+parent goes is first rewritten as a snapshot of its messages, and every
+checkpoint the policies keep can still be loaded (and time-travelled to).
+Freed pages
+are given back to the filesystem with incremental vacuum, a few pages at a
+time, so the background job never holds the write lock for long.
+
+Incremental vacuum needs ``auto_vacuum=INCREMENTAL``, and switching an
+existing database to it takes one full VACUUM, which rewrites the file and
+holds the write lock for as long as that takes. Only the command line run
+does that conversion; the background job skips compaction (pruning still
+happens, freed pages are reused) until the database has been converted.
+Run the command once while the app is stopped.
+
+Run once from the command line:
+    python checkpoint_retention.py chatbot_conversations.db --keep-last 20 --final-per-turn
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+from chat_checkpointer import ChatSqliteSaver
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+# Checkpoints holding only a delta carry this metadata key; snapshots and full checkpoints don't
+IS_DELTA = "json_extract(CAST({metadata} AS TEXT), '$.counters_since_delta_snapshot') IS NOT NULL"
+
+
+class CheckpointRetention:
+    def __init__(self, saver, keep_last=None, final_per_turn=False, max_idle_days=None, delete_batch_size=500, vacuum_step_pages=256):
+        self.saver = saver
+        self.keep_last = keep_last
+        self.final_per_turn = final_per_turn
+        self.max_idle_days = max_idle_days
+        self.delete_batch_size = delete_batch_size
+        self.vacuum_step_pages = vacuum_step_pages
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --------------------
+    # Policies
+    # --------------------
+    def _keep_last_doomed(self, cur):
+        cur.execute(
+            """
+            SELECT thread_id, checkpoint_ns, checkpoint_id FROM (
+                SELECT thread_id, checkpoint_ns, checkpoint_id,
+                       ROW_NUMBER() OVER (PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rank
+                FROM checkpoints
+            ) WHERE rank > ?
+            """,
+            (self.keep_last,),
+        )
+        return cur.fetchall()
+
+    def _intermediate_doomed(self, cur):
+        # A turn starts with an "input" checkpoint whose parent is the final checkpoint
+        # of the previous turn; keep those parents plus each thread's latest checkpoint.
+        cur.execute(
+            """
+            SELECT c.thread_id, c.checkpoint_ns, c.checkpoint_id FROM checkpoints c
+            WHERE c.checkpoint_id != (
+                SELECT MAX(l.checkpoint_id) FROM checkpoints l
+                WHERE l.thread_id = c.thread_id AND l.checkpoint_ns = c.checkpoint_ns
+            )
+            AND NOT EXISTS (
+                SELECT 1 FROM checkpoints n
+                WHERE n.thread_id = c.thread_id AND n.checkpoint_ns = c.checkpoint_ns
+                  AND n.parent_checkpoint_id = c.checkpoint_id
+                  AND json_extract(CAST(n.metadata AS TEXT), '$.source') = 'input'
+            )
+            """
+        )
+        return cur.fetchall()
+
+    def _deltas_after(self, cur, doomed):
+        """Kept delta checkpoints whose parent is in ``doomed``: they can't be rebuilt once it is deleted."""
+        cur.execute(
+            f"SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id FROM checkpoints c "
+            f"WHERE {IS_DELTA.format(metadata='c.metadata')}"
+        )
+        return [
+            (thread_id, checkpoint_ns, checkpoint_id)
+            for thread_id, checkpoint_ns, checkpoint_id, parent_id in cur.fetchall()
+            if (thread_id, checkpoint_ns, parent_id) in doomed and (thread_id, checkpoint_ns, checkpoint_id) not in doomed
+        ]
+
+    def _write_snapshot(self, key):
+        """Store the messages of delta checkpoint ``key`` in the checkpoint itself, so reads stop there."""
+        thread_id, checkpoint_ns, checkpoint_id = key
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+        # Replayed while the ancestors are all still there
+        _, messages = self.saver.saved_messages(config)
+        serde = self.saver.serde
+        with self.saver.cursor() as cur:
+            cur.execute(
+                "SELECT type, checkpoint, metadata FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                key,
+            )
+            row = cur.fetchone()
+            if row is None:
+                return
+            checkpoint = serde.loads_typed((row[0], row[1]))
+            # A plain list is read like a snapshot (it is how pre-delta checkpoints store messages)
+            checkpoint["channel_values"]["messages"] = list(messages)
+            metadata = json.loads(row[2]) if row[2] else {}
+            counters = metadata.get("counters_since_delta_snapshot") or {}
+            counters.pop("messages", None)
+            if counters:
+                metadata["counters_since_delta_snapshot"] = counters
+            else:
+                metadata.pop("counters_since_delta_snapshot", None)
+            cur.execute(
+                "UPDATE checkpoints SET type = ?, checkpoint = ?, metadata = ? WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (*serde.dumps_typed(checkpoint), json.dumps(metadata, ensure_ascii=False).encode("utf-8"), *key),
+            )
+
+    def _idle_threads(self, cur):
+        cutoff = time.time() - self.max_idle_days * 86400
+        cur.execute("SELECT thread_id FROM thread_registry WHERE updated_at < ?", (cutoff,))
+        return [row[0] for row in cur.fetchall()]
+
+    def _delete_checkpoints(self, keys):
+        for i in range(0, len(keys), self.delete_batch_size):
+            chunk = keys[i:i + self.delete_batch_size]
+            with self.saver.cursor() as cur:
+                cur.executemany("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", chunk)
+                cur.executemany("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", chunk)
+
+    def _delete_threads(self, thread_ids):
+        for thread_id in thread_ids:
+            with self.saver.cursor() as cur:
+                cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                cur.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+                cur.execute("DELETE FROM thread_registry WHERE thread_id = ?", (thread_id,))
+                cur.execute("DELETE FROM thread_messages WHERE thread_id = ?", (thread_id,))
+
+    def prune(self):
+        """Apply the configured policies.
+
+        Returns how many threads or checkpoints each one removed, and how many
+        delta checkpoints were rewritten as snapshots to keep them loadable.
+        """
+        removed = {"idle_threads": 0, "keep_last": 0, "intermediate": 0, "snapshots_written": 0}
+
+        if self.max_idle_days is not None:
+            with self.saver.cursor(transaction=False) as cur:
+                thread_ids = self._idle_threads(cur)
+            self._delete_threads(thread_ids)
+            removed["idle_threads"] = len(thread_ids)
+
+        if self.keep_last is None and not self.final_per_turn:
+            return removed
+
+        doomed = set()
+        with self.saver.cursor(transaction=False) as cur:
+            if self.keep_last is not None:
+                doomed.update(self._keep_last_doomed(cur))
+                removed["keep_last"] = len(doomed)
+            if self.final_per_turn:
+                intermediate = set(self._intermediate_doomed(cur)) - doomed
+                doomed |= intermediate
+                removed["intermediate"] = len(intermediate)
+            rebased = self._deltas_after(cur, doomed)
+
+        for key in rebased:
+            self._write_snapshot(key)
+        removed["snapshots_written"] = len(rebased)
+        self._delete_checkpoints(sorted(doomed))
+        return removed
+
+    # --------------------
+    # Vacuum
+    # --------------------
+    def database_bytes(self):
+        with self.saver.pool.acquire() as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        return page_size * page_count + _wal_size(self.saver.pool.database)
+
+    def enable_incremental_vacuum(self):
+        """Switch the database to auto_vacuum=INCREMENTAL (a one-off full VACUUM if it wasn't)."""
+        self.saver.setup()
+        with self.saver.pool.acquire() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                with self.saver.pool.writing():
+                    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                    conn.execute("VACUUM")
+
+    def incremental_vacuum_enabled(self):
+        self.saver.setup()
+        with self.saver.pool.acquire() as conn:
+            return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL
+
+    def vacuum(self):
+        """Release free pages a step at a time, checkpointing the WAL between steps.
+
+        Each step holds the pool's write lock, like every other writer, so a
+        vacuum during a chat turn queues behind the checkpointer's writes
+        instead of racing them through the busy timeout.
+        """
+        if not self.incremental_vacuum_enabled():
+            return
+        pool = self.saver.pool
+        with pool.acquire() as conn:
+            while not self._stop.is_set():
+                free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if not free_pages:
+                    break
+                with pool.writing():
+                    conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_step_pages})").fetchall()
+                with pool.writing():
+                    conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+            with pool.writing():
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    # --------------------
+    # Reporting and scheduling
+    # --------------------
+    def time_queries(self, sample_threads=20):
+        """Median latency (ms) of the queries the chat UI runs: latest state, thread history, sidebar."""
+        threads = self.saver.registry.list_threads(limit=sample_threads)
+        timings = {"get_tuple_ms": [], "list_history_ms": [], "list_threads_ms": []}
+        for thread in threads:
+            config = {"configurable": {"thread_id": thread["thread_id"]}}
+            start = time.perf_counter()
+            self.saver.get_tuple(config)
+            timings["get_tuple_ms"].append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            for _ in self.saver.list(config):
+                pass
+            timings["list_history_ms"].append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        self.saver.registry.list_threads()
+        timings["list_threads_ms"].append((time.perf_counter() - start) * 1000)
+        return {name: round(sorted(values)[len(values) // 2], 3) if values else None for name, values in timings.items()}
+
+    def run(self, convert_database=False):
+        """Prune, vacuum and return a report with reclaimed bytes and before/after query timings.
+
+        ``convert_database`` switches the file to incremental vacuum first (the one-off full VACUUM).
+        """
+        if convert_database:
+            self.enable_incremental_vacuum()
+        bytes_before = self.database_bytes()
+        timings_before = self.time_queries()
+        start = time.perf_counter()
+        removed = self.prune()
+        self.vacuum()
+        elapsed = time.perf_counter() - start
+        bytes_after = self.database_bytes()
+        return {
+            "removed": removed,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "reclaimed_bytes": bytes_before - bytes_after,
+            "seconds": round(elapsed, 3),
+            "timings_before": timings_before,
+            "timings_after": self.time_queries(),
+        }
+
+    def start_background(self, interval_s=3600, on_report=print):
+        """Run :meth:`run` every ``interval_s`` seconds on a daemon thread."""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    report = self.run()
+                    if not self.incremental_vacuum_enabled():
+                        report["note"] = "auto_vacuum is not INCREMENTAL, freed pages stay in the file; run checkpoint_retention.py once while the app is stopped"
+                    if on_report:
+                        on_report(f"Checkpoint retention: {report}")
+                except Exception as e:
+                    print(f"Checkpoint retention failed: {e}")
+                self._stop.wait(interval_s)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, name="checkpoint-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def _wal_size(database):
+    try:
+        return os.path.getsize(database + "-wal")
+    except OSError:
+        return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune and compact a chat checkpoint database")
+    parser.add_argument("database")
+    parser.add_argument("--keep-last", type=int)
+    parser.add_argument("--final-per-turn", action="store_true")
+    parser.add_argument("--max-idle-days", type=float)
+    args = parser.parse_args()
+
+    saver = ChatSqliteSaver.from_database(args.database)
+    saver.registry.backfill()
+    retention = CheckpointRetention(saver, keep_last=args.keep_last, final_per_turn=args.final_per_turn, max_idle_days=args.max_idle_days)
+    report = retention.run(convert_database=True)
+    for key, value in report.items():
+        print(f"{key}: {value}")
@@ -0,0 +1,136 @@
+"""Compressed checkpoint serializer.
+
+``CompressedSerializer`` wraps LangGraph's msgpack serializer and
+compresses its output with zstd (when the ``zstandard`` package is
+installed) or zlib, primed with a shared dictionary of the strings every
+message envelope repeats: class paths, field names, Ollama response
+metadata keys and checkpoint keys. The dictionary is what makes small
+blobs shrink — a delta checkpoint holding one or two messages has too
+little text of its own for a plain compressor to find repeats in.
+
+The codec is recorded in the row's type tag (``msgpack+zlib1``), so rows
+written before the switch, or below ``min_size``, are still read by the
+wrapped serializer unchanged.
+
+Compression is opt-in (CHECKPOINT_COMPRESSION=zstd or zlib). Switching it
+on needs no migration: old rows stay readable and only new rows are
+compressed. Switching it off again is fine too, since compressed rows are
+read whatever the setting. The one thing to watch is downgrading: a copy of
+the app from before this module can't read compressed rows, and a host
+without ``zstandard`` can't read zstd ones.
+"""
+import copy
+import os
+import zlib
+
+import ormsgpack
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Frozen: rows compressed with a dictionary can only be read with the same bytes.
+# Change the strings only together with a new version suffix below.
+_ENVELOPE_STRINGS_V1 = [
+    "v", "ts", "id", "channel_values", "channel_versions", "versions_seen", "updated_channels",
+    "__start__", "__input__", "__interrupt__", "branch:to:chat_node", "chat_node", "messages",
+    "model_validate_json", "langchain_core.messages.tool", "ToolMessage", "tool_call_id",
+    "langchain_core.messages.ai", "AIMessage", "AIMessageChunk", "langchain_core.messages.human",
+    "HumanMessage", "langchain_core.messages.system", "SystemMessage",
+    "message", "role", "assistant", "user", "model", "llama3.1", "created_at", "done", "done_reason",
+    "stop", "total_duration", "load_duration", "prompt_eval_count", "prompt_eval_duration",
+    "eval_count", "eval_duration", "model_name", "input_tokens", "output_tokens", "total_tokens",
+    "usage_metadata", "invalid_tool_calls", "tool_calls", "ai", "name", "human", "type",
+    "response_metadata", "additional_kwargs", "content",
+]
+# Packed as msgpack strings (length prefix + bytes) so they match the encoded stream;
+# zlib favours matches near the end of the dictionary, so the commonest keys go last.
+ENVELOPE_DICTIONARY_V1 = b"".join(ormsgpack.packb(s) for s in _ENVELOPE_STRINGS_V1)
+
+
+class _Zlib:
+    def __init__(self, level, dictionary):
+        self.level = level
+        self.dictionary = dictionary
+
+    def compress(self, data):
+        compressor = zlib.compressobj(self.level, zdict=self.dictionary)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data):
+        decompressor = zlib.decompressobj(zdict=self.dictionary)
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+class _Zstd:
+    def __init__(self, level, dictionary):
+        zstd_dictionary = zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        self.compressor = zstandard.ZstdCompressor(level=level, dict_data=zstd_dictionary)
+        self.decompressor = zstandard.ZstdDecompressor(dict_data=zstd_dictionary)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def decompress(self, data):
+        return self.decompressor.decompress(data)
+
+
+def _codecs(zlib_level, zstd_level):
+    codecs = {"zlib1": _Zlib(zlib_level, ENVELOPE_DICTIONARY_V1)}
+    if zstandard is not None:
+        codecs["zstd1"] = _Zstd(zstd_level, ENVELOPE_DICTIONARY_V1)
+    return codecs
+
+
+class CompressedSerializer(JsonPlusSerializer):
+    """SerializerProtocol that compresses another serializer's output.
+
+    ``codec`` is "zstd", "zlib" or "none" (the default); zstd falls back to
+    zlib when ``zstandard`` isn't installed. Reading handles every codec
+    available here plus anything the wrapped serializer reads on its own.
+
+    It subclasses JsonPlusSerializer only because that is what LangGraph
+    checks before handing a checkpointer the graph's msgpack allowlist;
+    the encoding itself is all the wrapped serializer's.
+    """
+
+    def __init__(self, serde=None, codec="none", zlib_level=6, zstd_level=3, min_size=64):
+        # JsonPlusSerializer.__init__ is not called: every method that would use its state is overridden
+        self.serde = serde or JsonPlusSerializer()
+        self.codecs = _codecs(zlib_level, zstd_level)
+        if codec == "zstd" and "zstd1" not in self.codecs:
+            codec = "zlib"
+        self.codec = None if codec == "none" else f"{codec}1"
+        self.min_size = min_size
+
+    def with_msgpack_allowlist(self, extra_allowlist):
+        """This serializer around the wrapped one with ``extra_allowlist`` merged into its msgpack allowlist."""
+        with_allowlist = getattr(self.serde, "with_msgpack_allowlist", None)
+        serde = with_allowlist(extra_allowlist) if with_allowlist else self.serde
+        if serde is self.serde:
+            return self
+        clone = copy.copy(self)
+        clone.serde = serde
+        return clone
+
+    def dumps_typed(self, obj):
+        type_, data = self.serde.dumps_typed(obj)
+        if self.codec is None or len(data) < self.min_size:
+            return type_, data
+        return f"{type_}+{self.codec}", self.codecs[self.codec].compress(data)
+
+    def loads_typed(self, data):
+        type_, payload = data
+        inner_type, _, codec = type_.rpartition("+")
+        if inner_type and codec in self.codecs:
+            return self.serde.loads_typed((inner_type, self.codecs[codec].decompress(payload)))
+        if inner_type and codec.startswith(("zlib", "zstd")):
+            raise ValueError(f"Checkpoint was written with {codec}, which is not available here (pip install zstandard)")
+        return self.serde.loads_typed(data)
+
+
+def serializer_from_env():
+    """Serializer selected by CHECKPOINT_COMPRESSION (zstd, zlib or none; default none)."""
+    return CompressedSerializer(codec=os.getenv("CHECKPOINT_COMPRESSION", "none"))
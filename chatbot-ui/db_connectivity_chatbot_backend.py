@@ -1,37 +1,84 @@
 from langgraph.graph import StateGraph, START, END
 from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+import os
 from typing import TypedDict,Annotated
-from langchain_community.chat_models import ChatOllama
-from langgraph.checkpoint.sqlite import SqliteSaver
-from langgraph.graph.message import add_messages
-import sqlite3
+from chat_checkpointer import ChatSqliteSaver
+from checkpoint_retention import CheckpointRetention
+from compact_serde import serializer_from_env
+from delta_messages import messages_reducer
+from history_manager import HistoryManager
+from llm_dispatcher import dispatcher_from_env
+from model_registry import get_chat_model
+from response_cache import cache_from_env
 
-# Initialize the Ollama model
-generator_model = ChatOllama(model="llama3.1", temperature=0)
+# Initialize the Ollama model behind one dispatcher shared by every session,
+# which batches concurrent calls and caps them at the server's slot count.
+# Repeated prompts are answered from the response cache when LLM_RESPONSE_CACHE is set.
+generator_model = cache_from_env(dispatcher_from_env(get_chat_model("llama3.1", temperature=0)))
+
+# Last K turns verbatim plus a rolling summary of older ones, within a token budget.
+# The summary is updated every N turns, in the background after the reply.
+history = HistoryManager(
+    generator_model,
+    keep_turns=int(os.getenv("CHAT_KEEP_TURNS", "4")),
+    token_budget=int(os.getenv("CHAT_TOKEN_BUDGET", "3000")),
+    summarize_every=int(os.getenv("CHAT_SUMMARIZE_EVERY", "2")),
+)
 
 class ChatState(TypedDict):
-    messages: Annotated[list[BaseMessage], add_messages]
+    messages: Annotated[list[BaseMessage], messages_reducer()]
+    summary: str
+    summarized_count: int
 
 def chat_node(state:ChatState):
-    message = state["messages"]
+    message = history.prompt_messages(state)
     response = generator_model.invoke(message)
     return {"messages": [response]}
 
-def retrive_all_thread_id_from_db():
-    all_threads = set()
-    for checkpointe in checkpointer.list(None):
-        all_threads.add(checkpointe.config["configurable"]["thread_id"])
-    
-    return list(all_threads)
+async def achat_node(state:ChatState):
+    message = history.prompt_messages(state)
+    response = await generator_model.ainvoke(message)
+    return {"messages": [response]}
+
+def retrive_all_thread_id_from_db(limit=50, offset=0):
+    """Thread ids from the registry table, most recently updated first."""
+    return [thread["thread_id"] for thread in checkpointer.registry.list_threads(limit=limit, offset=offset)]
+
+def retrive_messages_page(thread_id, limit=20, before=None):
+    """Up to ``limit`` messages before seq ``before`` (default: newest), oldest first, from the message log."""
+    page = checkpointer.messages.page(thread_id, limit=limit, before=before)
+    if not page and before is None:
+        # Threads written before the message log existed are copied in on first open
+        messages = chatbot.get_state(config={"configurable": {"thread_id": thread_id}}).values.get("messages", [])
+        if messages:
+            checkpointer.messages.backfill(thread_id, messages)
+            page = checkpointer.messages.page(thread_id, limit=limit)
+    return page
 
 
-conn = sqlite3.connect(database="chatbot_conversations.db",check_same_thread=False)
+# One WAL connection per thread instead of a single connection shared by every session
+checkpointer = ChatSqliteSaver.from_database("chatbot_conversations.db", serde=serializer_from_env())
+checkpointer.registry.backfill()
 
-checkpointer = SqliteSaver(conn=conn)
+# Opt-in (CHECKPOINT_RETENTION=1): prune old checkpoints and vacuum in the background.
+# The policies delete history; the background job never runs the one-off full VACUUM,
+# run checkpoint_retention.py once while the app is stopped to enable compaction.
+if os.getenv("CHECKPOINT_RETENTION", "0") == "1":
+    retention = CheckpointRetention(
+        checkpointer,
+        keep_last=int(os.getenv("CHECKPOINT_KEEP_LAST", "50")),
+        final_per_turn=os.getenv("CHECKPOINT_FINAL_PER_TURN", "1") == "1",
+        max_idle_days=float(os.getenv("CHECKPOINT_MAX_IDLE_DAYS")) if os.getenv("CHECKPOINT_MAX_IDLE_DAYS") else None,
+    )
+    retention.start_background(interval_s=float(os.getenv("CHECKPOINT_RETENTION_INTERVAL_S", "3600")))
 
 graph = StateGraph(ChatState)
-graph.add_node("chat_node", chat_node)
+# Sync nodes for the Streamlit scripts (stream), async ones for chat_server.py (astream)
+graph.add_node("chat_node", RunnableLambda(chat_node, afunc=achat_node))
+graph.add_node("compact_history", RunnableLambda(history.compact, afunc=history.acompact))
 graph.add_edge(START, "chat_node")
-graph.add_edge("chat_node", END)
+graph.add_edge("chat_node", "compact_history")
+graph.add_edge("compact_history", END)
 
 chatbot = graph.compile(checkpointer=checkpointer)
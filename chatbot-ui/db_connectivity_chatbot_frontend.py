@@ -1,8 +1,12 @@
 import streamlit as st
-from db_connectivity_chatbot_backend import chatbot ,retrive_all_thread_id_from_db
+from db_connectivity_chatbot_backend import chatbot ,retrive_all_thread_id_from_db, retrive_messages_page
 from langchain_core.messages import HumanMessage
+from stream_coalescer import coalesce_stream
 import uuid
 
+THREAD_PAGE_SIZE = 20
+MESSAGE_PAGE_SIZE = 30
+
 #********************************************Utility functions*************************************************
 
 def generate_thread_id():
@@ -11,6 +15,7 @@ def generate_thread_id():
 
 def reset_chat():
     st.session_state['message_history'] = []
+    st.session_state['history_cursor'] = None
     st.session_state['thread_id'] = generate_thread_id()
     add_thread_history(st.session_state['thread_id'])
     
@@ -18,9 +23,8 @@ def add_thread_history(thread_id):
     if thread_id not in st.session_state['chat_thread_history']:
         st.session_state['chat_thread_history'].append(thread_id)
 
-def load_conversation_history(thread_id):
-    state = chatbot.get_state(config={"configurable": {"thread_id": thread_id}})
-    return state.values.get("messages", [])
+def to_message_history(page):
+    return [{"role": "user" if message["type"] == "human" else "assistant", "content": message["content"]} for message in page]
 
 if 'message_history' not in st.session_state:
     st.session_state['message_history'] = []
@@ -29,7 +33,9 @@ if 'thread_id' not in st.session_state:
     st.session_state['thread_id'] = generate_thread_id()
 
 if 'chat_thread_history' not in st.session_state:
-    st.session_state['chat_thread_history'] = retrive_all_thread_id_from_db()
+    # Registry returns most recent first; the sidebar list is kept oldest first and shown reversed
+    st.session_state['chat_thread_history'] = retrive_all_thread_id_from_db(limit=THREAD_PAGE_SIZE)[::-1]
+    st.session_state['thread_page_offset'] = THREAD_PAGE_SIZE
 
 add_thread_history(st.session_state['thread_id'])
 
@@ -44,16 +50,27 @@ st.header("My Conversion with the AI Agent")
 for thread_id in st.session_state['chat_thread_history'][::-1]:  # Display threads in reverse order (most recent first)
     if st.sidebar.button(thread_id):
         st.session_state["thread_id"] = thread_id
-        messages = load_conversation_history(thread_id)
+        # Only the newest page; earlier messages are fetched on demand
+        page = retrive_messages_page(thread_id, limit=MESSAGE_PAGE_SIZE)
+        st.session_state["message_history"] = to_message_history(page)
+        st.session_state["history_cursor"] = page[0]["seq"] if page and page[0]["seq"] > 0 else None
 
-        temp_messages = []
-        for msg in messages:
-            role = "user" if isinstance(msg, HumanMessage) else "assistant"
-            temp_messages.append({"role": role, "content": msg.content})
-        st.session_state["message_history"] = temp_messages
+if st.sidebar.button("Load older chats"):
+    older_threads = retrive_all_thread_id_from_db(limit=THREAD_PAGE_SIZE, offset=st.session_state['thread_page_offset'])
+    st.session_state['thread_page_offset'] += THREAD_PAGE_SIZE
+    st.session_state['chat_thread_history'] = [
+        thread_id for thread_id in older_threads[::-1] if thread_id not in st.session_state['chat_thread_history']
+    ] + st.session_state['chat_thread_history']
+    st.rerun()
 
 
 # Render history
+if st.session_state.get('history_cursor') is not None and st.button("Load earlier messages"):
+    page = retrive_messages_page(st.session_state['thread_id'], limit=MESSAGE_PAGE_SIZE, before=st.session_state['history_cursor'])
+    st.session_state['message_history'] = to_message_history(page) + st.session_state['message_history']
+    st.session_state['history_cursor'] = page[0]["seq"] if page and page[0]["seq"] > 0 else None
+    st.rerun()
+
 # loading the conversation history
 for message in st.session_state['message_history']:
     with st.chat_message(message['role']):
@@ -71,12 +88,13 @@ if user_input:
    # first add the message to message_history
     with st.chat_message('assistant'):
 
+        # Coalesce tokens into a few UI updates per second instead of one per token
         ai_message = st.write_stream(
-            message_chunk.content for message_chunk, metadata in chatbot.stream(
+            coalesce_stream(chatbot.stream(
                 {'messages': [HumanMessage(content=user_input)]},
                 config= CONFIG,
                 stream_mode= 'messages'
-            )
+            ))
         )
 
     st.session_state['message_history'].append({'role': 'assistant', 'content': ai_message})
\ No newline at end of file
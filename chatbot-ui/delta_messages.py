@@ -0,0 +1,73 @@
+import os
+
+from langgraph.channels.delta import DeltaChannel
+from langgraph.graph.message import add_messages
+
+
+def add_message_batches(messages, writes):
+    """``add_messages`` over a batch of channel writes, applied in one pass."""
+    appended = []
+    for write in writes:
+        if isinstance(write, list):
+            appended.extend(write)
+        else:
+            appended.append(write)
+    return add_messages(messages, appended)
+
+
+class MessageDeltaChannel(DeltaChannel):
+    """DeltaChannel whose snapshot interval grows with the conversation.
+
+    A snapshot stores the whole message list, so with a fixed interval the
+    bytes written per turn still grow linearly, just more slowly. Here a
+    snapshot is due after ``max(snapshot_every, len(messages) // growth_divisor)``
+    updates: snapshot size over interval stays constant, which keeps the
+    amortized write cost per turn flat however long the thread gets, while
+    reading the head never replays more than a fraction of the thread.
+    """
+
+    __slots__ = ("_snapshot_every", "growth_divisor")
+
+    def __init__(self, reducer, typ=None, *, snapshot_frequency=50, growth_divisor=4):
+        self.growth_divisor = growth_divisor
+        super().__init__(reducer, typ, snapshot_frequency=snapshot_frequency)
+
+    @property
+    def snapshot_frequency(self):
+        if not self.is_available():
+            return self._snapshot_every
+        return max(self._snapshot_every, len(self.value) // self.growth_divisor)
+
+    @snapshot_frequency.setter
+    def snapshot_frequency(self, value):
+        self._snapshot_every = value
+
+    def _keep_settings(self, new):
+        new._snapshot_every = self._snapshot_every
+        new.growth_divisor = self.growth_divisor
+        return new
+
+    def copy(self):
+        return self._keep_settings(super().copy())
+
+    def from_checkpoint(self, checkpoint):
+        return self._keep_settings(super().from_checkpoint(checkpoint))
+
+
+def messages_reducer(snapshot_every=None):
+    """Reducer for ``ChatState.messages``: delta-encoded unless CHAT_DELTA_CHECKPOINTS=0.
+
+    With ``add_messages`` every checkpoint stores the whole conversation, so a
+    500-turn chat writes 500 growing copies of it. The delta channel stores
+    only the messages written since the parent checkpoint (as the checkpoint's
+    pending writes) and rebuilds the list on read by replaying them onto the
+    nearest snapshot. Snapshots are written at least every ``snapshot_every``
+    updates, which bounds how far a read of the thread's head has to replay.
+    Checkpoints written before the switch hold the full list and act as the
+    first snapshot, so existing threads keep working.
+    """
+    if os.getenv("CHAT_DELTA_CHECKPOINTS", "1") != "1":
+        return add_messages
+    if snapshot_every is None:
+        snapshot_every = int(os.getenv("CHAT_SNAPSHOT_EVERY", "50"))
+    return MessageDeltaChannel(add_message_batches, snapshot_frequency=snapshot_every)
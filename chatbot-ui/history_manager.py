@@ -0,0 +1,167 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.constants import TAG_NOSTREAM
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an assistant.
+
+Current summary:
+{summary}
+
+Newer messages to fold in:
+{messages}
+
+Write the updated summary in at most {max_words} words. Keep names, facts, decisions and open questions; drop small talk."""
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def message_tokens(message):
+    return estimate_tokens(str(message.content)) + 4
+
+
+def turn_starts(messages):
+    """Indexes of the messages that open a turn (user messages)."""
+    return [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+
+
+def format_messages(messages):
+    return "\n".join(f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}" for m in messages)
+
+
+class HistoryManager:
+    """Keeps the prompt for a long chat thread within a token budget.
+
+    The prompt is a system message holding a rolling summary of older turns,
+    followed by the last ``keep_turns`` turns verbatim. ``compact`` is a graph
+    node that runs after the reply: once ``summarize_every`` turns have fallen
+    out of the window it folds them into the summary, once, and stores the
+    summary and how many messages it covers in state (``summary`` /
+    ``summarized_count``), so the summary grows incrementally and is never
+    rebuilt from the whole thread. Prompt size, and with it time to first
+    token, stays flat as threads grow; until they are folded in, turns that
+    left the window stay in the prompt verbatim, within ``token_budget``.
+
+    With ``background`` (the default) the summary call runs on a worker
+    thread and ``compact`` returns straight away, so the run ends as soon as
+    the reply has streamed. The finished summary is stored by the thread's
+    next ``compact``; a summary for a state that changed meanwhile is
+    dropped and redone.
+
+    The full message list stays in state for the UI; only the prompt is cut.
+    """
+
+    def __init__(self, summarizer, keep_turns=4, token_budget=3000, summary_words=250, summarize_every=2, background=True):
+        # Summary calls shouldn't show up in stream_mode="messages" output
+        self.summarizer = summarizer.with_config(tags=[TAG_NOSTREAM])
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.summary_words = summary_words
+        self.summarize_every = summarize_every
+        self.background = background
+        self._jobs = {}  # thread_id -> running Future of (summarized_count it started from, state update or None)
+        self._results = {}  # thread_id -> finished (summarized_count it started from, state update), until the next compact
+        # Reentrant: a job that is already done runs its callback inline, under the lock
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary") if background else None
+
+    def prompt_messages(self, state):
+        """Summary + unsummarized recent turns, dropping the oldest turns that don't fit the budget."""
+        messages = state["messages"]
+        summary = state.get("summary", "")
+        recent = messages[state.get("summarized_count", 0):]
+
+        prefix = [SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")] if summary else []
+        budget = self.token_budget - sum(message_tokens(m) for m in prefix)
+        starts = turn_starts(recent) or [0]
+        for start in starts:
+            # Always keep the latest turn, even if it alone exceeds the budget
+            if start == starts[-1] or sum(message_tokens(m) for m in recent[start:]) <= budget:
+                return prefix + recent[start:]
+        return prefix + recent
+
+    def _pending_summary(self, state):
+        """(summary prompt, new summarized_count), or None when nothing left the window."""
+        messages = state["messages"]
+        summarized_count = state.get("summarized_count", 0)
+        # The next prompt will hold the new question plus the last keep_turns - 1 turns
+        starts = turn_starts(messages)
+        keep_from = starts[-(self.keep_turns - 1)] if self.keep_turns > 1 and len(starts) >= self.keep_turns - 1 else len(messages)
+        left_window = sum(1 for start in starts if summarized_count <= start < keep_from)
+        if len(starts) < self.keep_turns or left_window < max(1, self.summarize_every):
+            return None
+        prompt = SUMMARY_PROMPT.format(
+            summary=state.get("summary") or "(none yet)",
+            messages=format_messages(messages[summarized_count:keep_from]),
+            max_words=self.summary_words,
+        )
+        return prompt, keep_from
+
+    def _update(self, summary, keep_from):
+        # Guard the budget against a summarizer that ignores the word limit
+        return {"summary": summary[: self.token_budget * 2], "summarized_count": keep_from}
+
+    def _summarize(self, summarized_count, prompt, keep_from):
+        """(summarized_count the summary started from, state update or None if the call failed)."""
+        try:
+            summary = self.summarizer.invoke(prompt).content
+        except Exception as e:
+            print(f"History summary failed ({e}), keeping older turns verbatim")
+            return summarized_count, None
+        return summarized_count, self._update(summary, keep_from)
+
+    def _job_done(self, thread_id, job):
+        """Done-callback: move the result out of ``_jobs`` so finished futures don't pile up."""
+        with self._lock:
+            if self._jobs.get(thread_id) is job:
+                del self._jobs[thread_id]
+            started_from, result = job.result()
+            if result:
+                self._results[thread_id] = (started_from, result)
+
+    def _compact_in_background(self, state, config):
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        update = {}
+        with self._lock:
+            if thread_id in self._jobs:
+                return update
+            finished = self._results.pop(thread_id, None)
+            if finished is not None:
+                started_from, result = finished
+                if started_from == state.get("summarized_count", 0):
+                    update = result
+                    state = {**state, **result}
+            pending = self._pending_summary(state)
+            if pending is not None:
+                job = self._executor.submit(self._summarize, state.get("summarized_count", 0), *pending)
+                self._jobs[thread_id] = job
+                job.add_done_callback(lambda job: self._job_done(thread_id, job))
+        return update
+
+    def compact(self, state, config=None):
+        """Graph node: fold messages older than the last ``keep_turns - 1`` turns into the summary."""
+        if self.background:
+            return self._compact_in_background(state, config)
+        pending = self._pending_summary(state)
+        if pending is None:
+            return {}
+        return self._summarize(state.get("summarized_count", 0), *pending)[1] or {}
+
+    async def acompact(self, state, config=None):
+        """Async version of :meth:`compact`, used when the graph runs with astream."""
+        if self.background:
+            return self._compact_in_background(state, config)
+        pending = self._pending_summary(state)
+        if pending is None:
+            return {}
+        prompt, keep_from = pending
+        try:
+            summary = (await self.summarizer.ainvoke(prompt)).content
+        except Exception as e:
+            print(f"History summary failed ({e}), keeping older turns verbatim")
+            return {}
+        return self._update(summary, keep_from)
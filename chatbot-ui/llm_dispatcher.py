@@ -0,0 +1,215 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, message_chunk_to_message
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+_DONE = object()
+
+
+class _Request:
+    def __init__(self, messages, stop, kwargs, deliver):
+        self.messages = messages
+        self.stop = stop
+        self.kwargs = kwargs
+        self.deliver = deliver  # called from the dispatcher thread with chunks, then an exception or _DONE
+        self.submitted = time.perf_counter()
+        self.cancelled = False
+        self.task = None
+
+
+class _DispatchLoop:
+    """Background event loop that batches requests and runs them against the model.
+
+    Requests queue up from any thread. Once one is waiting and a slot is
+    free, the loop holds it for up to ``batch_window`` seconds so that more
+    requests, and more free slots, can join; then it starts as many as fit
+    at once. They reach the model server together and share one prefill
+    step instead of each new arrival stalling the running generations. At
+    most ``max_in_flight`` requests run at a time.
+    """
+
+    def __init__(self, model, batch_window, max_in_flight):
+        self.model = model
+        self.batch_window = batch_window
+        self.max_in_flight = max_in_flight
+        self.stats = {"requests": 0, "batches": 0, "cancelled": 0, "in_flight": 0, "queue_wait_s": 0.0}
+        self._waiting = deque()
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        threading.Thread(target=self._run_loop, name="llm-dispatcher", daemon=True).start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._changed = asyncio.Event()
+        self._loop.create_task(self._dispatch())
+        self._ready.set()
+        self._loop.run_forever()
+
+    def submit(self, request):
+        def enqueue():
+            self._waiting.append(request)
+            self._changed.set()
+
+        self._loop.call_soon_threadsafe(enqueue)
+
+    def cancel(self, request):
+        def cancel():
+            request.cancelled = True
+            if request.task is not None:
+                request.task.cancel()
+
+        self._loop.call_soon_threadsafe(cancel)
+
+    async def _wait_for_change(self, timeout=None):
+        """Wait until a request arrives or a slot frees up."""
+        self._changed.clear()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _dispatch(self):
+        while True:
+            while not self._waiting or self.stats["in_flight"] >= self.max_in_flight:
+                await self._wait_for_change()
+            deadline = time.perf_counter() + self.batch_window
+            while (remaining := deadline - time.perf_counter()) > 0:
+                # Nothing more can join once every slot is idle and spoken for
+                if self.stats["in_flight"] == 0 and len(self._waiting) >= self.max_in_flight:
+                    break
+                await self._wait_for_change(remaining)
+
+            free = self.max_in_flight - self.stats["in_flight"]
+            started = 0
+            while self._waiting and started < free:
+                request = self._waiting.popleft()
+                if request.cancelled:
+                    self.stats["cancelled"] += 1
+                    continue
+                self.stats["in_flight"] += 1
+                self.stats["requests"] += 1
+                self.stats["queue_wait_s"] += time.perf_counter() - request.submitted
+                request.task = self._loop.create_task(self._serve(request))
+                started += 1
+            if started:
+                self.stats["batches"] += 1
+
+    async def _serve(self, request):
+        try:
+            async for chunk in self.model.astream(request.messages, stop=request.stop, **request.kwargs):
+                request.deliver(chunk)
+            request.deliver(_DONE)
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            request.deliver(asyncio.CancelledError())
+        except Exception as e:
+            request.deliver(e)
+        finally:
+            self.stats["in_flight"] -= 1
+            self._changed.set()
+
+
+class LLMDispatcher(BaseChatModel):
+    """Chat model wrapper that funnels every session's calls through one dispatcher.
+
+    Concurrent calls from different threads, sync or async, are collected
+    for up to ``batch_window`` seconds and sent to ``model`` together, with
+    at most ``max_in_flight`` generations running at once; set it to the
+    model server's parallel slot count (OLLAMA_NUM_PARALLEL). Tokens stream
+    back to the caller that asked for them, so stream_mode="messages" keeps
+    working. A wider window batches more requests per dispatch (better
+    server throughput) at the cost of up to ``batch_window`` extra latency.
+    """
+
+    model: BaseChatModel
+    batch_window: float = 0.02
+    max_in_flight: int = 4
+    _dispatcher: _DispatchLoop = PrivateAttr()
+
+    def model_post_init(self, __context):
+        self._dispatcher = _DispatchLoop(self.model, self.batch_window, self.max_in_flight)
+
+    @property
+    def _llm_type(self):
+        return f"dispatched-{self.model._llm_type}"
+
+    def stats(self):
+        stats = dict(self._dispatcher.stats)
+        stats["avg_batch_size"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        stats["avg_queue_wait_ms"] = stats.pop("queue_wait_s") / stats["requests"] * 1000 if stats["requests"] else 0.0
+        return stats
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        results = queue.Queue()
+        request = _Request(messages, stop, kwargs, results.put)
+        self._dispatcher.submit(request)
+        finished = False
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    finished = True
+                    return
+                if isinstance(item, BaseException):
+                    finished = True
+                    raise item
+                chunk = ChatGenerationChunk(message=item)
+                if run_manager:
+                    run_manager.on_llm_new_token(item.content, chunk=chunk)
+                yield chunk
+        finally:
+            if not finished:
+                self._dispatcher.cancel(request)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        loop = asyncio.get_running_loop()
+        results = asyncio.Queue()
+        request = _Request(messages, stop, kwargs, lambda item: loop.call_soon_threadsafe(results.put_nowait, item))
+        self._dispatcher.submit(request)
+        finished = False
+        try:
+            while True:
+                item = await results.get()
+                if item is _DONE:
+                    finished = True
+                    return
+                if isinstance(item, BaseException):
+                    finished = True
+                    raise item
+                chunk = ChatGenerationChunk(message=item)
+                if run_manager:
+                    await run_manager.on_llm_new_token(item.content, chunk=chunk)
+                yield chunk
+        finally:
+            if not finished:
+                self._dispatcher.cancel(request)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        # Start from an empty chunk so a stream that yields nothing gives an empty reply
+        message = AIMessageChunk(content="")
+        for chunk in self._stream(messages, stop, run_manager, **kwargs):
+            message += chunk.message
+        return ChatResult(generations=[ChatGeneration(message=message_chunk_to_message(message))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = AIMessageChunk(content="")
+        async for chunk in self._astream(messages, stop, run_manager, **kwargs):
+            message += chunk.message
+        return ChatResult(generations=[ChatGeneration(message=message_chunk_to_message(message))])
+
+
+def dispatcher_from_env(model):
+    """Wrap ``model`` with window/in-flight limits from LLM_BATCH_WINDOW_MS and OLLAMA_NUM_PARALLEL."""
+    return LLMDispatcher(
+        model=model,
+        batch_window=float(os.getenv("LLM_BATCH_WINDOW_MS", "20")) / 1000,
+        max_in_flight=int(os.getenv("OLLAMA_NUM_PARALLEL", "4")),
+    )
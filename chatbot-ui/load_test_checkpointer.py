@@ -0,0 +1,178 @@
+"""Load test: N simulated chat sessions writing checkpoints concurrently.
+
+Usage: python load_test_checkpointer.py [turns_per_session] [model_latency_s]
+                                        [--sessions 1 4 16 64] [--processes 1 2 4]
+
+Compares the original setup (one SqliteSaver connection shared by every
+session) with ChatSqliteSaver (per-thread WAL connections), using a stub
+chat model (with an optional sleep standing in for generation time) so
+only checkpoint I/O is measured. Reports turns/sec and the
+number of "database is locked" errors for each session count. Any other
+error fails a turn too, but is counted and printed separately so that a
+broken saver doesn't pass for lock contention.
+
+With ``--processes P`` the sessions are split over P worker processes
+writing to the same database file (each with its own saver), which is how
+several app workers share one checkpoint store. For the pooled saver each
+row also shows the pool's per-turn profile: write transactions per turn,
+time waiting for the write lock (summed over the waiting threads), time
+inside transactions and time in COMMIT.
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Annotated, TypedDict
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from chat_checkpointer import ChatSqliteSaver
+
+
+class ChatState(TypedDict):
+    messages: Annotated[list[BaseMessage], add_messages]
+
+
+def build_chatbot(checkpointer, model_latency):
+    model = GenericFakeChatModel(messages=iter(lambda: AIMessage(content="stub reply " * 40), None))
+
+    def chat_node(state: ChatState):
+        time.sleep(model_latency)
+        return {"messages": [model.invoke(state["messages"])]}
+
+    graph = StateGraph(ChatState)
+    graph.add_node("chat_node", chat_node)
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def make_checkpointer(name, database):
+    if name == "shared-conn":
+        return SqliteSaver(sqlite3.connect(database, check_same_thread=False))
+    return ChatSqliteSaver.from_database(database)
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+def run(chatbot, session_ids, turns):
+    """Run each session on its own thread; returns (turns completed, lock errors, other error messages)."""
+    errors = []
+    other_errors = []
+    counter = itertools.count()
+
+    def session(session_id):
+        config = {"configurable": {"thread_id": f"session-{session_id}"}}
+        for turn in range(turns):
+            try:
+                chatbot.invoke({"messages": [HumanMessage(content=f"question {turn}")]}, config=config)
+                next(counter)
+            except Exception as e:
+                (errors if is_lock_error(e) else other_errors).append(f"{type(e).__name__}: {e}")
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in session_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return next(counter), len(errors), other_errors
+
+
+def worker(name, database, session_ids, turns, model_latency, barrier, results):
+    checkpointer = make_checkpointer(name, database)
+    chatbot = build_chatbot(checkpointer, model_latency)
+    barrier.wait()
+    completed, errors, other_errors = run(chatbot, session_ids, turns)
+    results.put((completed, errors, other_errors, getattr(getattr(checkpointer, "pool", None), "stats", None)))
+
+
+def run_processes(name, database, n_sessions, n_processes, turns, model_latency):
+    """Returns (turns/s, turns completed, lock errors, other error messages, summed pool stats or None)
+    for sessions split over processes."""
+    make_checkpointer(name, database).setup()
+    if n_processes == 1:
+        checkpointer = make_checkpointer(name, database)
+        chatbot = build_chatbot(checkpointer, model_latency)
+        start = time.perf_counter()
+        completed, errors, other_errors = run(chatbot, range(n_sessions), turns)
+        elapsed = time.perf_counter() - start
+        pool = getattr(checkpointer, "pool", None)
+        return completed / elapsed, completed, errors, other_errors, pool.stats if pool else None
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(n_processes + 1)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=worker,
+            args=(name, database, range(p, n_sessions, n_processes), turns, model_latency, barrier, results),
+        )
+        for p in range(n_processes)
+    ]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    start = time.perf_counter()
+    outcomes = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    completed = sum(outcome[0] for outcome in outcomes)
+    errors = sum(outcome[1] for outcome in outcomes)
+    other_errors = [message for outcome in outcomes for message in outcome[2]]
+    stats = None
+    if outcomes[0][3] is not None:
+        stats = {key: sum(outcome[3][key] for outcome in outcomes) for key in outcomes[0][3]}
+    return completed / elapsed, completed, errors, other_errors, stats
+
+
+def pool_profile(stats, completed_turns):
+    if not stats or not completed_turns:
+        return ""
+    per_turn = lambda key: stats[key] / completed_turns * 1000
+    return (
+        f" (tx/turn {stats['transactions'] / completed_turns:.1f}, lock wait {per_turn('lock_wait_s'):.2f}ms, "
+        f"in tx {per_turn('transaction_s'):.2f}ms, commit {per_turn('commit_s'):.2f}ms)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the chat checkpointers")
+    parser.add_argument("turns", nargs="?", type=int, default=20)
+    parser.add_argument("model_latency", nargs="?", type=float, default=0.05)
+    parser.add_argument("--sessions", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--processes", nargs="+", type=int, default=[1])
+    args = parser.parse_args()
+
+    for n_processes in args.processes:
+        for n_sessions in args.sessions:
+            if n_sessions < n_processes:
+                continue
+            row = [f"processes={n_processes:<2} sessions={n_sessions:<3}"]
+            failures = []
+            for name in ("shared-conn", "pooled-wal"):
+                directory = tempfile.mkdtemp(prefix="checkpoint_load_")
+                database = os.path.join(directory, "load.db")
+                throughput, completed, errors, other_errors, stats = run_processes(
+                    name, database, n_sessions, n_processes, args.turns, args.model_latency
+                )
+                cell = f"{name}: {throughput:7.1f} turns/s, {errors} lock errors"
+                if other_errors:
+                    cell += f", {len(other_errors)} OTHER ERRORS"
+                    failures.extend(f"  {name}: {message}" for message in sorted(set(other_errors)))
+                row.append(cell + pool_profile(stats, completed))
+            print("  ".join(row))
+            for failure in failures:
+                print(failure)
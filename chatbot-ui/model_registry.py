@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_ollama import ChatOllama
+from ollama import Client
+
+# How long Ollama keeps the weights loaded after the last request
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# HTTP connections each shared client may hold open to the Ollama server
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "16"))
+WARM_UP = os.getenv("LLM_WARM_UP", "1") == "1"
+
+
+class ModelStats(BaseCallbackHandler):
+    """Calls in flight, time to first token and latency of one shared client."""
+
+    run_inline = True
+
+    def __init__(self, window=1000):
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self._started = {}
+        self._latencies = deque(maxlen=window)
+        self._first_tokens = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        with self._lock:
+            self.in_flight += 1
+            self.calls += 1
+            self._started[run_id] = [time.perf_counter(), False]
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            started = self._started.get(run_id)
+            if started and not started[1]:
+                started[1] = True
+                self._first_tokens.append(time.perf_counter() - started[0])
+
+    def _finish(self, run_id, error):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+            if started is None:
+                return
+            self.in_flight -= 1
+            if error:
+                self.errors += 1
+            else:
+                self._latencies.append(time.perf_counter() - started[0])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, error=False)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, error=True)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            first_tokens = sorted(self._first_tokens)
+            stats = {"in_flight": self.in_flight, "calls": self.calls, "errors": self.errors}
+        p = lambda values, q: round(values[min(int(q * len(values)), len(values) - 1)] * 1000, 1) if values else None
+        stats.update(
+            latency_p50_ms=p(latencies, 0.5),
+            latency_p95_ms=p(latencies, 0.95),
+            first_token_p50_ms=p(first_tokens, 0.5),
+            first_token_p95_ms=p(first_tokens, 0.95),
+        )
+        return stats
+
+
+# --------------------
+# Registry
+# --------------------
+_clients = {}  # (model, params) -> (ChatOllama, ModelStats)
+_warmed = set()
+_lock = threading.Lock()
+
+
+def warm_up(client):
+    """Have Ollama load ``client``'s model now (an empty generate request), so the first user doesn't wait for it."""
+    start = time.perf_counter()
+    try:
+        Client(host=client.base_url).generate(model=client.model, keep_alive=client.keep_alive)
+    except Exception as e:
+        print(f"Warm-up of {client.model} failed ({e}), it will load on first use")
+        return
+    print(f"Warmed up {client.model} in {time.perf_counter() - start:.1f}s")
+
+
+def get_chat_model(model="llama3.1", warm=None, **params):
+    """Process-wide shared ChatOllama for (model, params).
+
+    Every caller asking for the same model and parameters gets the same
+    client, so they share one pool of keep-alive HTTP connections
+    (``LLM_MAX_CONNECTIONS``) and Ollama keeps the weights loaded for
+    ``OLLAMA_KEEP_ALIVE``. The first client for a model starts a background
+    warm-up request unless ``warm`` (default LLM_WARM_UP) is false.
+
+    Async calls on a shared client should all come from one event loop
+    (e.g. through LLMDispatcher), since its async connection pool is tied
+    to the loop that opened it.
+    """
+    key = (model, tuple(sorted((name, repr(value)) for name, value in params.items())))
+    with _lock:
+        entry = _clients.get(key)
+        if entry is None:
+            stats = ModelStats()
+            options = {
+                "keep_alive": KEEP_ALIVE,
+                "client_kwargs": {"limits": httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)},
+                **params,
+            }
+            entry = _clients[key] = (ChatOllama(model=model, callbacks=[stats], **options), stats)
+            if (WARM_UP if warm is None else warm) and model not in _warmed:
+                _warmed.add(model)
+                threading.Thread(target=warm_up, args=(entry[0],), name=f"warm-up-{model}", daemon=True).start()
+    return entry[0]
+
+
+def registry_stats():
+    """{"model name=value ...": stats} for every shared client handed out so far."""
+    with _lock:
+        entries = list(_clients.items())
+    return {
+        " ".join([model, *(f"{name}={value}" for name, value in params)]): stats.snapshot()
+        for (model, params), (_, stats) in entries
+    }
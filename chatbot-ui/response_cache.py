@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from operator import itemgetter
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, message_chunk_to_message, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableMap, RunnablePassthrough, RunnableSequence
+from langgraph.constants import TAG_NOSTREAM
+from pydantic import ConfigDict
+
+# Replayed hits stream word by word, like the model would
+REPLAY_CHUNK = re.compile(r"\s*\S+|\s+")
+# The wrapper's own run streams the wrapped model's tokens; don't emit them twice
+INNER_CONFIG = {"tags": [TAG_NOSTREAM]}
+# Fields every chat model has that don't change its output (callbacks, tags, ...)
+MODEL_PLUMBING = set(BaseChatModel.model_fields)
+
+
+def canonical_messages(messages):
+    """The parts of each message that reach the model; ids and metadata are left out."""
+    canonical = []
+    for message in messages:
+        item = {"type": message.type, "content": message.content, "name": message.name}
+        if getattr(message, "tool_calls", None):
+            item["tool_calls"] = [{"name": call["name"], "args": call["args"], "id": call.get("id")} for call in message.tool_calls]
+        if getattr(message, "tool_call_id", None):
+            item["tool_call_id"] = message.tool_call_id
+        canonical.append(item)
+    return canonical
+
+
+def is_deterministic(model, kwargs):
+    """Whether ``model`` answers the same prompt the same way: temperature set to 0, or a pinned seed.
+
+    An unset temperature (None) means the server's default, which samples
+    (about 0.8 for Ollama), so it is not enough on its own.
+    """
+    temperature = kwargs.get("temperature", getattr(model, "temperature", None))
+    seed = kwargs.get("seed", getattr(model, "seed", None))
+    return temperature == 0 or seed is not None
+
+
+class ResponseCache:
+    """Replies keyed by a hash of (model, parameters, messages), in SQLite with an LRU in front.
+
+    Same layout as CachedEmbeddings: rows carry their size and last use, and
+    once the file holds more than ``max_disk_bytes`` of replies the least
+    recently used are evicted. One file can be shared by every model and
+    script; the model and its parameters are part of the key.
+    """
+
+    def __init__(self, path, max_memory_entries=1000, max_disk_bytes=256 * 1024 * 1024):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key BLOB PRIMARY KEY, message TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key(llm_string, messages):
+        payload = json.dumps([llm_string, canonical_messages(messages)], sort_keys=True, default=repr)
+        return hashlib.sha256(payload.encode("utf-8")).digest()
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+        }
+
+    def _remember(self, key, message):
+        self._memory[key] = message
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """The cached AIMessage for ``key``, or None."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key].model_copy()
+            row = self._conn.execute("SELECT message FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            message = messages_from_dict([json.loads(row[0])])[0]
+            self._remember(key, message)
+            self.disk_hits += 1
+            return message.model_copy()
+
+    def put(self, key, message):
+        # A fresh id is assigned on every replay; a shared one would collide in the message log
+        message = message_chunk_to_message(message).model_copy(update={"id": None})
+        blob = json.dumps(message_to_dict(message))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, blob, len(blob), time.time()))
+            self._disk_bytes += len(blob) - (old[0] if old else 0)
+            self._remember(key, message)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used rows until the file is back under 90% of the limit."""
+        target = int(self.max_disk_bytes * 0.9)
+        while self._disk_bytes > target:
+            rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 256").fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in rows])
+            for key, size in rows:
+                self._disk_bytes -= size
+                self._memory.pop(key, None)
+            self.evictions += len(rows)
+
+
+class CachedChatModel(BaseChatModel):
+    """Chat model wrapper that answers repeated prompts from a ResponseCache.
+
+    Only deterministic models are cached: unless the wrapped model has
+    ``temperature=0`` set or a pinned ``seed``, every call goes through. Cache hits stream back
+    word by word, so streaming UIs look the same. To keep a node fresh,
+    list it in ``skip_nodes`` (matched against LangGraph's ``langgraph_node``
+    metadata) or call the model with ``metadata={"response_cache": False}``.
+    """
+
+    model: BaseChatModel
+    response_cache: ResponseCache
+    skip_nodes: frozenset = frozenset()
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    @property
+    def _llm_type(self):
+        return f"cached-{self.model._llm_type}"
+
+    def bind_tools(self, tools, **kwargs):
+        # Let the wrapped model format the tools; the bound kwargs become part of the cache key
+        return self.bind(**self.model.bind_tools(tools, **kwargs).kwargs)
+
+    def with_structured_output(self, schema, *, include_raw=False, **kwargs):
+        # Same as bind_tools: the wrapped model picks the method (e.g. Ollama's json_schema ``format``)
+        # and we keep its bound kwargs and output parser, with this wrapper making the call
+        structured = self.model.with_structured_output(schema, include_raw=False, **kwargs)
+        binding, *parsers = structured.steps
+        llm = self.bind(**binding.kwargs)
+        parser = parsers[0] if len(parsers) == 1 else RunnableSequence(*parsers)
+        if not include_raw:
+            return llm | parser
+        parser_assign = RunnablePassthrough.assign(parsed=itemgetter("raw") | parser, parsing_error=lambda _: None)
+        parser_none = RunnablePassthrough.assign(parsed=lambda _: None)
+        parser_with_fallback = parser_assign.with_fallbacks([parser_none], exception_key="parsing_error")
+        return RunnableMap(raw=llm) | parser_with_fallback
+
+    def _base_model(self):
+        """The model doing the work, under any wrappers (e.g. LLMDispatcher) that keep it in ``.model``."""
+        model = self.model
+        while isinstance(getattr(model, "model", None), BaseChatModel):
+            model = model.model
+        return model
+
+    def _cache_key(self, messages, stop, run_manager, kwargs):
+        """Key for this call, or None when it must not be cached."""
+        base = self._base_model()
+        if not is_deterministic(base, kwargs):
+            return None
+        metadata = run_manager.metadata if run_manager else {}
+        if metadata.get("response_cache") is False or metadata.get("langgraph_node") in self.skip_nodes:
+            return None
+        params = base.model_dump(mode="json", exclude=MODEL_PLUMBING, exclude_none=True, fallback=repr)
+        return ResponseCache.key([type(base).__name__, params, stop, kwargs], messages)
+
+    def _replay(self, message):
+        extra = {"tool_calls": message.tool_calls} if getattr(message, "tool_calls", None) else {}
+        words = REPLAY_CHUNK.findall(message.content) if isinstance(message.content, str) else [message.content]
+        for i, word in enumerate(words or [""]):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word, **(extra if i == 0 else {})))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._cache_key(messages, stop, run_manager, kwargs)
+        cached = self.response_cache.get(key) if key else None
+        if cached is not None:
+            return ChatResult(generations=[ChatGeneration(message=cached)])
+        message = self.model.invoke(messages, INNER_CONFIG, stop=stop, **kwargs)
+        if key:
+            self.response_cache.put(key, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._cache_key(messages, stop, run_manager, kwargs)
+        cached = self.response_cache.get(key) if key else None
+        if cached is not None:
+            return ChatResult(generations=[ChatGeneration(message=cached)])
+        message = await self.model.ainvoke(messages, INNER_CONFIG, stop=stop, **kwargs)
+        if key:
+            self.response_cache.put(key, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._cache_key(messages, stop, run_manager, kwargs)
+        cached = self.response_cache.get(key) if key else None
+        if cached is not None:
+            chunks = self._replay(cached)
+        else:
+            chunks = (ChatGenerationChunk(message=chunk) for chunk in self.model.stream(messages, INNER_CONFIG, stop=stop, **kwargs))
+        full = None
+        for chunk in chunks:
+            full = chunk if full is None else full + chunk
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        # Only a reply that streamed to the end is stored
+        if key and cached is None and full is not None:
+            self.response_cache.put(key, full.message)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._cache_key(messages, stop, run_manager, kwargs)
+        cached = self.response_cache.get(key) if key else None
+        full = None
+        if cached is not None:
+            for chunk in self._replay(cached):
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+            return
+        async for message_chunk in self.model.astream(messages, INNER_CONFIG, stop=stop, **kwargs):
+            chunk = ChatGenerationChunk(message=message_chunk)
+            full = chunk if full is None else full + chunk
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        if key and full is not None:
+            self.response_cache.put(key, full.message)
+
+
+# One ResponseCache per file, shared by every model wrapped in this process
+_caches = {}
+
+
+def cache_from_env(model):
+    """Wrap ``model`` in a CachedChatModel when LLM_RESPONSE_CACHE names a cache file; otherwise return it as is.
+
+    LLM_CACHE_SKIP_NODES is a comma-separated list of graph nodes that always call the model.
+    """
+    path = os.getenv("LLM_RESPONSE_CACHE")
+    if not path:
+        return model
+    if path not in _caches:
+        _caches[path] = ResponseCache(path)
+    skip_nodes = frozenset(node.strip() for node in os.getenv("LLM_CACHE_SKIP_NODES", "").split(",") if node.strip())
+    return CachedChatModel(model=model, response_cache=_caches[path], skip_nodes=skip_nodes)
@@ -1,8 +1,11 @@
 import streamlit as st
-from chat_bot_backend import chatbot 
+from chat_bot_backend import chatbot, checkpointer, retrive_messages_page
 from langchain_core.messages import HumanMessage
+from stream_coalescer import coalesce_stream
 import uuid
 
+MESSAGE_PAGE_SIZE = 30
+
 #********************************************Utility functions*************************************************
 
 def generate_thread_id():
@@ -11,6 +14,7 @@ def generate_thread_id():
 
 def reset_chat():
     st.session_state['message_history'] = []
+    st.session_state['history_cursor'] = None
     st.session_state['thread_id'] = generate_thread_id()
     add_thread_history(st.session_state['thread_id'])
     
@@ -18,6 +22,9 @@ def add_thread_history(thread_id):
     if thread_id not in st.session_state['chat_thread_history']:
         st.session_state['chat_thread_history'].append(thread_id)
 
+def to_message_history(page):
+    return [{"role": "user" if message["type"] == "human" else "assistant", "content": message["content"]} for message in page]
+
 def load_conversation_history(thread_id):
     state = chatbot.get_state(config={"configurable": {"thread_id": thread_id}})
     return state.values.get("messages", [])
@@ -39,21 +46,30 @@ st.sidebar.title("Chatbot UI")
 if st.sidebar.button("New Chat"):
     reset_chat()
 
+memory = checkpointer.stats()
+st.sidebar.caption(
+    f"Checkpoints: {memory['bytes_in_memory'] / 1e6:.1f} MB in memory ({memory['threads_in_memory']} threads), "
+    f"{memory['threads_on_disk']} threads on disk, {memory['evictions']} evictions"
+)
+
 st.header("My Conversion with the AI Agent")
 
 for thread_id in st.session_state['chat_thread_history'][::-1]:  # Display threads in reverse order (most recent first)
     if st.sidebar.button(thread_id):
         st.session_state["thread_id"] = thread_id
-        messages = load_conversation_history(thread_id)
-
-        temp_messages = []
-        for msg in messages:
-            role = "user" if isinstance(msg, HumanMessage) else "assistant"
-            temp_messages.append({"role": role, "content": msg.content})
-        st.session_state["message_history"] = temp_messages
+        # Only the newest page; earlier messages are fetched on demand
+        page = retrive_messages_page(thread_id, limit=MESSAGE_PAGE_SIZE)
+        st.session_state["message_history"] = to_message_history(page)
+        st.session_state["history_cursor"] = page[0]["seq"] if page and page[0]["seq"] > 0 else None
 
 
 # Render history
+if st.session_state.get('history_cursor') is not None and st.button("Load earlier messages"):
+    page = retrive_messages_page(st.session_state['thread_id'], limit=MESSAGE_PAGE_SIZE, before=st.session_state['history_cursor'])
+    st.session_state['message_history'] = to_message_history(page) + st.session_state['message_history']
+    st.session_state['history_cursor'] = page[0]["seq"] if page and page[0]["seq"] > 0 else None
+    st.rerun()
+
 # loading the conversation history
 for message in st.session_state['message_history']:
     with st.chat_message(message['role']):
@@ -71,12 +87,13 @@ if user_input:
    # first add the message to message_history
     with st.chat_message('assistant'):
 
+        # Coalesce tokens into a few UI updates per second instead of one per token
         ai_message = st.write_stream(
-            message_chunk.content for message_chunk, metadata in chatbot.stream(
+            coalesce_stream(chatbot.stream(
                 {'messages': [HumanMessage(content=user_input)]},
                 config= CONFIG,
                 stream_mode= 'messages'
-            )
+            ))
         )
 
     st.session_state['message_history'].append({'role': 'assistant', 'content': ai_message})
\ No newline at end of file
@@ -0,0 +1,48 @@
+import os
+import time
+
+# A UI update at most every 50 ms (about 20 fps), or sooner once this much text is waiting
+FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_MS", "50")) / 1000
+FLUSH_BYTES = int(os.getenv("STREAM_FLUSH_BYTES", "512"))
+
+
+def chunk_text(chunk):
+    """Text of a streamed message chunk; '' for tool-call, usage and other metadata-only chunks."""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    # Content blocks: keep the text parts
+    return "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content)
+
+
+def coalesce_stream(stream, flush_interval=FLUSH_INTERVAL, flush_bytes=FLUSH_BYTES):
+    """Merge a ``stream_mode="messages"`` stream into fewer, larger text pieces for ``st.write_stream``.
+
+    Every token of the raw stream is a separate UI update and websocket
+    message, and st.write_stream re-renders the whole reply each time. This
+    yields the first token straight away, then buffers and yields at most
+    every ``flush_interval`` seconds, or as soon as ``flush_bytes`` of text
+    are waiting. Empty and metadata-only chunks are dropped. The joined
+    output is exactly the joined text of the input.
+
+    Flushes happen when a chunk arrives, so a pause in generation holds back
+    at most one interval's worth of text until the next token or the end.
+    """
+    buffer = []
+    buffered_bytes = 0
+    last_flush = None
+    for item in stream:
+        chunk = item[0] if isinstance(item, tuple) else item
+        text = chunk_text(chunk)
+        if not text:
+            continue
+        buffer.append(text)
+        buffered_bytes += len(text.encode("utf-8"))
+        now = time.monotonic()
+        if last_flush is None or now - last_flush >= flush_interval or buffered_bytes >= flush_bytes:
+            yield "".join(buffer)
+            buffer.clear()
+            buffered_bytes = 0
+            last_flush = now
+    if buffer:
+        yield "".join(buffer)
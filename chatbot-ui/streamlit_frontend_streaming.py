@@ -1,6 +1,7 @@
 import streamlit as st
 from chat_bot_backend import chatbot 
 from langchain_core.messages import HumanMessage
+from stream_coalescer import coalesce_stream
 
 # st.session_state -> dict -> 
 CONFIG = {'configurable': {'thread_id': 'thread-1'}}
@@ -28,12 +29,13 @@ if user_input:
    # first add the message to message_history
     with st.chat_message('assistant'):
 
+        # Coalesce tokens into a few UI updates per second instead of one per token
         ai_message = st.write_stream(
-            message_chunk.content for message_chunk, metadata in chatbot.stream(
+            coalesce_stream(chatbot.stream(
                 {'messages': [HumanMessage(content=user_input)]},
                 config= {'configurable': {'thread_id': 'thread-1'}},
                 stream_mode= 'messages'
-            )
+            ))
         )
 
     st.session_state['message_history'].append({'role': 'assistant', 'content': ai_message})
\ No newline at end of file
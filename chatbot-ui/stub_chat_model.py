@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+
+class StubChatModel(BaseChatModel):
+    """Offline stand-in for ChatOllama in load tests and benchmarks.
+
+    Streams ``tokens`` words, waiting ``first_token_latency`` seconds before
+    the first and ``token_latency`` between the rest, like a local model
+    would. The reply echoes the size of the prompt so tests can tell calls
+    apart. ``calls`` counts how many generations were run.
+    """
+
+    first_token_latency: float = 0.2
+    token_latency: float = 0.01
+    tokens: int = 40
+    calls: int = Field(0, exclude=True)
+
+    @property
+    def _llm_type(self):
+        return "stub-chat"
+
+    def _words(self, messages):
+        self.calls += 1
+        prompt_chars = sum(len(str(message.content)) for message in messages)
+        return [f"reply({prompt_chars})"] + [f" word{i}" for i in range(1, self.tokens)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        content = "".join(chunk.message.content for chunk in self._stream(messages, stop, run_manager, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        content = ""
+        async for chunk in self._astream(messages, stop, run_manager, **kwargs):
+            content += chunk.message.content
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for i, word in enumerate(self._words(messages)):
+            time.sleep(self.first_token_latency if i == 0 else self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for i, word in enumerate(self._words(messages)):
+            await asyncio.sleep(self.first_token_latency if i == 0 else self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                await run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
@@ -0,0 +1,67 @@
+import os
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from bounded_memory_saver import BoundedInMemorySaver
+
+
+class State(TypedDict):
+    messages: Annotated[list[BaseMessage], add_messages]
+
+
+def build_graph(checkpointer):
+    graph = StateGraph(State)
+    graph.add_node("chat_node", lambda state: {"messages": [AIMessage(content=f"reply {len(state['messages'])}")]})
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def test_reads_keep_memory_within_limits():
+    saver = BoundedInMemorySaver(max_threads=3)
+    chatbot = build_graph(saver)
+    for i in range(20):
+        chatbot.invoke({"messages": [HumanMessage(content=f"hello {i}")]}, config=config(f"t{i}"))
+
+    for i in range(20):
+        assert len(chatbot.get_state(config(f"t{i}")).values["messages"]) == 2
+        assert saver.stats()["threads_in_memory"] <= 3
+    # Unknown threads are not registered or kept
+    assert chatbot.get_state(config("missing")).values == {}
+    assert "missing" not in saver.storage
+    stats = saver.stats()
+    assert stats["threads_in_memory"] + stats["threads_on_disk"] == 20
+    assert len(saver.storage) <= 3
+    saver.close()
+
+
+def test_default_spill_file_is_private_and_removed_on_close():
+    first, second = BoundedInMemorySaver(), BoundedInMemorySaver()
+    assert first.spill_path != second.spill_path
+    assert os.path.exists(first.spill_path)
+    first.close()
+    second.close()
+    assert not os.path.exists(first.spill_path)
+    assert not os.path.exists(second.spill_path)
+
+
+def test_explicit_spill_path_is_kept(tmp_path):
+    path = str(tmp_path / "spill.db")
+    saver = BoundedInMemorySaver(path, max_threads=1)
+    chatbot = build_graph(saver)
+    for i in range(3):
+        chatbot.invoke({"messages": [HumanMessage(content="hi")]}, config=config(f"t{i}"))
+    saver.close()
+    assert os.path.exists(path)
+
+    # The table is reused, not dropped, by the next saver on the same file
+    reopened = BoundedInMemorySaver(path, max_threads=1)
+    assert reopened.stats()["threads_on_disk"] == 2
+    reopened.close()
@@ -0,0 +1,140 @@
+import sqlite3
+import threading
+from typing import Annotated, TypedDict
+
+import pytest
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from chat_checkpointer import ChatSqliteSaver
+from delta_messages import messages_reducer
+
+
+def build_graph(checkpointer, reducer):
+    class State(TypedDict):
+        messages: Annotated[list[BaseMessage], reducer]
+
+    def chat_node(state):
+        return {"messages": [AIMessage(content=f"reply {len(state['messages'])}")]}
+
+    graph = StateGraph(State)
+    graph.add_node("chat_node", chat_node)
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def send(chatbot, thread_id, content):
+    chatbot.invoke({"messages": [HumanMessage(content=content)]}, config={"configurable": {"thread_id": thread_id}})
+
+
+@pytest.mark.parametrize("reducer", [add_messages, messages_reducer(snapshot_every=3)], ids=["full", "delta"])
+def test_legacy_thread_gets_new_turn_then_page_is_read(tmp_path, reducer):
+    database = str(tmp_path / "chat.db")
+
+    # A thread written by the plain SqliteSaver, before the message log existed
+    conn = sqlite3.connect(database, check_same_thread=False)
+    legacy = build_graph(SqliteSaver(conn), reducer)
+    for turn in range(4):
+        send(legacy, "old", f"question {turn}")
+    conn.close()
+
+    saver = ChatSqliteSaver.from_database(database)
+    chatbot = build_graph(saver, reducer)
+    send(chatbot, "old", "question 4")
+
+    page = saver.messages.page("old", limit=100)
+    assert [message["content"] for message in page] == [
+        text for turn in range(5) for text in (f"question {turn}", f"reply {2 * turn + 1}")
+    ]
+    assert [message["seq"] for message in page] == list(range(10))
+    saver.pool.close_all()
+
+
+def test_new_thread_is_logged_once(tmp_path):
+    saver = ChatSqliteSaver.from_database(str(tmp_path / "chat.db"))
+    chatbot = build_graph(saver, add_messages)
+    send(chatbot, "new", "hello")
+    send(chatbot, "new", "again")
+
+    page = saver.messages.page("new", limit=100)
+    assert [message["content"] for message in page] == ["hello", "reply 1", "again", "reply 3"]
+    saver.pool.close_all()
+
+
+def test_writes_table_without_task_path_is_migrated(tmp_path):
+    # The writes table as SqliteSaver releases before task_path created it
+    database = str(tmp_path / "chat.db")
+    conn = sqlite3.connect(database)
+    conn.execute(
+        "CREATE TABLE writes (thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL DEFAULT '', "
+        "checkpoint_id TEXT NOT NULL, task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, "
+        "type TEXT, value BLOB, PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))"
+    )
+    conn.close()
+
+    saver = ChatSqliteSaver.from_database(database)
+    chatbot = build_graph(saver, add_messages)
+    send(chatbot, "t", "hello")
+
+    assert [message["content"] for message in saver.messages.page("t")] == ["hello", "reply 1"]
+    saver.pool.close_all()
+
+
+def test_turns_on_fresh_threads_reuse_pooled_connections(tmp_path):
+    saver = ChatSqliteSaver.from_database(str(tmp_path / "chat.db"), max_connections=4)
+    chatbot = build_graph(saver, add_messages)
+
+    def turn(i):
+        config = {"configurable": {"thread_id": f"t{i % 5}"}}
+        # Like a Streamlit rerun: a new OS thread per turn, and LangGraph's own executor threads
+        list(chatbot.stream({"messages": [HumanMessage(content=f"question {i}")]}, config=config, stream_mode="messages"))
+        chatbot.get_state(config)
+
+    for i in range(50):
+        thread = threading.Thread(target=turn, args=(i,))
+        thread.start()
+        thread.join()
+    threads = [threading.Thread(target=turn, args=(i,)) for i in range(50, 70)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(saver.pool._connections) <= 4
+    assert saver.pool.stats["connections"] <= 4
+    assert saver.registry.list_threads()[0]["message_count"] == 28
+    saver.pool.close_all()
+
+
+def test_concurrent_sessions_keep_state_registry_and_log(tmp_path):
+    # Two savers with their own pools stand in for two app processes on one file
+    database = str(tmp_path / "chat.db")
+    savers = [ChatSqliteSaver.from_database(database), ChatSqliteSaver.from_database(database)]
+    chatbots = [build_graph(saver, add_messages) for saver in savers]
+
+    def session(i):
+        for turn in range(5):
+            send(chatbots[i % 2], f"s{i}", f"question {turn}")
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    saver = savers[0]
+    threads_by_id = {row["thread_id"]: row for row in saver.registry.list_threads(limit=100)}
+    for i in range(8):
+        state = chatbots[0].get_state({"configurable": {"thread_id": f"s{i}"}}).values
+        assert len(state["messages"]) == 10
+        assert threads_by_id[f"s{i}"]["message_count"] == 10
+        assert threads_by_id[f"s{i}"]["title"] == "question 0"
+        assert [message["content"] for message in saver.messages.page(f"s{i}", limit=100)] == [
+            message.content for message in state["messages"]
+        ]
+    assert sum(saver.pool.stats["transactions"] for saver in savers) >= 8 * 5 * 4
+    for saver in savers:
+        saver.pool.close_all()
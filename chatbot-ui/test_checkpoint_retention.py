@@ -0,0 +1,71 @@
+from typing import Annotated, TypedDict
+
+import pytest
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+
+from chat_checkpointer import ChatSqliteSaver
+from checkpoint_retention import CheckpointRetention
+from delta_messages import messages_reducer
+
+
+def build_graph(checkpointer, reducer):
+    class State(TypedDict):
+        messages: Annotated[list[BaseMessage], reducer]
+
+    def chat_node(state):
+        return {"messages": [AIMessage(content=f"reply {len(state['messages'])}")]}
+
+    graph = StateGraph(State)
+    graph.add_node("chat_node", chat_node)
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def history(chatbot):
+    """{checkpoint id: message contents} for every checkpoint of thread "t"."""
+    return {
+        snapshot.config["configurable"]["checkpoint_id"]: [message.content for message in snapshot.values.get("messages", [])]
+        for snapshot in chatbot.get_state_history({"configurable": {"thread_id": "t"}})
+    }
+
+
+@pytest.mark.parametrize("policy", [{"keep_last": 7}, {"final_per_turn": True}, {"keep_last": 7, "final_per_turn": True}])
+@pytest.mark.parametrize("reducer", [add_messages, messages_reducer(snapshot_every=5)], ids=["full", "delta"])
+def test_kept_checkpoints_still_load(tmp_path, reducer, policy):
+    saver = ChatSqliteSaver.from_database(str(tmp_path / "chat.db"))
+    chatbot = build_graph(saver, reducer)
+    for turn in range(8):
+        chatbot.invoke({"messages": [HumanMessage(content=f"question {turn}")]}, config={"configurable": {"thread_id": "t"}})
+    before = history(chatbot)
+
+    CheckpointRetention(saver, **policy).prune()
+
+    after = history(chatbot)
+    assert after and len(after) < len(before)
+    if "keep_last" in policy:
+        assert len(after) <= 7
+        assert set(after) <= set(sorted(before)[-7:])
+    assert {checkpoint_id: before[checkpoint_id] for checkpoint_id in after} == after
+    saver.pool.close_all()
+
+
+def test_vacuum_runs_under_the_write_lock(tmp_path):
+    saver = ChatSqliteSaver.from_database(str(tmp_path / "chat.db"))
+    retention = CheckpointRetention(saver, keep_last=2, vacuum_step_pages=4)
+    retention.enable_incremental_vacuum()
+    chatbot = build_graph(saver, add_messages)
+    for turn in range(20):
+        chatbot.invoke({"messages": [HumanMessage(content=f"question {turn} " + "x" * 2000)]}, config={"configurable": {"thread_id": "t"}})
+    retention.prune()
+
+    # Whether the process-wide write lock was held when each vacuum statement ran
+    locked = []
+    for conn in saver.pool._connections:
+        conn.set_trace_callback(lambda sql: locked.append(saver.pool.write_lock.locked()) if "vacuum(" in sql or "wal_checkpoint" in sql else None)
+    retention.vacuum()
+
+    assert len(locked) > 2 and all(locked)
+    saver.pool.close_all()
@@ -0,0 +1,32 @@
+import logging
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from compact_serde import CompressedSerializer
+
+
+def test_rows_round_trip_across_codecs():
+    messages = [HumanMessage(content="hello " * 20), AIMessage(content="reply " * 20)]
+    zlib = CompressedSerializer(codec="zlib")
+    plain = CompressedSerializer()
+
+    type_, data = zlib.dumps_typed(messages)
+    assert type_.endswith("+zlib1")
+    assert plain.loads_typed((type_, data)) == messages
+    assert plain.dumps_typed(messages) == JsonPlusSerializer().dumps_typed(messages)
+
+
+def test_allowlist_reaches_the_wrapped_serializer(caplog):
+    inner = JsonPlusSerializer(allowed_msgpack_modules=[("langchain_core.messages.human", "HumanMessage")])
+    saver = InMemorySaver(serde=CompressedSerializer(inner, codec="zlib"))
+
+    with caplog.at_level(logging.WARNING):
+        clone = saver.with_allowlist([("langchain_core.messages.ai", "AIMessage")])
+
+    assert "does not support msgpack allowlist" not in caplog.text
+    assert isinstance(clone.serde, CompressedSerializer)
+    assert clone.serde.codec == "zlib1"
+    assert ("langchain_core.messages.ai", "AIMessage") in clone.serde.serde._allowed_msgpack_modules
+    assert saver.serde.serde is inner
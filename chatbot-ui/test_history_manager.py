@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+from typing import Annotated, Any, TypedDict
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph, add_messages
+from pydantic import Field
+
+from history_manager import HistoryManager
+from stub_chat_model import StubChatModel
+
+
+class ChatState(TypedDict):
+    messages: Annotated[list[BaseMessage], add_messages]
+    summary: str
+    summarized_count: int
+
+
+class GatedChatModel(StubChatModel):
+    """Stub summarizer that holds each call until the test sets ``release``."""
+
+    first_token_latency: float = 0
+    token_latency: float = 0
+    tokens: int = 3
+    release: Any = Field(default_factory=threading.Event, exclude=True)
+    released: list = Field(default_factory=list, exclude=True)
+
+    def _words(self, messages):
+        # False if a turn had to wait for the summary and the gate timed out
+        self.released.append(self.release.wait(timeout=5))
+        return super()._words(messages)
+
+
+def build_chatbot(history, model):
+    async def achat_node(state: ChatState):
+        return {"messages": [await model.ainvoke(history.prompt_messages(state))]}
+
+    def chat_node(state: ChatState):
+        return {"messages": [model.invoke(history.prompt_messages(state))]}
+
+    graph = StateGraph(ChatState)
+    graph.add_node("chat_node", RunnableLambda(chat_node, afunc=achat_node))
+    graph.add_node("compact_history", RunnableLambda(history.compact, afunc=history.acompact))
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", "compact_history")
+    graph.add_edge("compact_history", END)
+    return graph.compile(checkpointer=InMemorySaver())
+
+
+def fast_model():
+    return StubChatModel(first_token_latency=0, token_latency=0, tokens=3)
+
+
+def test_summarizes_every_n_turns():
+    summarizer = fast_model()
+    history = HistoryManager(summarizer, keep_turns=2, summarize_every=3, background=False)
+    chatbot = build_chatbot(history, fast_model())
+    config = {"configurable": {"thread_id": "t"}}
+    for turn in range(10):
+        chatbot.invoke({"messages": [HumanMessage(content=f"question {turn}")]}, config=config)
+    # Turns 0-2, 3-5 and 6-8 left the window in groups of three
+    assert summarizer.calls == 3
+    assert chatbot.get_state(config).values["summarized_count"] == 18
+
+
+def test_background_summary_does_not_hold_up_the_turn():
+    summarizer = GatedChatModel()
+    history = HistoryManager(summarizer, keep_turns=2, summarize_every=1)
+    chatbot = build_chatbot(history, fast_model())
+    config = {"configurable": {"thread_id": "t"}}
+
+    async def turns():
+        for turn in range(4):
+            await chatbot.ainvoke({"messages": [HumanMessage(content=f"question {turn}")]}, config=config)
+
+    # The summary started after turn 2 is still held at the gate, yet all turns finished
+    asyncio.run(turns())
+    assert "summary" not in chatbot.get_state(config).values
+    assert list(history._jobs) == ["t"]
+
+    summarizer.release.set()
+    for _ in range(500):
+        if not history._jobs:
+            break
+        time.sleep(0.01)
+    assert summarizer.released == [True]
+    assert history._jobs == {}
+
+    # The finished summary is stored by the next turn's compact
+    chatbot.invoke({"messages": [HumanMessage(content="question 4")]}, config=config)
+    values = chatbot.get_state(config).values
+    assert values["summary"].startswith("reply(")
+    assert values["summarized_count"] == 2
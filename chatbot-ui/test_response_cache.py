@@ -0,0 +1,76 @@
+from typing import Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_ollama import ChatOllama
+from pydantic import BaseModel, Field
+
+from response_cache import CachedChatModel, ResponseCache
+
+
+class Sentiment(BaseModel):
+    sentiment: str
+
+
+class JsonChatModel(BaseChatModel):
+    """Answers in JSON when called with a ``format`` schema, like Ollama's structured output."""
+
+    temperature: Optional[float] = 0
+    seed: Optional[int] = None
+    calls: int = Field(0, exclude=True)
+
+    @property
+    def _llm_type(self):
+        return "json-chat"
+
+    def with_structured_output(self, schema, *, include_raw=False, **kwargs):
+        return self.bind(format=schema.model_json_schema()) | PydanticOutputParser(pydantic_object=schema)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        content = '{"sentiment": "positive"}' if "format" in kwargs else "positive"
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+
+def test_structured_output_binds_same_kwargs_as_wrapped_model(tmp_path):
+    model = ChatOllama(model="llama3.1", temperature=0)
+    cached = CachedChatModel(model=model, response_cache=ResponseCache(str(tmp_path / "cache.db")))
+
+    plain = model.with_structured_output(Sentiment)
+    wrapped = cached.with_structured_output(Sentiment)
+
+    assert wrapped.first.bound is cached
+    assert wrapped.first.kwargs == plain.first.kwargs
+    assert type(wrapped.last) is type(plain.last)
+
+
+def test_structured_output_is_cached(tmp_path):
+    model = JsonChatModel()
+    cached = CachedChatModel(model=model, response_cache=ResponseCache(str(tmp_path / "cache.db")))
+    structured = cached.with_structured_output(Sentiment)
+
+    assert structured.invoke("Great product") == Sentiment(sentiment="positive")
+    assert structured.invoke("Great product") == Sentiment(sentiment="positive")
+    assert model.calls == 1
+
+    raw = cached.with_structured_output(Sentiment, include_raw=True).invoke("Great product")
+    assert raw["parsed"] == Sentiment(sentiment="positive")
+    assert raw["parsing_error"] is None
+    assert model.calls == 1
+
+
+def test_only_deterministic_models_are_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.db"))
+    # An unset temperature samples at the server's default
+    for model, expected_calls in [
+        (JsonChatModel(temperature=None), 2),
+        (JsonChatModel(temperature=0.7), 2),
+        (JsonChatModel(temperature=None, seed=42), 1),
+        (JsonChatModel(temperature=0), 1),
+    ]:
+        cached = CachedChatModel(model=model, response_cache=cache)
+        cached.invoke("Great product")
+        cached.invoke("Great product")
+        assert model.calls == expected_calls